@@ -21,6 +21,8 @@ class Calibration:
         Uses a transformation x' = x * scale + offset
     """
 
+    __slots__ = ("__offset", "__scale", "__units", "__weakref__")
+
     def __init__(self, offset: typing.Optional[float] = None, scale: typing.Optional[float] = None, units: typing.Optional[str] = None) -> None:
         self.__offset = float(offset) if offset else None
         self.__scale = float(scale) if scale else None
@@ -33,12 +35,12 @@ class Calibration:
             return "x {} + {}".format(self.__scale, self.__offset)
 
     def __eq__(self, other: typing.Any) -> bool:
-        if isinstance(other, self.__class__):
+        if isinstance(other, Calibration):
             return self.offset == other.offset and self.scale == other.scale and self.units == other.units
         return False
 
     def __ne__(self, other: typing.Any) -> bool:
-        if isinstance(other, self.__class__):
+        if isinstance(other, Calibration):
             return self.offset != other.offset or self.scale != other.scale or self.units != other.units
         return True
 
@@ -54,6 +56,14 @@ class Calibration:
     def __deepcopy__(self, memo: typing.Dict[typing.Any, typing.Any]) -> Calibration:
         return type(self)(self.__offset, self.__scale, self.__units)
 
+    def _make_mutable_copy(self) -> Calibration:
+        # return a mutable copy without converting the values again, which is several times faster than copy.copy.
+        calibration = Calibration.__new__(Calibration)
+        calibration.__offset = self.__offset
+        calibration.__scale = self.__scale
+        calibration.__units = self.__units
+        return calibration
+
     def read_dict(self, storage_dict: typing.Mapping[str, typing.Any]) -> Calibration:
         self.offset = float(storage_dict["offset"]) if "offset" in storage_dict else 0.0
         self.scale = float(storage_dict["scale"]) if "scale" in storage_dict else 1.0
@@ -242,3 +252,43 @@ class Calibration:
         else:
             result = str()
         return result
+
+
+class ImmutableCalibration(Calibration):
+    """
+        A calibration which cannot be changed and can therefore be shared instead of copied.
+
+        Copies are mutable calibrations. Use make to get an immutable calibration from any calibration without copying
+        calibrations which are already immutable.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, offset: typing.Optional[float] = None, scale: typing.Optional[float] = None, units: typing.Optional[str] = None) -> None:
+        object.__setattr__(self, "_Calibration__offset", float(offset) if offset else None)
+        object.__setattr__(self, "_Calibration__scale", float(scale) if scale else None)
+        object.__setattr__(self, "_Calibration__units", str(units) if units else None)
+
+    @classmethod
+    def make(cls, calibration: Calibration) -> ImmutableCalibration:
+        if isinstance(calibration, ImmutableCalibration):
+            return calibration
+        return cls(calibration.offset, calibration.scale, calibration.units)
+
+    def __setattr__(self, name: str, value: typing.Any) -> None:
+        raise AttributeError("Calibration is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("Calibration is immutable")
+
+    def __copy__(self) -> Calibration:
+        return self._make_mutable_copy()
+
+    def __deepcopy__(self, memo: typing.Dict[typing.Any, typing.Any]) -> Calibration:
+        return self._make_mutable_copy()
+
+    def __reduce__(self) -> typing.Tuple[typing.Any, ...]:
+        return ImmutableCalibration, (self.offset, self.scale, self.units)
+
+    def clear(self) -> None:
+        raise AttributeError("Calibration is immutable")
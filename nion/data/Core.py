@@ -1,6 +1,7 @@
 # standard libraries
 import copy
 import functools
+import itertools
 import math
 import operator
 import typing
@@ -19,6 +20,10 @@ import scipy.signal
 from nion.data import Calibration
 from nion.data import DataAndMetadata
 from nion.data import Image
+from nion.data import Memoization
+from nion.data import Parallel
+from nion.data import Sparse
+from nion.data import Statistics
 from nion.data import TemplateMatching
 from nion.utils import Geometry
 
@@ -53,7 +58,7 @@ def column(data_and_metadata_in: _DataAndMetadataLike, start: int, stop: int) ->
                                   sparse=True)
         return meshgrid[0]
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=data_and_metadata.dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=data_and_metadata._shared_dimensional_calibrations)
 
 
 def row(data_and_metadata_in: _DataAndMetadataLike, start: int, stop: int) -> DataAndMetadata.DataAndMetadata:
@@ -68,7 +73,7 @@ def row(data_and_metadata_in: _DataAndMetadataLike, start: int, stop: int) -> Da
                                   numpy.linspace(start_0, stop_0, data_shape(data_and_metadata)[0]), sparse=True)
         return meshgrid[1]
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=data_and_metadata.dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=data_and_metadata._shared_dimensional_calibrations)
 
 
 def radius(data_and_metadata_in: _DataAndMetadataLike, normalize: bool = True) -> DataAndMetadata.DataAndMetadata:
@@ -82,7 +87,7 @@ def radius(data_and_metadata_in: _DataAndMetadataLike, normalize: bool = True) -
         icol, irow = numpy.meshgrid(numpy.linspace(start_1, stop_1, data_shape(data_and_metadata)[1]), numpy.linspace(start_0, stop_0, data_shape(data_and_metadata)[0]), sparse=True)
         return numpy.sqrt(icol * icol + irow * irow)
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=data_and_metadata.dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=data_and_metadata._shared_dimensional_calibrations)
 
 
 def full(shape: DataAndMetadata.ShapeType, fill_value: typing.Any, dtype: typing.Optional[numpy.typing.DTypeLike] = None) -> DataAndMetadata.DataAndMetadata:
@@ -146,18 +151,57 @@ def dtype_to_str(dtype: numpy.typing.DTypeLike) -> str:
     return dtype_map.get(dtype, "float")
 
 
-def function_fft(data_and_metadata_in: _DataAndMetadataLike) -> DataAndMetadata.DataAndMetadata:
+def _get_fft_datum_axes(data_and_metadata: DataAndMetadata.DataAndMetadata, rfft: bool) -> typing.Optional[typing.Tuple[int, ...]]:
+    # the axes to transform when the transform is calculated over the datum axes, or None if the 1d or 2d transform of
+    # the whole data is calculated. sequences and collections are always transformed over the datum axes. other 1d and
+    # 2d data, for which the datum axes are all of the axes, uses the whole data transform unless the half spectrum is
+    # requested.
+    data_dimension_count = len(data_and_metadata.dimensional_shape)
+    datum_dimension_count = data_and_metadata.datum_dimension_count
+    if not rfft and data_dimension_count <= 2 and (not data_and_metadata.is_navigable or datum_dimension_count == 0):
+        return None
+    return tuple(range(data_dimension_count - datum_dimension_count, data_dimension_count))
+
+
+def _get_fft_result(data: _ImageDataType) -> _ImageDataType:
+    # the 1d and 2d transforms are scaled in double precision, so return results of the datum axes transforms with at
+    # least double precision too.
+    return data.astype(numpy.promote_types(data.dtype, numpy.float64), copy=False)
+
+
+@Memoization.memoize
+def function_fft(data_and_metadata_in: _DataAndMetadataLike, *, rfft: bool = False) -> DataAndMetadata.DataAndMetadata:
+    """Calculate the FFT of the data, with the zero frequency shifted to the center and scaled to preserve power.
+
+    1d and 2d data is transformed over all of its axes. Sequences and collections are transformed over the datum axes
+    only, calculating the transform of each datum in a single call.
+
+    If "rfft" is True, the data must be real and the half spectrum of the transform is returned. The last transformed
+    axis holds the non-negative frequencies only and is not shifted.
+    """
     data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
     data_shape = data_and_metadata.data_shape
     data_dtype = data_and_metadata.data_dtype
 
+    datum_axes = _get_fft_datum_axes(data_and_metadata, rfft)
+
     def calculate_data() -> _ImageDataType:
         data = data_and_metadata.data
         assert data is not None
         # scaling: numpy.sqrt(numpy.mean(numpy.absolute(data_copy)**2)) == numpy.sqrt(numpy.mean(numpy.absolute(data_copy_fft)**2))
         # see https://gist.github.com/endolith/1257010
-        if Image.is_data_1d(data):
+        if datum_axes is not None:
+            if Image.is_data_rgb(data):
+                data = numpy.sum(data[..., :] * (0.2126, 0.7152, 0.0722), -1)
+            elif Image.is_data_rgba(data):
+                data = numpy.sum(data[..., :] * (0.2126, 0.7152, 0.0722, 0.0), -1)
+            # the ortho norm scales by 1 / sqrt(datum size), the same as the explicit scaling of the 1d and 2d cases.
+            workers = Parallel.get_max_workers()
+            if rfft:
+                return _get_fft_result(scipy.fft.fftshift(scipy.fft.rfftn(data, axes=datum_axes, norm="ortho", workers=workers), axes=datum_axes[:-1]))
+            return _get_fft_result(scipy.fft.fftshift(scipy.fft.fftn(data, axes=datum_axes, norm="ortho", workers=workers), axes=datum_axes))
+        elif Image.is_data_1d(data):
             scaling = 1.0 / numpy.sqrt(data_shape[0])
             return scipy.fft.fftshift(numpy.multiply(scipy.fft.fft(data), scaling))  # type: ignore
         elif Image.is_data_2d(data):
@@ -174,36 +218,71 @@ def function_fft(data_and_metadata_in: _DataAndMetadataLike) -> DataAndMetadata.
         else:
             raise NotImplementedError()
 
-    src_dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    src_dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
 
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("FFT: invalid data")
 
+    if datum_axes is not None and not datum_axes:
+        raise ValueError("FFT: data has no datum axes")
+
+    if rfft and numpy.iscomplexobj(data_and_metadata.data):
+        raise ValueError("FFT: half spectrum requires real data")
+
     assert len(src_dimensional_calibrations) == len(Image.dimensional_shape_from_shape_and_dtype(data_shape, data_dtype) or ())
 
     # zero_frequency_position = numpy.array((numpy.array(data_shape) // 2)) + 0.5
 
+    def get_frequency_calibration(dimensional_calibration: Calibration.Calibration, data_shape_n: int, is_half: bool) -> Calibration.Calibration:
+        zero_frequency_index = 0 if is_half else data_shape_n // 2
+        return Calibration.Calibration((-0.5 - zero_frequency_index) / (dimensional_calibration.scale * data_shape_n),
+                                       1.0 / (dimensional_calibration.scale * data_shape_n),
+                                       "1/" + dimensional_calibration.units)
+
+    transformed_axes = datum_axes if datum_axes is not None else tuple(range(len(src_dimensional_calibrations)))
     dimensional_calibrations = [
-        Calibration.Calibration((-0.5 - data_shape_n // 2) / (dimensional_calibration.scale * data_shape_n),
-                                1.0 / (dimensional_calibration.scale * data_shape_n),
-                                "1/" + dimensional_calibration.units) for dimensional_calibration, data_shape_n in
-        zip(src_dimensional_calibrations, data_shape)]
+        get_frequency_calibration(dimensional_calibration, data_shape_n, rfft and i == transformed_axes[-1]) if i in transformed_axes else dimensional_calibration
+        for i, (dimensional_calibration, data_shape_n) in enumerate(zip(src_dimensional_calibrations, data_shape))]
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), dimensional_calibrations=dimensional_calibrations, intensity_calibration=data_and_metadata.intensity_calibration)
+    data_descriptor = data_and_metadata.data_descriptor if datum_axes is not None else None
 
+    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), dimensional_calibrations=dimensional_calibrations, intensity_calibration=data_and_metadata._shared_intensity_calibration, data_descriptor=data_descriptor)
 
-def function_ifft(data_and_metadata_in: _DataAndMetadataLike) -> DataAndMetadata.DataAndMetadata:
+
+@Memoization.memoize
+def function_ifft(data_and_metadata_in: _DataAndMetadataLike, *, rfft: bool = False, last_axis_length: typing.Optional[int] = None) -> DataAndMetadata.DataAndMetadata:
+    """Calculate the inverse of function_fft.
+
+    1d and 2d data is transformed over all of its axes. Sequences and collections are transformed over the datum axes
+    only.
+
+    If "rfft" is True, the data must be a half spectrum as returned by function_fft with "rfft" True and the real
+    inverse is returned. "last_axis_length" is the length of the last datum axis of the result; the default is
+    2 * (n - 1) where n is the length of the last datum axis of the half spectrum.
+    """
     data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
     data_shape = data_and_metadata.data_shape
     data_dtype = data_and_metadata.data_dtype
 
+    datum_axes = _get_fft_datum_axes(data_and_metadata, rfft)
+
+    result_shape = list(data_shape)
+    if rfft and datum_axes:
+        result_shape[datum_axes[-1]] = last_axis_length if last_axis_length is not None else 2 * (data_shape[datum_axes[-1]] - 1)
+
     def calculate_data() -> _ImageDataType:
         data = data_and_metadata.data
         assert data is not None
         # scaling: numpy.sqrt(numpy.mean(numpy.absolute(data_copy)**2)) == numpy.sqrt(numpy.mean(numpy.absolute(data_copy_fft)**2))
         # see https://gist.github.com/endolith/1257010
-        if Image.is_data_1d(data):
+        if datum_axes is not None:
+            workers = Parallel.get_max_workers()
+            if rfft:
+                s = [result_shape[axis] for axis in datum_axes]
+                return _get_fft_result(scipy.fft.irfftn(scipy.fft.ifftshift(data, axes=datum_axes[:-1]), s=s, axes=datum_axes, norm="ortho", workers=workers))
+            return _get_fft_result(scipy.fft.ifftn(scipy.fft.ifftshift(data, axes=datum_axes), axes=datum_axes, norm="ortho", workers=workers))
+        elif Image.is_data_1d(data):
             scaling = numpy.sqrt(data_shape[0])
             return scipy.fft.ifft(scipy.fft.ifftshift(data) * scaling)  # type: ignore
         elif Image.is_data_2d(data):
@@ -213,11 +292,17 @@ def function_ifft(data_and_metadata_in: _DataAndMetadataLike) -> DataAndMetadata
         else:
             raise NotImplementedError()
 
-    src_dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    src_dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
 
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Inverse FFT: invalid data")
 
+    if datum_axes is not None and not datum_axes:
+        raise ValueError("Inverse FFT: data has no datum axes")
+
+    if rfft and datum_axes and last_axis_length is not None and last_axis_length // 2 + 1 != data_shape[datum_axes[-1]]:
+        raise ValueError("Inverse FFT: last axis length does not match the half spectrum")
+
     assert len(src_dimensional_calibrations) == len(Image.dimensional_shape_from_shape_and_dtype(data_shape, data_dtype) or ())
 
     def remove_one_slash(s: str) -> str:
@@ -226,13 +311,17 @@ def function_ifft(data_and_metadata_in: _DataAndMetadataLike) -> DataAndMetadata
         else:
             return "1/" + s
 
-    dimensional_calibrations = [Calibration.Calibration(0.0, 1.0 / (dimensional_calibration.scale * data_shape_n),
-                                                        remove_one_slash(dimensional_calibration.units)) for
-        dimensional_calibration, data_shape_n in zip(src_dimensional_calibrations, data_shape)]
+    transformed_axes = datum_axes if datum_axes is not None else tuple(range(len(src_dimensional_calibrations)))
+    dimensional_calibrations = [
+        Calibration.Calibration(0.0, 1.0 / (dimensional_calibration.scale * data_shape_n), remove_one_slash(dimensional_calibration.units)) if i in transformed_axes else dimensional_calibration
+        for i, (dimensional_calibration, data_shape_n) in enumerate(zip(src_dimensional_calibrations, result_shape))]
+
+    data_descriptor = data_and_metadata.data_descriptor if datum_axes is not None else None
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), dimensional_calibrations=dimensional_calibrations, intensity_calibration=data_and_metadata.intensity_calibration)
+    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), dimensional_calibrations=dimensional_calibrations, intensity_calibration=data_and_metadata._shared_intensity_calibration, data_descriptor=data_descriptor)
 
 
+@Memoization.memoize
 def function_autocorrelate(data_and_metadata_in: _DataAndMetadataLike) -> DataAndMetadata.DataAndMetadata:
     data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
@@ -257,7 +346,7 @@ def function_autocorrelate(data_and_metadata_in: _DataAndMetadataLike) -> DataAn
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Auto-correlate: invalid data")
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), dimensional_calibrations=data_and_metadata.dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), dimensional_calibrations=data_and_metadata._shared_dimensional_calibrations)
 
 
 def function_crosscorrelate(*args: _DataAndMetadataIndeterminateSizeLike) -> DataAndMetadata.DataAndMetadata:
@@ -304,7 +393,7 @@ def function_crosscorrelate(*args: _DataAndMetadataIndeterminateSizeLike) -> Dat
     if not Image.is_data_valid(data_and_metadata2.data):
         raise ValueError("Cross correlate: invalid data 2")
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), dimensional_calibrations=data_and_metadata1.dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), dimensional_calibrations=data_and_metadata1._shared_dimensional_calibrations)
 
 
 def function_register(data1_in: _DataAndMetadataLike, data2_in: _DataAndMetadataLike, subtract_means: bool,
@@ -325,17 +414,7 @@ def function_register(data1_in: _DataAndMetadataLike, data2_in: _DataAndMetadata
     assert data2 is not None
     # take the slice if there is one
     if bounds is not None:
-        d_rank = xdata1.datum_dimension_count
-        shape = data1.shape
-        bounds_pixels = numpy.rint(numpy.array(bounds) * numpy.array(shape)).astype(numpy.int_)
-        bounds_slice: typing.Optional[typing.Union[slice, typing.Tuple[slice, ...]]]
-        if d_rank == 1:
-            bounds_slice = slice(max(0, bounds_pixels[0]), min(shape[0], bounds_pixels[1]))
-        elif d_rank == 2:
-            bounds_slice = (slice(max(0, bounds_pixels[0][0]), min(shape[0], bounds_pixels[0][0]+bounds_pixels[1][0])),
-                            slice(max(0, bounds_pixels[0][1]), min(shape[1], bounds_pixels[0][1]+bounds_pixels[1][1])))
-        else:
-            bounds_slice = None
+        bounds_slice = _register_bounds_slice(data1.shape, xdata1.datum_dimension_count, bounds)
         data1 = data1[bounds_slice]
         data2 = data2[bounds_slice]
         assert data1 is not None
@@ -351,6 +430,80 @@ def function_register(data1_in: _DataAndMetadataLike, data2_in: _DataAndMetadata
     return tuple(max_pos[i] - data1.shape[i] * 0.5 for i in range(len(data1.shape)))
 
 
+def _register_bounds_slice(shape: DataAndMetadata.ShapeType, d_rank: int, bounds: typing.Union[NormRectangleType, NormIntervalType]) -> typing.Optional[typing.Union[slice, typing.Tuple[slice, ...]]]:
+    bounds_pixels = numpy.rint(numpy.array(bounds) * numpy.array(shape)).astype(numpy.int_)
+    if d_rank == 1:
+        return slice(max(0, bounds_pixels[0]), min(shape[0], bounds_pixels[1]))
+    elif d_rank == 2:
+        return (slice(max(0, bounds_pixels[0][0]), min(shape[0], bounds_pixels[0][0]+bounds_pixels[1][0])),
+                slice(max(0, bounds_pixels[0][1]), min(shape[1], bounds_pixels[0][1]+bounds_pixels[1][1])))
+    return None
+
+
+# the approximate size of the spectra calculated together when registering the frames of a sequence.
+_REGISTRATION_BLOCK_SIZE = 128 * 1024 * 1024
+
+
+def _register_frames(src_data: _ImageDataType, s_shape: DataAndMetadata.ShapeType, d_rank: int, subtract_means: bool,
+                     bounds: typing.Optional[typing.Union[NormRectangleType, NormIntervalType]],
+                     reference_data: typing.Optional[_ImageDataType] = None) -> _ImageDataType:
+    # batched equivalent of calling function_register for each frame of src_data, relative to the reference data or,
+    # if reference data is None, relative to the previous frame (the first frame gets a zero shift). frames are
+    # transformed in blocks with real ffts. the correlation is zero padded so that it matches the linear correlation
+    # calculated by scipy.signal.correlate in "same" mode. returns an array of shape (frame count, d_rank).
+    count = int(numpy.prod(s_shape, dtype=numpy.uint64))
+    datum_shape = tuple(src_data.shape[len(s_shape):])
+    bounds_slice = _register_bounds_slice(datum_shape, d_rank, bounds) if bounds is not None else None
+    frame_key: typing.Tuple[typing.Any, ...] = (Ellipsis,) + (bounds_slice if isinstance(bounds_slice, tuple) else (bounds_slice,) if bounds_slice is not None else tuple())
+    axes = tuple(range(-d_rank, 0))
+    workers = Parallel.get_max_workers()
+
+    def prepare(frames: _ImageDataType) -> _ImageDataType:
+        frames = numpy.asarray(frames[frame_key], dtype=numpy.float64)
+        if subtract_means:
+            frames = frames - numpy.mean(frames, axis=axes, keepdims=True)
+        return frames
+
+    def get_frames(start: int, stop: int) -> _ImageDataType:
+        if isinstance(src_data, numpy.ndarray):
+            return src_data.reshape((count,) + datum_shape)[start:stop]
+        return numpy.stack([numpy.asarray(src_data[numpy.unravel_index(i, s_shape)]) for i in range(start, stop)])
+
+    frame_shape = prepare(numpy.zeros((1,) + datum_shape)).shape[1:]
+    # the smallest padding for which the circular correlation does not alias into the lags of the "same" correlation.
+    padded_shape = tuple(scipy.fft.next_fast_len(max(2 * n - 1 - n // 2, n + n // 2), real=True) for n in frame_shape)
+    # indexes into the padded circular correlation which correspond to the "same" linear correlation.
+    same_indexes = [(numpy.arange(n) - n // 2) % p for n, p in zip(frame_shape, padded_shape)]
+    spectrum_size = math.prod(padded_shape[:-1]) * (padded_shape[-1] // 2 + 1) * 16
+    block_count = max(1, _REGISTRATION_BLOCK_SIZE // max(1, spectrum_size))
+
+    def transform(frames: _ImageDataType) -> _ImageDataType:
+        return typing.cast(_ImageDataType, scipy.fft.rfftn(frames, s=padded_shape, axes=axes, workers=workers))
+
+    result = numpy.zeros((count, d_rank))
+    reference_spectrum = transform(prepare(numpy.asarray(reference_data)[numpy.newaxis, ...])) if reference_data is not None else None
+    start = 0 if reference_data is not None else 1
+    previous_spectrum = transform(prepare(get_frames(0, 1))) if reference_data is None and count > 0 else None
+    for block_start in range(start, count, block_count):
+        block_stop = min(block_start + block_count, count)
+        spectra = transform(prepare(get_frames(block_start, block_stop)))
+        if reference_spectrum is not None:
+            product = numpy.conjugate(spectra, out=spectra)
+            product *= reference_spectrum
+        else:
+            assert previous_spectrum is not None
+            product = numpy.conjugate(spectra)
+            product[0] *= previous_spectrum[0]
+            product[1:] *= spectra[:-1]
+            previous_spectrum = spectra[-1:]
+        ccorr = scipy.fft.irfftn(product, s=padded_shape, axes=axes, workers=workers)
+        for axis, indexes in zip(axes, same_indexes):
+            ccorr = numpy.take(ccorr, indexes, axis=axis)
+        max_pos = TemplateMatching.find_ccorr_max_batch(ccorr)[2]
+        result[block_start:block_stop] = max_pos - numpy.array(frame_shape) * 0.5
+    return result
+
+
 def function_match_template(image_xdata_in: _DataAndMetadataLike, template_xdata_in: _DataAndMetadataLike) -> DataAndMetadata.DataAndMetadata:
     """
     Calculates the normalized cross-correlation for a template with an image. The returned xdata will have the same
@@ -378,7 +531,7 @@ def function_match_template(image_xdata_in: _DataAndMetadataLike, template_xdata
     ccorr = TemplateMatching.match_template(image, template)
     if squeeze:
         ccorr = numpy.squeeze(ccorr)
-    return DataAndMetadata.new_data_and_metadata(data=ccorr, dimensional_calibrations=image_xdata.dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=ccorr, dimensional_calibrations=image_xdata._shared_dimensional_calibrations)
 
 
 def function_register_template(image_xdata_in: _DataAndMetadataLike, template_xdata_in: _DataAndMetadataLike, ccorr_mask: typing.Optional[_DataAndMetadataLike] = None) -> typing.Tuple[float, typing.Tuple[float, ...]]:
@@ -408,6 +561,39 @@ def function_register_template(image_xdata_in: _DataAndMetadataLike, template_xd
     return 0.0, (0.0, ) * len(image_xdata.data_shape)
 
 
+def function_register_template_batch(image_xdata_in: _DataAndMetadataLike, template_xdata_in: _DataAndMetadataLike, ccorr_mask: typing.Optional[_DataAndMetadataLike] = None) -> typing.Tuple[_ImageDataType, _ImageDataType]:
+    """
+    Calculates and returns the positions of templates on images, the same as function_register_template, for a stack of
+    images and one template or for one image and a stack of templates. A stack has one more dimension than the other
+    input and is stacked along its first axis.
+    Returns a tuple of arrays (ccoeffs, positions) with the shapes (n,) and (n, ndim), where ndim is 1 or 2. Positions
+    whose cross-correlation peak is on the border of the image have a ccoeff of 0 and a position of 0, the same as
+    function_register_template.
+    If "ccorr_mask" is not "None", it should be a boolean array with the shape of one image. It is then used to mask the
+    cross-correlations before finding the maxima.
+    """
+    image_xdata = DataAndMetadata.promote_ndarray(image_xdata_in)
+    template_xdata = DataAndMetadata.promote_ndarray(template_xdata_in)
+    image_data = image_xdata.data
+    template_data = template_xdata.data
+    if not Image.is_data_valid(image_data) or not Image.is_data_valid(template_data):
+        raise ValueError("Register template: invalid data")
+    datum_ndim = min(len(image_xdata.data_shape), len(template_xdata.data_shape))
+    if datum_ndim not in (1, 2) or max(len(image_xdata.data_shape), len(template_xdata.data_shape)) != datum_ndim + 1:
+        raise ValueError("Register template: one input must be a stack of 1D or 2D data and the other 1D or 2D data")
+    image_shape = image_xdata.data_shape[-datum_ndim:]
+    if not numpy.less_equal(template_xdata.data_shape[-datum_ndim:], image_shape).all():
+        raise ValueError("Register template: template must not be larger than the image")
+    ccorr = TemplateMatching.match_template_batch(numpy.asarray(image_data), numpy.asarray(template_data), datum_ndim)
+    if ccorr_mask is not None:
+        ccorr *= DataAndMetadata.promote_ndarray(ccorr_mask).data
+    errors, values, positions = TemplateMatching.find_ccorr_max_batch(ccorr)
+    valid = errors == 0
+    ccoeffs = numpy.where(valid, values, 0.0)
+    positions = numpy.where(valid[:, numpy.newaxis], positions - numpy.array(image_shape) // 2, 0.0)
+    return ccoeffs, positions
+
+
 def function_shift(src_in: _DataAndMetadataLike, shift: typing.Tuple[float, ...], *, order: int = 1) -> DataAndMetadata.DataAndMetadata:
     src = DataAndMetadata.promote_ndarray(src_in)
     if not Image.is_data_valid(src.data):
@@ -459,19 +645,22 @@ def function_sequence_register_translation(src_in: _DataAndMetadataLike, subtrac
     src_shape = tuple(src.data_shape)
     s_shape = src_shape[0:-d_rank]
     c = int(numpy.prod(s_shape, dtype=numpy.uint64))
-    result = numpy.empty(s_shape + (d_rank, ))
-    previous_data = None
     src_data = src._data_ex
-    for i in range(c):
-        ii = numpy.unravel_index(i, s_shape) + (..., )
-        if previous_data is None:
-            previous_data = src_data[ii]
-            result[0, ...] = 0
-        else:
-            current_data = src_data[ii]
-            result[ii] = function_register(previous_data, current_data, subtract_means, bounds=bounds)
-            previous_data = current_data
-    intensity_calibration = src.dimensional_calibrations[1]  # not the sequence dimension
+    if numpy.issubdtype(src_data.dtype, numpy.complexfloating):
+        result = numpy.empty(s_shape + (d_rank, ))
+        previous_data = None
+        for i in range(c):
+            ii = numpy.unravel_index(i, s_shape) + (..., )
+            if previous_data is None:
+                previous_data = src_data[ii]
+                result[0, ...] = 0
+            else:
+                current_data = src_data[ii]
+                result[ii] = function_register(previous_data, current_data, subtract_means, bounds=bounds)
+                previous_data = current_data
+    else:
+        result = _register_frames(src_data, s_shape, d_rank, subtract_means, bounds).reshape(s_shape + (d_rank, ))
+    intensity_calibration = src._shared_dimensional_calibrations[1]  # not the sequence dimension
     return DataAndMetadata.new_data_and_metadata(data=result, intensity_calibration=intensity_calibration, data_descriptor=DataAndMetadata.DataDescriptor(True, 0, 1))
 
 
@@ -486,13 +675,17 @@ def function_sequence_measure_relative_translation(src_in: _DataAndMetadataLike,
     src_shape = tuple(src.data_shape)
     s_shape = src_shape[0:-d_rank]
     c = int(numpy.prod(s_shape, dtype=numpy.uint64))
-    result = numpy.empty(s_shape + (d_rank, ))
     src_data = src._data_ex
-    for i in range(c):
-        ii = numpy.unravel_index(i, s_shape)
-        current_data = src_data[ii]
-        result[ii] = function_register(ref_in, current_data, subtract_means, bounds=bounds)
-    intensity_calibration = src.dimensional_calibrations[1]  # not the sequence dimension
+    ref_data = DataAndMetadata.promote_ndarray(ref_in)._data_ex
+    if tuple(ref_data.shape) == src_shape[-d_rank:] and not numpy.issubdtype(src_data.dtype, numpy.complexfloating) and not numpy.issubdtype(ref_data.dtype, numpy.complexfloating):
+        result = _register_frames(src_data, s_shape, d_rank, subtract_means, bounds, ref_data).reshape(s_shape + (d_rank, ))
+    else:
+        result = numpy.empty(s_shape + (d_rank, ))
+        for i in range(c):
+            ii = numpy.unravel_index(i, s_shape)
+            current_data = src_data[ii]
+            result[ii] = function_register(ref_in, current_data, subtract_means, bounds=bounds)
+    intensity_calibration = src._shared_dimensional_calibrations[1]  # not the sequence dimension
     return DataAndMetadata.new_data_and_metadata(data=result, intensity_calibration=intensity_calibration, data_descriptor=DataAndMetadata.DataDescriptor(src.is_sequence, src.collection_dimension_count, 1))
 
 
@@ -501,7 +694,7 @@ def function_squeeze_measurement(src_in: _DataAndMetadataLike) -> DataAndMetadat
     src = DataAndMetadata.promote_ndarray(src_in)
     data = src._data_ex
     descriptor = src.data_descriptor
-    calibrations = list(src.dimensional_calibrations)
+    calibrations = list(src._shared_dimensional_calibrations)
     if descriptor.is_sequence and data.shape[0] == 1:
         data = numpy.squeeze(data, axis=0)
         descriptor = DataAndMetadata.DataDescriptor(False, descriptor.collection_dimension_count, descriptor.datum_dimension_count)
@@ -551,7 +744,7 @@ def function_sequence_align(src_in: _DataAndMetadataLike, bounds: typing.Optiona
         shift_xdata = function_shift(current_xdata, tuple(translation))
         if shift_xdata:
             result_data[ii] = shift_xdata.data
-    return DataAndMetadata.new_data_and_metadata(data=result_data, intensity_calibration=src.intensity_calibration, dimensional_calibrations=src.dimensional_calibrations, data_descriptor=src.data_descriptor)
+    return DataAndMetadata.new_data_and_metadata(data=result_data, intensity_calibration=src._shared_intensity_calibration, dimensional_calibrations=src._shared_dimensional_calibrations, data_descriptor=src.data_descriptor)
 
 
 def function_sequence_fourier_align(src_in: _DataAndMetadataLike, bounds: typing.Optional[typing.Union[NormRectangleType, NormIntervalType]] = None) -> DataAndMetadata.DataAndMetadata:
@@ -575,7 +768,7 @@ def function_sequence_fourier_align(src_in: _DataAndMetadataLike, bounds: typing
         shift_xdata = function_fourier_shift(current_xdata, tuple(translation))
         if shift_xdata:
             result_data[ii] = shift_xdata.data
-    return DataAndMetadata.new_data_and_metadata(data=result_data, intensity_calibration=src.intensity_calibration, dimensional_calibrations=src.dimensional_calibrations, data_descriptor=src.data_descriptor)
+    return DataAndMetadata.new_data_and_metadata(data=result_data, intensity_calibration=src._shared_intensity_calibration, dimensional_calibrations=src._shared_dimensional_calibrations, data_descriptor=src.data_descriptor)
 
 
 def function_sequence_integrate(src_in: _DataAndMetadataLike) -> DataAndMetadata.DataAndMetadata:
@@ -583,12 +776,94 @@ def function_sequence_integrate(src_in: _DataAndMetadataLike) -> DataAndMetadata
     if not (src.is_sequence or src.collection_dimension_count == 1):
         raise ValueError("Sequence integrate: source must be a 1D collection or a sequence.")
     result = numpy.sum(src._data_ex, axis=0)
-    intensity_calibration = src.intensity_calibration
-    dimensional_calibrations = src.dimensional_calibrations[1:]
+    intensity_calibration = src._shared_intensity_calibration
+    dimensional_calibrations = src._shared_dimensional_calibrations[1:]
     data_descriptor = DataAndMetadata.DataDescriptor(False, src.data_descriptor.collection_dimension_count, src.data_descriptor.datum_dimension_count)
     return DataAndMetadata.new_data_and_metadata(data=result, intensity_calibration=intensity_calibration, dimensional_calibrations=dimensional_calibrations, data_descriptor=data_descriptor)
 
 
+class SequenceIntegrator:
+    """Integrate a sequence one frame at a time, for instance while the frames are being acquired.
+
+    Pass each frame of the sequence to push. The running sum, mean, and variance are kept in float64 (complex128 for
+    complex frames) and can be retrieved after each frame without integrating the frames again. The calibrations and
+    data descriptor of the results are taken from the first frame, the same as function_sequence_integrate takes them
+    from the sequence. The sum has the same dtype as the result of function_sequence_integrate.
+    """
+
+    def __init__(self) -> None:
+        self.__count = 0
+        self.__frame_xdata: typing.Optional[DataAndMetadata.DataAndMetadata] = None
+        self.__sum: typing.Optional[_ImageDataType] = None
+        self.__mean: typing.Optional[_ImageDataType] = None
+        self.__m2: typing.Optional[_ImageDataType] = None
+
+    @property
+    def count(self) -> int:
+        """Return the number of frames pushed so far."""
+        return self.__count
+
+    def reset(self) -> None:
+        """Discard all frames pushed so far."""
+        self.__count = 0
+        self.__frame_xdata = None
+        self.__sum = None
+        self.__mean = None
+        self.__m2 = None
+
+    def push(self, frame_in: _DataAndMetadataLike) -> None:
+        """Add the next frame of the sequence. All frames must have the same shape."""
+        frame = DataAndMetadata.promote_ndarray(frame_in)
+        data = frame._data_ex
+        if not Image.is_data_valid(data):
+            raise ValueError("Sequence integrator: invalid data")
+        if self.__frame_xdata is None:
+            accumulator_dtype = numpy.complex128 if numpy.iscomplexobj(data) else numpy.float64
+            self.__frame_xdata = frame
+            self.__sum = numpy.zeros(data.shape, dtype=accumulator_dtype)
+            self.__mean = numpy.zeros(data.shape, dtype=accumulator_dtype)
+            self.__m2 = numpy.zeros(data.shape, dtype=numpy.float64)
+        elif frame.data_shape != self.__frame_xdata.data_shape:
+            raise ValueError("Sequence integrator: frames must have same shape.")
+        assert self.__sum is not None and self.__mean is not None and self.__m2 is not None
+        self.__count += 1
+        # Welford's algorithm for numerically stable running mean and variance.
+        delta = data - self.__mean
+        self.__sum += data
+        self.__mean += delta / self.__count
+        self.__m2 += numpy.real(numpy.conj(delta) * (data - self.__mean))
+
+    @property
+    def sum_xdata(self) -> typing.Optional[DataAndMetadata.DataAndMetadata]:
+        """Return the sum of the frames, or None if no frames have been pushed."""
+        if self.__frame_xdata is None or self.__sum is None:
+            return None
+        sum_dtype = numpy.sum(numpy.zeros((1,), dtype=self.__frame_xdata.data_dtype)).dtype
+        return self.__make_xdata(self.__sum.astype(sum_dtype))
+
+    @property
+    def mean_xdata(self) -> typing.Optional[DataAndMetadata.DataAndMetadata]:
+        """Return the mean of the frames, or None if no frames have been pushed."""
+        if self.__mean is None:
+            return None
+        return self.__make_xdata(self.__mean.copy())
+
+    def get_variance_xdata(self, ddof: int = 0) -> typing.Optional[DataAndMetadata.DataAndMetadata]:
+        """Return the variance of the frames, or None if there are not more than ddof frames.
+
+        The divisor is count - ddof, the same as numpy.var.
+        """
+        if self.__m2 is None or self.__count <= ddof:
+            return None
+        return self.__make_xdata(self.__m2 / (self.__count - ddof))
+
+    def __make_xdata(self, data: _ImageDataType) -> DataAndMetadata.DataAndMetadata:
+        frame = self.__frame_xdata
+        assert frame is not None
+        data_descriptor = DataAndMetadata.DataDescriptor(False, frame.data_descriptor.collection_dimension_count, frame.data_descriptor.datum_dimension_count)
+        return DataAndMetadata.new_data_and_metadata(data=data, intensity_calibration=frame._shared_intensity_calibration, dimensional_calibrations=frame._shared_dimensional_calibrations, data_descriptor=data_descriptor)
+
+
 def function_sequence_trim(src_in: _DataAndMetadataLike, trim_start: int, trim_end: int) -> DataAndMetadata.DataAndMetadata:
     src = DataAndMetadata.promote_ndarray(src_in)
     if not (src.is_sequence or src.collection_dimension_count == 1):
@@ -609,8 +884,8 @@ def function_sequence_insert(src1_in: _DataAndMetadataLike, src2_in: _DataAndMet
     c = src1.sequence_dimension_shape[0]
     channel = max(0, min(c, int(position)))
     result: numpy.typing.NDArray[typing.Any] = numpy.vstack([src1._data_ex[:channel], src2._data_ex, src1._data_ex[channel:]])
-    intensity_calibration = src1.intensity_calibration
-    dimensional_calibrations = src1.dimensional_calibrations
+    intensity_calibration = src1._shared_intensity_calibration
+    dimensional_calibrations = src1._shared_dimensional_calibrations
     data_descriptor = src1.data_descriptor
     return DataAndMetadata.new_data_and_metadata(data=result, intensity_calibration=intensity_calibration,
                                                  dimensional_calibrations=dimensional_calibrations,
@@ -634,10 +909,10 @@ def function_sequence_join(data_and_metadata_like_list: typing.Sequence[_DataAnd
         if xdata.is_sequence:
             return xdata
         sequence_data = numpy.reshape(data, (1,) + data.shape)
-        dimensional_calibrations = [Calibration.Calibration()] + list(xdata.dimensional_calibrations)
+        dimensional_calibrations = [Calibration.Calibration()] + list(xdata._shared_dimensional_calibrations)
         data_descriptor = DataAndMetadata.DataDescriptor(True, xdata.collection_dimension_count, xdata.datum_dimension_count)
         return DataAndMetadata.new_data_and_metadata(data=sequence_data, dimensional_calibrations=dimensional_calibrations,
-                                                     intensity_calibration=xdata.intensity_calibration,
+                                                     intensity_calibration=xdata._shared_intensity_calibration,
                                                      data_descriptor=data_descriptor)
 
     sequence_xdata_list = [ensure_sequence(xdata) for xdata in data_and_metadata_list]
@@ -762,158 +1037,120 @@ def function_fourier_mask(data_and_metadata_in: _DataAndMetadataIndeterminateSiz
     fourier_mask_data[:, x_half] = mask_data[:, x_half]
     masked_data: _ImageDataType = data * fourier_mask_data
 
-    return DataAndMetadata.new_data_and_metadata(data=masked_data, intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=data_and_metadata.dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=masked_data, intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=data_and_metadata._shared_dimensional_calibrations)
 
 
-def function_sobel(data_and_metadata_in: _DataAndMetadataLike) -> DataAndMetadata.DataAndMetadata:
-    data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
+def _get_out_data(out: typing.Optional[DataAndMetadata.DataAndMetadata], shape: DataAndMetadata.ShapeType,
+                  dtype: numpy.typing.DTypeLike, name: str) -> typing.Optional[_ImageDataType]:
+    # functions which take an out parameter write the result data into the data of out and return out. the
+    # calibrations of out are not changed. the data of out must have the shape and dtype of the result.
+    if out is None:
+        return None
+    out_data = out._data_ex
+    if tuple(out_data.shape) != tuple(shape) or out_data.dtype != numpy.dtype(dtype):
+        raise ValueError(f"{name}: output data shape or dtype does not match")
+    return out_data
 
-    def calculate_data() -> _ImageDataType:
-        data = data_and_metadata.data
-        assert data is not None
-        if Image.is_shape_and_dtype_rgb(data.shape, data.dtype):
-            rgb: numpy.typing.NDArray[numpy.uint8] = numpy.empty(data.shape[:-1] + (3,), numpy.uint8)
-            rgb[..., 0] = scipy.ndimage.sobel(data[..., 0])
-            rgb[..., 1] = scipy.ndimage.sobel(data[..., 1])
-            rgb[..., 2] = scipy.ndimage.sobel(data[..., 2])
-            return rgb
-        elif Image.is_shape_and_dtype_rgba(data.shape, data.dtype):
-            rgba: numpy.typing.NDArray[numpy.uint8] = numpy.empty(data.shape[:-1] + (4,), numpy.uint8)
-            rgba[..., 0] = scipy.ndimage.sobel(data[..., 0])
-            rgba[..., 1] = scipy.ndimage.sobel(data[..., 1])
-            rgba[..., 2] = scipy.ndimage.sobel(data[..., 2])
-            rgba[..., 3] = data[..., 3]
-            return rgba
-        else:
-            return scipy.ndimage.sobel(data)  # type: ignore
+
+def _filter_channels(fn: typing.Callable[[_ImageDataType, _ImageDataType], typing.Any], data: _ImageDataType, result: _ImageDataType, *, filter_alpha: bool = False) -> None:
+    # call fn(input, output) for the data, or for each color channel if the data is rgb or rgba. the alpha channel of
+    # rgba data is copied unchanged unless filter_alpha is True, in which case result may have a different shape.
+    # color channels are filtered concurrently using the shared worker pool, each as a contiguous plane.
+    if Image.is_shape_and_dtype_rgb_type(data.shape, data.dtype):
+        is_rgba = data.shape[-1] == 4
+
+        def filter_channel(channel: int) -> None:
+            output_plane = numpy.empty(result.shape[:-1], result.dtype)
+            fn(numpy.ascontiguousarray(data[..., channel]), output_plane)
+            result[..., channel] = output_plane
+
+        Parallel.run(filter_channel, range(4 if is_rgba and filter_alpha else 3))
+        if is_rgba and not filter_alpha:
+            result[..., 3] = data[..., 3]
+    else:
+        fn(data, result)
+
+
+def _new_filtered_data_and_metadata(data_and_metadata: DataAndMetadata.DataAndMetadata, fn: typing.Callable[[_ImageDataType, _ImageDataType], typing.Any],
+                                    out: typing.Optional[DataAndMetadata.DataAndMetadata], name: str) -> DataAndMetadata.DataAndMetadata:
+    data = data_and_metadata._data_ex
+    out_data = _get_out_data(out, data.shape, data.dtype, name)
+    result = out_data if out_data is not None else numpy.empty(data.shape, data.dtype)
+    _filter_channels(fn, data, result)
+    if out is not None:
+        return out
+    return DataAndMetadata.new_data_and_metadata(data=result, intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=data_and_metadata._shared_dimensional_calibrations)
+
+
+def function_sobel(data_and_metadata_in: _DataAndMetadataLike, *, out: typing.Optional[DataAndMetadata.DataAndMetadata] = None) -> DataAndMetadata.DataAndMetadata:
+    data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Sobel: invalid data")
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=data_and_metadata.dimensional_calibrations)
+    def sobel(data: _ImageDataType, output: _ImageDataType) -> None:
+        scipy.ndimage.sobel(data, output=output)
 
+    return _new_filtered_data_and_metadata(data_and_metadata, sobel, out, "Sobel")
 
-def function_laplace(data_and_metadata_in: _DataAndMetadataLike) -> DataAndMetadata.DataAndMetadata:
-    data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
-    def calculate_data() -> _ImageDataType:
-        data = data_and_metadata.data
-        assert data is not None
-        if Image.is_shape_and_dtype_rgb(data.shape, data.dtype):
-            rgb: numpy.typing.NDArray[numpy.uint8] = numpy.empty(data.shape[:-1] + (3,), numpy.uint8)
-            rgb[..., 0] = scipy.ndimage.laplace(data[..., 0])
-            rgb[..., 1] = scipy.ndimage.laplace(data[..., 1])
-            rgb[..., 2] = scipy.ndimage.laplace(data[..., 2])
-            return rgb
-        elif Image.is_shape_and_dtype_rgba(data.shape, data.dtype):
-            rgba: numpy.typing.NDArray[numpy.uint8] = numpy.empty(data.shape[:-1] + (4,), numpy.uint8)
-            rgba[..., 0] = scipy.ndimage.laplace(data[..., 0])
-            rgba[..., 1] = scipy.ndimage.laplace(data[..., 1])
-            rgba[..., 2] = scipy.ndimage.laplace(data[..., 2])
-            rgba[..., 3] = data[..., 3]
-            return rgba
-        else:
-            return scipy.ndimage.laplace(data)  # type: ignore
+def function_laplace(data_and_metadata_in: _DataAndMetadataLike, *, out: typing.Optional[DataAndMetadata.DataAndMetadata] = None) -> DataAndMetadata.DataAndMetadata:
+    data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Laplace: invalid data")
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=data_and_metadata.dimensional_calibrations)
+    def laplace(data: _ImageDataType, output: _ImageDataType) -> None:
+        scipy.ndimage.laplace(data, output=output)
+
+    return _new_filtered_data_and_metadata(data_and_metadata, laplace, out, "Laplace")
 
 
-def function_gaussian_blur(data_and_metadata_in: _DataAndMetadataLike, sigma: float) -> DataAndMetadata.DataAndMetadata:
+def function_gaussian_blur(data_and_metadata_in: _DataAndMetadataLike, sigma: float, *, out: typing.Optional[DataAndMetadata.DataAndMetadata] = None) -> DataAndMetadata.DataAndMetadata:
     data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Gaussian blur: invalid data")
 
-    new_data: _ImageDataType
-    data = data_and_metadata._data_ex
-    if Image.is_shape_and_dtype_rgb(data.shape, data.dtype):
-        rgb: numpy.typing.NDArray[numpy.uint8] = numpy.empty(data.shape[:-1] + (3,), numpy.uint8)
-        rgb[..., 0] = scipy.ndimage.gaussian_filter(data[..., 0], sigma=sigma)
-        rgb[..., 1] = scipy.ndimage.gaussian_filter(data[..., 1], sigma=sigma)
-        rgb[..., 2] = scipy.ndimage.gaussian_filter(data[..., 2], sigma=sigma)
-        new_data = rgb
-    elif Image.is_shape_and_dtype_rgba(data.shape, data.dtype):
-        rgba: numpy.typing.NDArray[numpy.uint8] = numpy.empty(data.shape[:-1] + (4,), numpy.uint8)
-        rgba[..., 0] = scipy.ndimage.gaussian_filter(data[..., 0], sigma=sigma)
-        rgba[..., 1] = scipy.ndimage.gaussian_filter(data[..., 1], sigma=sigma)
-        rgba[..., 2] = scipy.ndimage.gaussian_filter(data[..., 2], sigma=sigma)
-        rgba[..., 3] = data[..., 3]
-        new_data = rgba
-    else:
-        new_data = scipy.ndimage.gaussian_filter(data, sigma=sigma)
+    def gaussian_filter(data: _ImageDataType, output: _ImageDataType) -> None:
+        scipy.ndimage.gaussian_filter(data, sigma=sigma, output=output)
 
-    return DataAndMetadata.new_data_and_metadata(data=new_data, intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=data_and_metadata.dimensional_calibrations)
+    return _new_filtered_data_and_metadata(data_and_metadata, gaussian_filter, out, "Gaussian blur")
 
 
-def function_median_filter(data_and_metadata_in: _DataAndMetadataLike, size: int) -> DataAndMetadata.DataAndMetadata:
+def function_median_filter(data_and_metadata_in: _DataAndMetadataLike, size: int, *, out: typing.Optional[DataAndMetadata.DataAndMetadata] = None) -> DataAndMetadata.DataAndMetadata:
     data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
     size = max(min(int(size), 999), 1)
 
-    def calculate_data() -> _ImageDataType:
-        data = data_and_metadata.data
-        assert data is not None
-        if Image.is_shape_and_dtype_rgb(data.shape, data.dtype):
-            rgb: numpy.typing.NDArray[numpy.uint8] = numpy.empty(data.shape[:-1] + (3,), numpy.uint8)
-            rgb[..., 0] = scipy.ndimage.median_filter(data[..., 0], size=size)
-            rgb[..., 1] = scipy.ndimage.median_filter(data[..., 1], size=size)
-            rgb[..., 2] = scipy.ndimage.median_filter(data[..., 2], size=size)
-            return rgb
-        elif Image.is_shape_and_dtype_rgba(data.shape, data.dtype):
-            rgba: numpy.typing.NDArray[numpy.uint8] = numpy.empty(data.shape[:-1] + (4,), numpy.uint8)
-            rgba[..., 0] = scipy.ndimage.median_filter(data[..., 0], size=size)
-            rgba[..., 1] = scipy.ndimage.median_filter(data[..., 1], size=size)
-            rgba[..., 2] = scipy.ndimage.median_filter(data[..., 2], size=size)
-            rgba[..., 3] = data[..., 3]
-            return rgba
-        else:
-            return scipy.ndimage.median_filter(data, size=size)  # type: ignore
-
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Median filter: invalid data")
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=data_and_metadata.dimensional_calibrations)
+    def median_filter(data: _ImageDataType, output: _ImageDataType) -> None:
+        scipy.ndimage.median_filter(data, size=size, output=output)
 
+    return _new_filtered_data_and_metadata(data_and_metadata, median_filter, out, "Median filter")
 
-def function_uniform_filter(data_and_metadata_in: _DataAndMetadataLike, size: int) -> DataAndMetadata.DataAndMetadata:
+
+def function_uniform_filter(data_and_metadata_in: _DataAndMetadataLike, size: int, *, out: typing.Optional[DataAndMetadata.DataAndMetadata] = None) -> DataAndMetadata.DataAndMetadata:
     data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
     size = max(min(int(size), 999), 1)
 
-    def calculate_data() -> _ImageDataType:
-        data = data_and_metadata.data
-        assert data is not None
-        if Image.is_shape_and_dtype_rgb(data.shape, data.dtype):
-            rgb: numpy.typing.NDArray[numpy.uint8] = numpy.empty(data.shape[:-1] + (3,), numpy.uint8)
-            rgb[..., 0] = scipy.ndimage.uniform_filter(data[..., 0], size=size)
-            rgb[..., 1] = scipy.ndimage.uniform_filter(data[..., 1], size=size)
-            rgb[..., 2] = scipy.ndimage.uniform_filter(data[..., 2], size=size)
-            return rgb
-        elif Image.is_shape_and_dtype_rgba(data.shape, data.dtype):
-            rgba: numpy.typing.NDArray[numpy.uint8] = numpy.empty(data.shape[:-1] + (4,), numpy.uint8)
-            rgba[..., 0] = scipy.ndimage.uniform_filter(data[..., 0], size=size)
-            rgba[..., 1] = scipy.ndimage.uniform_filter(data[..., 1], size=size)
-            rgba[..., 2] = scipy.ndimage.uniform_filter(data[..., 2], size=size)
-            rgba[..., 3] = data[..., 3]
-            return rgba
-        else:
-            return scipy.ndimage.uniform_filter(data, size=size)  # type: ignore
-
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Uniform filter: invalid data")
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=data_and_metadata.dimensional_calibrations)
+    def uniform_filter(data: _ImageDataType, output: _ImageDataType) -> None:
+        scipy.ndimage.uniform_filter(data, size=size, output=output)
 
+    return _new_filtered_data_and_metadata(data_and_metadata, uniform_filter, out, "Uniform filter")
 
-def function_transpose_flip(data_and_metadata_in: _DataAndMetadataLike, transpose: bool = False, flip_v: bool = False, flip_h: bool = False) -> DataAndMetadata.DataAndMetadata:
+
+def function_transpose_flip(data_and_metadata_in: _DataAndMetadataLike, transpose: bool = False, flip_v: bool = False, flip_h: bool = False, *, out: typing.Optional[DataAndMetadata.DataAndMetadata] = None) -> DataAndMetadata.DataAndMetadata:
     data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
     def calculate_data() -> _ImageDataType:
         data = data_and_metadata._data_ex
-        data_id = id(data)
         if transpose:
             if Image.is_shape_and_dtype_rgb_type(data.shape, data.dtype):
                 data = numpy.transpose(data, [1, 0, 2])
@@ -924,44 +1161,50 @@ def function_transpose_flip(data_and_metadata_in: _DataAndMetadataLike, transpos
         if flip_v and len(data_and_metadata.data_shape) == 2:
             data = numpy.flipud(data)
         assert data is not None  # this is required, seems to be a bug in mypy about reassignment
-        if id(data) == data_id:  # ensure real data, not a view
-            return numpy.copy(data)
-        else:
-            return data
+        return data
 
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Transpose flip: invalid data")
 
     if transpose:
-        dimensional_calibrations = list(reversed(data_and_metadata.dimensional_calibrations))
+        dimensional_calibrations = list(reversed(data_and_metadata._shared_dimensional_calibrations))
     else:
-        dimensional_calibrations = list(data_and_metadata.dimensional_calibrations)
+        dimensional_calibrations = list(data_and_metadata._shared_dimensional_calibrations)
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=dimensional_calibrations)
+    data = calculate_data()
+    out_data = _get_out_data(out, data.shape, data.dtype, "Transpose flip")
+    if out is not None:
+        assert out_data is not None
+        numpy.copyto(out_data, data)
+        return out
 
+    if data is data_and_metadata._data_ex:  # ensure real data, not a view
+        data = numpy.copy(data)
 
-def function_invert(data_and_metadata_in: _DataAndMetadataLike) -> DataAndMetadata.DataAndMetadata:
-    data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
+    return DataAndMetadata.new_data_and_metadata(data=data, intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=dimensional_calibrations)
 
-    def calculate_data() -> _ImageDataType:
-        data = data_and_metadata.data
-        assert data is not None
-        if Image.is_shape_and_dtype_rgb_type(data.shape, data.dtype):
-            if Image.is_data_rgba(data):
-                inverted = 255 - data[:]
-                inverted[..., 3] = data[..., 3]
-                return inverted
-            else:
-                return 255 - data[:]
-        else:
-            return -data[:]
+
+def function_invert(data_and_metadata_in: _DataAndMetadataLike, *, out: typing.Optional[DataAndMetadata.DataAndMetadata] = None) -> DataAndMetadata.DataAndMetadata:
+    data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Invert: invalid data")
 
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    data = data_and_metadata._data_ex
+    out_data = _get_out_data(out, data.shape, data.dtype, "Invert")
+    result = out_data if out_data is not None else numpy.empty(data.shape, data.dtype)
+    if Image.is_shape_and_dtype_rgb_type(data.shape, data.dtype):
+        numpy.subtract(numpy.uint8(255), data, out=result)
+        if Image.is_data_rgba(data):
+            result[..., 3] = data[..., 3]
+    else:
+        numpy.negative(data, out=result)
+    if out is not None:
+        return out
+
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=result, intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=dimensional_calibrations)
 
 
 def function_crop(data_and_metadata_in: _DataAndMetadataLike, bounds: NormRectangleType) -> DataAndMetadata.DataAndMetadata:
@@ -971,7 +1214,7 @@ def function_crop(data_and_metadata_in: _DataAndMetadataLike, bounds: NormRectan
 
     data_shape = Geometry.IntSize.make(typing.cast(Geometry.SizeIntTuple, data_and_metadata.data_shape))
 
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
 
     data = data_and_metadata._data_ex
 
@@ -1031,63 +1274,103 @@ def function_crop(data_and_metadata_in: _DataAndMetadataLike, bounds: NormRectan
             dimensional_calibration.scale, dimensional_calibration.units)
         cropped_dimensional_calibrations.append(cropped_calibration)
 
-    return DataAndMetadata.new_data_and_metadata(data=new_data, intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=cropped_dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=new_data, intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=cropped_dimensional_calibrations)
 
 
-def function_crop_rotated(data_and_metadata_in: _DataAndMetadataLike, bounds: NormRectangleType, angle: float) -> DataAndMetadata.DataAndMetadata:
-    bounds_rect = Geometry.FloatRect.make(bounds)
+# the margin in pixels around the rotated rectangle included when the image is prefiltered for spline interpolation.
+# the effect of a pixel on the prefiltered values decays by a factor of about four per pixel of distance, so pixels
+# outside of the margin do not measurably change the result.
+_CROP_ROTATED_MARGIN = 24
 
-    data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
-    data_shape = Geometry.IntSize.make(typing.cast(Geometry.SizeIntTuple, data_and_metadata.data_shape))
+def function_crop_rotated(data_and_metadata_in: _DataAndMetadataLike, bounds: NormRectangleType, angle: float, *,
+                          out: typing.Optional[DataAndMetadata.DataAndMetadata] = None) -> DataAndMetadata.DataAndMetadata:
+    """Return the rectangle bounds rotated by angle around its center, sampled with cubic spline interpolation.
 
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    Data with a 2D datum and navigation axes (for instance a sequence of images) is cropped in each datum. The sample
+    coordinates are calculated once for all frames, and only the part of the image around the rectangle is read and
+    prefiltered.
+    """
+    bounds_rect = Geometry.FloatRect.make(bounds)
+
+    data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
     data = data_and_metadata._data_ex
 
     if not Image.is_data_valid(data):
         raise ValueError("Crop rotated: invalid data")
 
+    is_batch = data_and_metadata.is_navigable and data_and_metadata.datum_dimension_count == 2
+    if not Image.is_data_2d(data) and not is_batch:
+        raise ValueError("Crop rotated: data must be 2D or have a 2D datum")
+
+    dimensional_shape = data_and_metadata.dimensional_shape
+    navigation_shape = tuple(dimensional_shape[:-2])
+    channel_shape = tuple(data.shape[len(dimensional_shape):])
+    data_shape = Geometry.IntSize.make(typing.cast(Geometry.SizeIntTuple, dimensional_shape[-2:]))
+
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
+
     top = round(data_shape.height * bounds_rect.top)
     left = round(data_shape.width * bounds_rect.left)
     height = round(data_shape.height * bounds_rect.height)
     width = round(data_shape.width * bounds_rect.width)
 
-    y: _ImageDataType
-    x: _ImageDataType
-    y, x = numpy.meshgrid(numpy.arange(-(width // 2), width - width // 2), numpy.arange(-(height // 2), height - height // 2))
-
     angle_sin = math.sin(angle)
     angle_cos = math.cos(angle)
 
-    # this ugly casting is necessary to work around incomplete numpy typing
-    coords = [
-        (top + height // 2 + ((x * angle_cos) - (y * angle_sin))),
-        (left + width // 2 + ((y * angle_cos) + (x * angle_sin)))]
-
-    new_data: numpy.typing.NDArray[numpy.uint8]
-    if data_and_metadata.is_data_rgb:
-        new_data = numpy.zeros(coords[0].shape + (3,), numpy.uint8)
-        new_data[..., 0] = scipy.ndimage.map_coordinates(data[..., 0], coords)
-        new_data[..., 1] = scipy.ndimage.map_coordinates(data[..., 1], coords)
-        new_data[..., 2] = scipy.ndimage.map_coordinates(data[..., 2], coords)
-    elif data_and_metadata.is_data_rgba:
-        new_data = numpy.zeros(coords[0].shape + (4,), numpy.uint8)
-        new_data[..., 0] = scipy.ndimage.map_coordinates(data[..., 0], coords)
-        new_data[..., 1] = scipy.ndimage.map_coordinates(data[..., 1], coords)
-        new_data[..., 2] = scipy.ndimage.map_coordinates(data[..., 2], coords)
-        new_data[..., 3] = scipy.ndimage.map_coordinates(data[..., 3], coords)
+    # the output pixel (i, j) samples the input at the pixel (i - height // 2, j - width // 2) relative to the center
+    # pixel (top + height // 2, left + width // 2), rotated by angle. the coordinates are calculated this way, rather
+    # than as an affine transform of (i, j), so that samples on the edge of the image are exactly on the edge instead of
+    # being rounded to just outside of it, where they would be zero.
+    x, y = numpy.meshgrid(numpy.arange(-(height // 2), height - height // 2), numpy.arange(-(width // 2), width - width // 2), indexing="ij")
+    coords: _ImageDataType = numpy.array([top + height // 2 + (x * angle_cos - y * angle_sin),
+                                          left + width // 2 + (y * angle_cos + x * angle_sin)])
+
+    # the part of the image around the rotated rectangle.
+    image_shape = numpy.array([data_shape.height, data_shape.width])
+    coords_min = coords.min(axis=(1, 2)) if coords.size > 0 else numpy.zeros(2)
+    coords_max = coords.max(axis=(1, 2)) if coords.size > 0 else numpy.zeros(2)
+    box_top_left = numpy.clip(numpy.floor(coords_min).astype(int) - _CROP_ROTATED_MARGIN, 0, image_shape)
+    box_bottom_right = numpy.clip(numpy.ceil(coords_max).astype(int) + _CROP_ROTATED_MARGIN + 1, 0, image_shape)
+    box_slices = tuple(slice(int(start), int(stop)) for start, stop in zip(box_top_left, box_bottom_right))
+
+    result_shape = navigation_shape + (height, width) + channel_shape
+    out_data = _get_out_data(out, result_shape, data.dtype, "Crop rotated")
+    result = out_data if out_data is not None else numpy.empty(result_shape, data.dtype)
+
+    if numpy.all(box_bottom_right > box_top_left):
+        box_data = numpy.asarray(data[(Ellipsis,) + box_slices + (slice(None),) * len(channel_shape)])
+        # subtracting the integer box position keeps the coordinates on the edge of the image exact.
+        box_coords = coords - box_top_left.reshape(2, 1, 1)
+
+        def map_coordinates(data: _ImageDataType, output: _ImageDataType) -> None:
+            scipy.ndimage.map_coordinates(data, box_coords, output=output)
+
+        frame_indexes = list(numpy.ndindex(navigation_shape))
+
+        def crop_frames(frame_range: range) -> None:
+            for frame_index in frame_range:
+                index = frame_indexes[frame_index]
+                _filter_channels(map_coordinates, box_data[index], result[index], filter_alpha=True)
+                Parallel.check_cancelled()
+
+        Parallel.run(crop_frames, Parallel.split_range(0, len(frame_indexes)))
     else:
-        new_data = scipy.ndimage.map_coordinates(data, coords)
+        # the rectangle is outside of the image.
+        result[...] = 0
 
-    cropped_dimensional_calibrations = list()
-    for index, dimensional_calibration in enumerate(dimensional_calibrations):
+    if out is not None:
+        return out
+
+    cropped_dimensional_calibrations = list(dimensional_calibrations[:len(navigation_shape)])
+    for index, dimensional_calibration in enumerate(dimensional_calibrations[len(navigation_shape):]):
         cropped_calibration = Calibration.Calibration(
             dimensional_calibration.offset + data_shape[index] * bounds_rect[0][index] * dimensional_calibration.scale,
             dimensional_calibration.scale, dimensional_calibration.units)
         cropped_dimensional_calibrations.append(cropped_calibration)
 
-    return DataAndMetadata.new_data_and_metadata(data=new_data, intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=cropped_dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=result, intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=cropped_dimensional_calibrations, data_descriptor=data_and_metadata.data_descriptor)
 
 
 def function_crop_interval(data_and_metadata_in: _DataAndMetadataLike, interval: NormIntervalType) -> DataAndMetadata.DataAndMetadata:
@@ -1101,7 +1384,7 @@ def function_crop_interval(data_and_metadata_in: _DataAndMetadataLike, interval:
         interval_int = int(data_shape[0] * interval[0]), int(data_shape[0] * interval[1])
         return data[interval_int[0]:interval_int[1]].copy()
 
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
 
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Crop interval: invalid data")
@@ -1115,7 +1398,7 @@ def function_crop_interval(data_and_metadata_in: _DataAndMetadataLike, interval:
         dimensional_calibration.scale, dimensional_calibration.units)
     cropped_dimensional_calibrations.append(cropped_calibration)
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=cropped_dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=cropped_dimensional_calibrations)
 
 
 def function_slice_sum(data_and_metadata_in: _DataAndMetadataLike, slice_center: int, slice_width: int) -> DataAndMetadata.DataAndMetadata:
@@ -1132,7 +1415,7 @@ def function_slice_sum(data_and_metadata_in: _DataAndMetadataLike, slice_center:
         slice_end = min(shape[signal_index], slice_end)
         return typing.cast(_ImageDataType, numpy.sum(data[..., slice_start:slice_end], signal_index))
 
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
 
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Slice sum: invalid data")
@@ -1141,7 +1424,7 @@ def function_slice_sum(data_and_metadata_in: _DataAndMetadataLike, slice_center:
 
     return DataAndMetadata.new_data_and_metadata(
         data=calculate_data(),
-        intensity_calibration=data_and_metadata.intensity_calibration,
+        intensity_calibration=data_and_metadata._shared_intensity_calibration,
         dimensional_calibrations=dimensional_calibrations,
         timestamp=data_and_metadata.timestamp,
         timezone=data_and_metadata.timezone,
@@ -1170,7 +1453,7 @@ def function_pick(data_and_metadata_in: _DataAndMetadataLike, position: PickPosi
         position_i.append(...)
         return data[tuple(position_i)].copy()
 
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
     data_descriptor = DataAndMetadata.DataDescriptor(data_and_metadata.is_sequence, 0, data_and_metadata.datum_dimension_count)
 
     if len(position) != data_and_metadata.collection_dimension_count:
@@ -1182,7 +1465,7 @@ def function_pick(data_and_metadata_in: _DataAndMetadataLike, position: PickPosi
         dimensional_calibrations = list(dimensional_calibrations[data_and_metadata.datum_dimension_slice])
 
     return DataAndMetadata.new_data_and_metadata(data=calculate_data(),
-                                                 intensity_calibration=data_and_metadata.intensity_calibration,
+                                                 intensity_calibration=data_and_metadata._shared_intensity_calibration,
                                                  dimensional_calibrations=dimensional_calibrations,
                                                  data_descriptor=data_descriptor)
 
@@ -1213,15 +1496,15 @@ def function_concatenate(data_and_metadata_like_list: typing.Sequence[_DataAndMe
     if any([data_and_metadata.data_shape != partial_shape[1:] is None for data_and_metadata in data_and_metadata_list]):
         raise ValueError("Concatenate: all data must have same shape.")
 
-    dimensional_calibrations: typing.List[Calibration.Calibration] = [typing.cast(Calibration.Calibration, None)] * len(data_and_metadata_list[0].dimensional_calibrations)
+    dimensional_calibrations: typing.List[Calibration.Calibration] = [typing.cast(Calibration.Calibration, None)] * len(data_and_metadata_list[0]._shared_dimensional_calibrations)
     for data_and_metadata in data_and_metadata_list:
-        for index, calibration in enumerate(data_and_metadata.dimensional_calibrations):
+        for index, calibration in enumerate(data_and_metadata._shared_dimensional_calibrations):
             if dimensional_calibrations[index] is None:
                 dimensional_calibrations[index] = calibration
             elif dimensional_calibrations[index] != calibration:
                 dimensional_calibrations[index] = Calibration.Calibration()
 
-    intensity_calibration = data_and_metadata_list[0].intensity_calibration
+    intensity_calibration = data_and_metadata_list[0]._shared_intensity_calibration
     data_descriptor = data_and_metadata_list[0].data_descriptor
 
     data_list = list(data_and_metadata.data for data_and_metadata in data_and_metadata_list)
@@ -1285,9 +1568,9 @@ def function_vstack(data_and_metadata_like_list: typing.Sequence[_DataAndMetadat
 
     dimensional_calibrations = list()
     dimensional_calibrations.append(Calibration.Calibration())
-    dimensional_calibrations.append(data_and_metadata_list[0].dimensional_calibrations[0])
+    dimensional_calibrations.append(data_and_metadata_list[0]._shared_dimensional_calibrations[0])
 
-    intensity_calibration = data_and_metadata_list[0].intensity_calibration
+    intensity_calibration = data_and_metadata_list[0]._shared_intensity_calibration
 
     data_descriptor = data_and_metadata_list[0].data_descriptor
 
@@ -1308,7 +1591,70 @@ def function_moveaxis(data_and_metadata_in: _DataAndMetadataLike, src_axis: int,
 
     dimensional_calibrations.insert(dst_axis, dimensional_calibrations.pop(src_axis))
 
-    return DataAndMetadata.new_data_and_metadata(data=data, intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=data, intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=dimensional_calibrations)
+
+
+# the approximate size of each block read from storage backed (h5py) data during a reduction.
+_REDUCTION_BLOCK_SIZE = 64 * 1024 * 1024
+
+
+def _iterate_storage_blocks(shape: DataAndMetadata.ShapeType, chunks: typing.Optional[DataAndMetadata.ShapeType], item_size: int) -> typing.Iterator[typing.Tuple[slice, ...]]:
+    # yield blocks covering shape. blocks are aligned to the storage chunks and are approximately the reduction block size.
+    chunk_shape = [min(c, n) for c, n in zip(chunks, shape)] if chunks else [1] * len(shape)
+    block_shape = list(chunk_shape)
+    for i in reversed(range(len(shape))):
+        other_size = max(1, math.prod(block_shape[:i] + block_shape[i + 1:]) * item_size)
+        count = max(1, _REDUCTION_BLOCK_SIZE // other_size)
+        if count >= shape[i]:
+            block_shape[i] = shape[i]
+        else:
+            block_shape[i] = max(chunk_shape[i], count // max(1, chunk_shape[i]) * chunk_shape[i])
+            break
+    for origin in itertools.product(*(range(0, n, max(1, b)) for n, b in zip(shape, block_shape))):
+        yield tuple(slice(o, min(o + b, n)) for o, b, n in zip(origin, block_shape, shape))
+
+
+def _sum_storage_blocks(data: typing.Any, axis: int | typing.Sequence[int] | None, where: typing.Optional[_ImageDataType] = None) -> _ImageDataType:
+    # sum storage backed data one block at a time, keeping the reduced dimensions. floating point data is accumulated
+    # in float64 (complex128); integer data is accumulated in the integer type numpy uses for sums.
+    shape = tuple(data.shape)
+    axes = tuple(range(len(shape))) if axis is None else tuple(a % len(shape) for a in numpy.atleast_1d(axis))
+    sum_dtype = numpy.sum(numpy.zeros((1,), dtype=data.dtype)).dtype
+    accumulator_dtype = numpy.result_type(sum_dtype, numpy.float64) if numpy.issubdtype(sum_dtype, numpy.inexact) else sum_dtype
+    accumulator = numpy.zeros(tuple(1 if i in axes else n for i, n in enumerate(shape)), dtype=accumulator_dtype)
+    where_data = numpy.broadcast_to(where, shape) if where is not None else None
+    for block in _iterate_storage_blocks(shape, getattr(data, "chunks", None), data.dtype.itemsize):
+        values = numpy.asarray(data[block])
+        target = tuple(slice(0, 1) if i in axes else s for i, s in enumerate(block))
+        if where_data is not None:
+            accumulator[target] += numpy.sum(values, axis=axes, dtype=accumulator_dtype, keepdims=True, where=where_data[block])
+        else:
+            accumulator[target] += numpy.sum(values, axis=axes, dtype=accumulator_dtype, keepdims=True)
+        del values
+    return accumulator
+
+
+def _sum_data(data: typing.Any, axis: int | typing.Sequence[int] | None, keepdims: bool = False, where: typing.Optional[_ImageDataType] = None) -> _ImageDataType:
+    # sum data, reading storage backed (h5py) data in blocks so that it is never fully loaded into memory. sparse data
+    # is summed from its events.
+    if isinstance(data, Sparse.EventArray):
+        return data.sum(axis, keepdims=keepdims, where=where)
+    if isinstance(data, numpy.ndarray):
+        if where is not None:
+            return typing.cast(_ImageDataType, numpy.sum(data, typing.cast(typing.Any, axis), keepdims=keepdims, where=where))
+        return typing.cast(_ImageDataType, numpy.sum(data, typing.cast(typing.Any, axis), keepdims=keepdims))
+    result = _sum_storage_blocks(data, axis, where)
+    result = result.astype(numpy.sum(numpy.zeros((1,), dtype=data.dtype)).dtype, copy=False)
+    return result if keepdims else numpy.squeeze(result, axis=typing.cast(typing.Any, axis))
+
+
+def _mean_data(data: typing.Any, axis: int | typing.Sequence[int] | None, keepdims: bool = False) -> _ImageDataType:
+    # average data, reading storage backed (h5py) data in blocks so that it is never fully loaded into memory.
+    if isinstance(data, numpy.ndarray):
+        return typing.cast(_ImageDataType, numpy.mean(data, typing.cast(typing.Any, axis), keepdims=keepdims))
+    result = _sum_storage_blocks(data, axis)
+    result = typing.cast(_ImageDataType, result / max(1, data.size // max(1, result.size))).astype(numpy.mean(numpy.zeros((1,), dtype=data.dtype)).dtype, copy=False)
+    return result if keepdims else numpy.squeeze(result, axis=typing.cast(typing.Any, axis))
 
 
 def function_sum(data_and_metadata_in: _DataAndMetadataLike, axis: int | tuple[int, ...] | None = None, keepdims: bool = False) -> DataAndMetadata.DataAndMetadata:
@@ -1335,12 +1681,12 @@ def function_sum(data_and_metadata_in: _DataAndMetadataLike, axis: int | tuple[i
                 rgba_image[:, 3] = numpy.average(data[..., 3], axis)
                 return rgba_image
         else:
-            return typing.cast(_ImageDataType, numpy.sum(data, typing.cast(typing.Any, axis), keepdims=keepdims))
+            return _sum_data(data, axis, keepdims)
 
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Sum: invalid data")
 
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
 
     new_dimensional_calibrations = list()
 
@@ -1356,7 +1702,7 @@ def function_sum(data_and_metadata_in: _DataAndMetadataLike, axis: int | tuple[i
 
     dimensional_calibrations = new_dimensional_calibrations
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=dimensional_calibrations)
 
 
 def function_mean(data_and_metadata_in: _DataAndMetadataLike, axis: int | tuple[int, ...] | None = None, keepdims: bool = False) -> DataAndMetadata.DataAndMetadata:
@@ -1383,12 +1729,12 @@ def function_mean(data_and_metadata_in: _DataAndMetadataLike, axis: int | tuple[
                 rgba_image[:, 3] = numpy.average(data[..., 3], axis)
                 return rgba_image
         else:
-            return typing.cast(_ImageDataType, numpy.mean(data, axis, keepdims=keepdims))
+            return _mean_data(data, axis, keepdims)
 
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Mean: invalid data")
 
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
 
     new_dimensional_calibrations = list()
 
@@ -1404,10 +1750,11 @@ def function_mean(data_and_metadata_in: _DataAndMetadataLike, axis: int | tuple[
 
     dimensional_calibrations = new_dimensional_calibrations
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=dimensional_calibrations)
 
 
-def function_sum_region(data_and_metadata_in: _DataAndMetadataLike, mask_data_and_metadata_in: _DataAndMetadataLike) -> DataAndMetadata.DataAndMetadata:
+def _function_sum_region(data_and_metadata_in: _DataAndMetadataLike, mask_data_and_metadata_in: _DataAndMetadataLike, is_average: bool) -> DataAndMetadata.DataAndMetadata:
+    # sum or average the datums of a collection, or of each collection in a sequence, within the mask.
     data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
     mask_data_and_metadata = DataAndMetadata.promote_ndarray(mask_data_and_metadata_in)
 
@@ -1417,66 +1764,39 @@ def function_sum_region(data_and_metadata_in: _DataAndMetadataLike, mask_data_an
     if not Image.is_data_valid(mask_data_and_metadata.data):
         raise ValueError("Sum region: invalid mask data")
 
-    if data_and_metadata.is_sequence:
-        assert len(data_and_metadata.dimensional_shape) == 4
-    else:
-        assert len(data_and_metadata.dimensional_shape) == 3
+    start_index = 1 if data_and_metadata.is_sequence else 0
+    # the mask covers the two collection dimensions; the datum may have one or two dimensions.
+    assert len(data_and_metadata.dimensional_shape) - start_index in (3, 4)
     assert len(mask_data_and_metadata.dimensional_shape) == 2
 
     data = data_and_metadata._data_ex
     mask_data = mask_data_and_metadata._data_ex.astype(bool)
 
-    start_index = 1 if data_and_metadata.is_sequence else 0
-    result_data = numpy.sum(data, axis=tuple(range(start_index, len(data_and_metadata.dimensional_shape) - 1)), where=mask_data[..., numpy.newaxis])
+    datum_index = start_index + 2
+    mask_data = mask_data.reshape(mask_data.shape + (1,) * (len(data_and_metadata.dimensional_shape) - datum_index))
+    result_data = _sum_data(data, axis=(start_index, start_index + 1), where=mask_data)
+
+    if is_average:
+        result_data = result_data / max(1.0, typing.cast(float, numpy.sum(mask_data)))
 
     data_descriptor = DataAndMetadata.DataDescriptor(data_and_metadata.is_sequence, 0, data_and_metadata.datum_dimension_count)
 
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
 
     if data_and_metadata.is_sequence:
         dimensional_calibrations = [dimensional_calibrations[0]] + list(dimensional_calibrations[data_and_metadata.datum_dimension_slice])
     else:
         dimensional_calibrations = list(dimensional_calibrations[data_and_metadata.datum_dimension_slice])
 
-    return DataAndMetadata.new_data_and_metadata(data=result_data, intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=dimensional_calibrations, data_descriptor=data_descriptor)
+    return DataAndMetadata.new_data_and_metadata(data=result_data, intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=dimensional_calibrations, data_descriptor=data_descriptor)
 
 
-def function_average_region(data_and_metadata_in: _DataAndMetadataLike, mask_data_and_metadata_in: _DataAndMetadataLike) -> DataAndMetadata.DataAndMetadata:
-    data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
-    mask_data_and_metadata = DataAndMetadata.promote_ndarray(mask_data_and_metadata_in)
-
-    if not Image.is_data_valid(data_and_metadata.data):
-        raise ValueError("Sum region: invalid data")
-
-    if not Image.is_data_valid(mask_data_and_metadata.data):
-        raise ValueError("Sum region: invalid mask data")
-
-    if data_and_metadata.is_sequence:
-        assert len(data_and_metadata.dimensional_shape) == 4
-    else:
-        assert len(data_and_metadata.dimensional_shape) == 3
-    assert len(mask_data_and_metadata.dimensional_shape) == 2
-
-    data = data_and_metadata._data_ex
-    mask_data = mask_data_and_metadata._data_ex.astype(bool)
-
-    assert data is not None
-
-    mask_sum = max(1.0, typing.cast(float, numpy.sum(mask_data)))
-
-    start_index = 1 if data_and_metadata.is_sequence else 0
-    result_data = numpy.sum(data, axis=tuple(range(start_index, len(data_and_metadata.dimensional_shape) - 1)), where=mask_data[..., numpy.newaxis]) / mask_sum
-
-    data_descriptor = DataAndMetadata.DataDescriptor(data_and_metadata.is_sequence, 0, data_and_metadata.datum_dimension_count)
+def function_sum_region(data_and_metadata_in: _DataAndMetadataLike, mask_data_and_metadata_in: _DataAndMetadataLike) -> DataAndMetadata.DataAndMetadata:
+    return _function_sum_region(data_and_metadata_in, mask_data_and_metadata_in, False)
 
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
 
-    if data_and_metadata.is_sequence:
-        dimensional_calibrations = [dimensional_calibrations[0]] + list(dimensional_calibrations[data_and_metadata.datum_dimension_slice])
-    else:
-        dimensional_calibrations = list(dimensional_calibrations[data_and_metadata.datum_dimension_slice])
-
-    return DataAndMetadata.new_data_and_metadata(data=result_data, intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=dimensional_calibrations, data_descriptor=data_descriptor)
+def function_average_region(data_and_metadata_in: _DataAndMetadataLike, mask_data_and_metadata_in: _DataAndMetadataLike) -> DataAndMetadata.DataAndMetadata:
+    return _function_sum_region(data_and_metadata_in, mask_data_and_metadata_in, True)
 
 
 def function_reshape(data_and_metadata_in: _DataAndMetadataLike, shape: DataAndMetadata.ShapeType) -> DataAndMetadata.DataAndMetadata:
@@ -1500,7 +1820,7 @@ def function_reshape(data_and_metadata_in: _DataAndMetadataLike, shape: DataAndM
         assert data is not None
         return numpy.reshape(data, shape)
 
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
 
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Reshape: invalid data")
@@ -1532,7 +1852,7 @@ def function_reshape(data_and_metadata_in: _DataAndMetadataLike, shape: DataAndM
         for _ in range(len(shape)):
             new_dimensional_calibrations.append(Calibration.Calibration())
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=new_dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=new_dimensional_calibrations)
 
 
 def function_squeeze(data_and_metadata_in: _DataAndMetadataLike) -> DataAndMetadata.DataAndMetadata:
@@ -1544,7 +1864,7 @@ def function_squeeze(data_and_metadata_in: _DataAndMetadataLike) -> DataAndMetad
 
     data_shape = data_and_metadata.data_shape
 
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
     is_sequence = data_and_metadata.is_sequence
     collection_dimension_count = data_and_metadata.collection_dimension_count
     datum_dimension_count = data_and_metadata.datum_dimension_count
@@ -1579,7 +1899,7 @@ def function_squeeze(data_and_metadata_in: _DataAndMetadataLike) -> DataAndMetad
 
     data = numpy.squeeze(data_and_metadata._data_ex, axis=tuple(indexes))
 
-    return DataAndMetadata.new_data_and_metadata(data=data, intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=new_dimensional_calibrations, data_descriptor=data_descriptor)
+    return DataAndMetadata.new_data_and_metadata(data=data, intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=new_dimensional_calibrations, data_descriptor=data_descriptor)
 
 
 def function_redimension(data_and_metadata_in: _DataAndMetadataLike, data_descriptor: DataAndMetadata.DataDescriptor) -> DataAndMetadata.DataAndMetadata:
@@ -1591,7 +1911,7 @@ def function_redimension(data_and_metadata_in: _DataAndMetadataLike, data_descri
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Redimension: invalid data")
 
-    return DataAndMetadata.new_data_and_metadata(data=data_and_metadata._data_ex, intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=data_and_metadata.dimensional_calibrations, data_descriptor=data_descriptor)
+    return DataAndMetadata.new_data_and_metadata(data=data_and_metadata._data_ex, intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=data_and_metadata._shared_dimensional_calibrations, data_descriptor=data_descriptor)
 
 
 def function_resize(data_and_metadata_in: _DataAndMetadataLike, shape: DataAndMetadata.ShapeType, mode: typing.Optional[str] = None) -> DataAndMetadata.DataAndMetadata:
@@ -1631,7 +1951,7 @@ def function_resize(data_and_metadata_in: _DataAndMetadataLike, shape: DataAndMe
                 pads.append((0, 0))
         return numpy.pad(data, pads, 'constant', constant_values=c)
 
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
 
     resized_dimensional_calibrations = list()
     for index, dimensional_calibration in enumerate(dimensional_calibrations):
@@ -1641,15 +1961,20 @@ def function_resize(data_and_metadata_in: _DataAndMetadataLike, shape: DataAndMe
             dimensional_calibration.scale, dimensional_calibration.units)
         resized_dimensional_calibrations.append(cropped_calibration)
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=resized_dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=resized_dimensional_calibrations)
 
 
 def function_rescale(data_and_metadata_in: _DataAndMetadataLike,
                      data_range: typing.Optional[DataRangeType] = None,
-                     in_range: typing.Optional[DataRangeType] = None) -> DataAndMetadata.DataAndMetadata:
+                     in_range: typing.Optional[DataRangeType] = None,
+                     *,
+                     statistics: typing.Optional[Statistics.DataStatistics] = None) -> DataAndMetadata.DataAndMetadata:
     """Rescale data and update intensity calibration.
 
     rescale(a, (0.0, 1.0))
+
+    If in_range is not passed, the minimum and maximum are taken from statistics (see Statistics.calculate_statistics)
+    if passed, or calculated from the data.
     """
     data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
@@ -1661,12 +1986,16 @@ def function_rescale(data_and_metadata_in: _DataAndMetadataLike,
     def calculate_data() -> _ImageDataType:
         data = data_and_metadata.data
         assert data is not None
-        data_ptp = numpy.ptp(data) if in_range is None else in_range[1] - in_range[0]
-        data_ptp_i = 1.0 / data_ptp if data_ptp != 0.0 else 1.0
         if in_range is not None:
+            data_ptp = in_range[1] - in_range[0]
             data_min = in_range[0]
+        elif statistics is not None:
+            data_ptp = statistics.max - statistics.min
+            data_min = statistics.min
         else:
+            data_ptp = numpy.ptp(data)
             data_min = numpy.amin(data)
+        data_ptp_i = 1.0 / data_ptp if data_ptp != 0.0 else 1.0
         data_span = used_data_range[1] - used_data_range[0]
         if data_span == 1.0 and used_data_range[0] == 0.0:
             return typing.cast(_ImageDataType, (data - data_min) * data_ptp_i)
@@ -1678,7 +2007,7 @@ def function_rescale(data_and_metadata_in: _DataAndMetadataLike,
 
     return DataAndMetadata.new_data_and_metadata(data=calculate_data(),
                                                  intensity_calibration=intensity_calibration,
-                                                 dimensional_calibrations=data_and_metadata.dimensional_calibrations,
+                                                 dimensional_calibrations=data_and_metadata._shared_dimensional_calibrations,
                                                  timestamp=data_and_metadata.timestamp,
                                                  timezone=data_and_metadata.timezone,
                                                  timezone_offset=data_and_metadata.timezone_offset)
@@ -1698,7 +2027,7 @@ def function_rebin_2d(data_and_metadata_in: _DataAndMetadataLike, shape: DataAnd
 
     data_shape = data_and_metadata.data_shape
 
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
 
     height = min(height, data_shape[0])
     width = min(width, data_shape[1])
@@ -1714,7 +2043,7 @@ def function_rebin_2d(data_and_metadata_in: _DataAndMetadataLike, shape: DataAnd
     dimensions = height, width
     rebinned_dimensional_calibrations = [Calibration.Calibration(dimensional_calibrations[i].offset, dimensional_calibrations[i].scale * data_shape[i] / dimensions[i], dimensional_calibrations[i].units) for i in range(len(dimensional_calibrations))]
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=rebinned_dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=rebinned_dimensional_calibrations)
 
 
 def _binned_data_shape_and_crop_slices(shape: DataAndMetadata.ShapeType, binning: typing.Tuple[int, ...]) -> typing.Tuple[typing.Tuple[int, ...], typing.Optional[typing.Tuple[slice, ...]]]:
@@ -1726,52 +2055,76 @@ def _binned_data_shape_and_crop_slices(shape: DataAndMetadata.ShapeType, binning
     return tuple(new_shape), tuple([slice(half_residue[i] + residue[i] % 2, -half_residue[i] if half_residue[i] > 0 else None) for i in range(len(residue))])
 
 
-def _rebin(arr: _ImageDataType, new_shape: DataAndMetadata.ShapeType, dtype: typing.Optional[numpy.typing.DTypeLike] = None, out: typing.Optional[_ImageDataType] = None) -> typing.Optional[_ImageDataType]:
-    if new_shape == arr.shape:
-        if out is not None:
-            out[:] = arr
-        else:
-            return arr
-    array_shape = arr.shape
-    assert len(array_shape) == len(new_shape)
-    if len(new_shape) == 1:
-        new_shape = (1,) + new_shape
-        array_shape = (1,) + array_shape
-    dtype2 = dtype or arr.dtype
-    shape = (int(new_shape[0]), int(array_shape[0] // new_shape[0]),
-             int(new_shape[1]), int(array_shape[1] // new_shape[1]))
-    if out is not None:
-        numpy.sum(numpy.reshape(arr, shape), axis=(1, -1), out=out)
+def _rebin_block(data: _ImageDataType, binning: typing.Sequence[int], dtype: typing.Optional[numpy.typing.DTypeLike]) -> _ImageDataType:
+    # sum the bins of data, whose shape is a multiple of binning. the axes are summed one at a time, first axis first,
+    # which reads the data sequentially and reduces it for the following sums.
+    for i, factor in enumerate(binning):
+        if factor > 1:
+            shape = data.shape
+            data = numpy.sum(numpy.reshape(data, shape[:i] + (shape[i] // factor, factor) + shape[i + 1:]), axis=i + 1, dtype=dtype)
+    return data
+
+
+def _rebin(data: typing.Any, binning: typing.Sequence[int], crop_slices: typing.Optional[typing.Tuple[slice, ...]], dtype: typing.Optional[numpy.typing.DTypeLike], out_data: _ImageDataType) -> None:
+    # sum the bins of the cropped data into out_data. arrays are split along the first axis and binned on the shared
+    # worker pool; storage backed (h5py) data is read in blocks aligned to its storage chunks.
+    starts = [crop_slice.start or 0 for crop_slice in crop_slices] if crop_slices else [0] * len(binning)
+
+    def rebin_block(block: typing.Tuple[slice, ...]) -> None:
+        source = tuple(slice(start + s.start * factor, start + s.stop * factor) for s, start, factor in zip(block, starts, binning))
+        out_data[block] = _rebin_block(numpy.asarray(data[source]), binning, dtype)
+
+    if isinstance(data, numpy.ndarray):
+        def rebin_rows(row_range: range) -> None:
+            rebin_block((slice(row_range.start, row_range.stop),) + tuple(slice(0, n) for n in out_data.shape[1:]))
+            Parallel.check_cancelled()
+
+        Parallel.run(rebin_rows, Parallel.split_range(0, out_data.shape[0]))
     else:
-        rebinned: _ImageDataType = arr.reshape(shape).sum((-1, 1)).astype(dtype2, copy=False)
-        new_shape_array = numpy.array(new_shape)
-        return rebinned.reshape(tuple(new_shape_array[new_shape_array>1]))
+        chunks = getattr(data, "chunks", None)
+        binned_chunks = tuple(max(1, c // factor) for c, factor in zip(chunks, binning)) if chunks else None
+        for block in _iterate_storage_blocks(out_data.shape, binned_chunks, data.dtype.itemsize * math.prod(binning)):
+            rebin_block(block)
 
-    return None
 
+def function_rebin_factor(data_and_metadata_in: _DataAndMetadataLike, binning: typing.Tuple[int, ...], *,
+                          out: typing.Optional[DataAndMetadata.DataAndMetadata] = None,
+                          dtype: typing.Optional[numpy.typing.DTypeLike] = None) -> DataAndMetadata.DataAndMetadata:
+    """Return the data summed in bins of the binning factor along each axis.
 
-def function_rebin_factor(data_and_metadata_in: _DataAndMetadataLike, binning: typing.Tuple[int, ...]) -> DataAndMetadata.DataAndMetadata:
+    Each axis is cropped symmetrically to a multiple of its factor. The bins are summed in dtype, which is also the
+    dtype of the result; by default the bins are summed in the numpy sum dtype and the result has the dtype of the data.
+    Axes of 1D and 2D data which are binned to a length of one are removed; other data keeps its data descriptor.
+    """
     data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Rebin: invalid data")
 
-    if not (Image.is_data_2d(data_and_metadata.data) or Image.is_data_1d(data_and_metadata.data)):
-        raise ValueError("Rebin: data must be 1D or 2D")
+    if Image.is_data_rgb_type(data_and_metadata.data):
+        raise ValueError("Rebin: data must not be RGB")
 
     data_shape = data_and_metadata.data_shape
+    if len(binning) != len(data_shape) or any(factor < 1 for factor in binning):
+        raise ValueError("Rebin: binning must have a positive factor for each dimension")
+
     binning = tuple([min(binning[i], data_shape[i]) for i in range(len(binning))])
     new_shape, crop_slices = _binned_data_shape_and_crop_slices(data_shape, binning)
-    if crop_slices is not None:
-        cropped_data = data_and_metadata.data[crop_slices]
-    else:
-        cropped_data = data_and_metadata.data
-    cropped_shape = cropped_data.shape
-    rebinned = typing.cast(_ImageDataType, _rebin(cropped_data, new_shape))
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
-    rebinned_dimensional_calibrations = [Calibration.Calibration(dimensional_calibrations[i].offset, dimensional_calibrations[i].scale * cropped_shape[i] / new_shape[i], dimensional_calibrations[i].units) for i in range(len(dimensional_calibrations)) if new_shape[i] > 1]
+    # 1D and 2D data drops axes binned to a length of one.
+    kept_axes = [i for i in range(len(new_shape)) if new_shape[i] > 1 or len(new_shape) > 2]
+    result_shape = tuple(new_shape[i] for i in kept_axes)
+    result_dtype = numpy.dtype(dtype) if dtype is not None else data_and_metadata.data_dtype
+    assert result_dtype is not None
+    out_data = _get_out_data(out, result_shape, result_dtype, "Rebin")
+    result_data = out_data if out_data is not None else numpy.empty(result_shape, result_dtype)
+    _rebin(data_and_metadata._data_ex, binning, crop_slices, dtype, result_data[tuple(slice(None) if i in kept_axes else numpy.newaxis for i in range(len(new_shape)))])
 
-    return DataAndMetadata.new_data_and_metadata(data=rebinned, intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=rebinned_dimensional_calibrations)
+    if out is not None:
+        return out
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
+    rebinned_dimensional_calibrations = [Calibration.Calibration(dimensional_calibrations[i].offset, dimensional_calibrations[i].scale * binning[i], dimensional_calibrations[i].units) for i in kept_axes]
+    data_descriptor = data_and_metadata.data_descriptor if len(new_shape) > 2 else None
+    return DataAndMetadata.new_data_and_metadata(data=result_data, intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=rebinned_dimensional_calibrations, data_descriptor=data_descriptor)
 
 
 def function_resample_2d(data_and_metadata_in: _DataAndMetadataLike, shape: DataAndMetadata.ShapeType) -> DataAndMetadata.DataAndMetadata:
@@ -1792,12 +2145,12 @@ def function_resample_2d(data_and_metadata_in: _DataAndMetadataLike, shape: Data
             return numpy.copy(data)
         return Image.scaled(data, (height, width))
 
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
 
     dimensions = height, width
     resampled_dimensional_calibrations = [Calibration.Calibration(dimensional_calibrations[i].offset, dimensional_calibrations[i].scale * data_shape[i] / dimensions[i], dimensional_calibrations[i].units) for i in range(len(dimensional_calibrations))]
 
-    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata.intensity_calibration, dimensional_calibrations=resampled_dimensional_calibrations)
+    return DataAndMetadata.new_data_and_metadata(data=calculate_data(), intensity_calibration=data_and_metadata._shared_intensity_calibration, dimensional_calibrations=resampled_dimensional_calibrations)
 
 
 def function_warp(data_and_metadata_in: _DataAndMetadataLike, coordinates_in: typing.Sequence[_DataAndMetadataLike], order: int = 1) -> DataAndMetadata.DataAndMetadata:
@@ -1805,28 +2158,20 @@ def function_warp(data_and_metadata_in: _DataAndMetadataLike, coordinates_in: ty
     coordinates = [DataAndMetadata.promote_ndarray(c) for c in coordinates_in]
     coords = numpy.moveaxis(numpy.dstack([coordinate.data for coordinate in coordinates]), -1, 0)
     data = data_and_metadata._data_ex
-    if data_and_metadata.is_data_rgb:
-        rgb: numpy.typing.NDArray[numpy.uint8] = numpy.zeros(tuple(data_and_metadata.dimensional_shape) + (3,), numpy.uint8)
-        rgb[..., 0] = scipy.ndimage.map_coordinates(data[..., 0], coords, order=order)
-        rgb[..., 1] = scipy.ndimage.map_coordinates(data[..., 1], coords, order=order)
-        rgb[..., 2] = scipy.ndimage.map_coordinates(data[..., 2], coords, order=order)
-        return DataAndMetadata.new_data_and_metadata(data=rgb,
-                                                     dimensional_calibrations=data_and_metadata.dimensional_calibrations,
-                                                     intensity_calibration=data_and_metadata.intensity_calibration)
-    elif data_and_metadata.is_data_rgba:
-        rgba: numpy.typing.NDArray[numpy.uint8] = numpy.zeros(tuple(data_and_metadata.dimensional_shape) + (4,), numpy.uint8)
-        rgba[..., 0] = scipy.ndimage.map_coordinates(data[..., 0], coords, order=order)
-        rgba[..., 1] = scipy.ndimage.map_coordinates(data[..., 1], coords, order=order)
-        rgba[..., 2] = scipy.ndimage.map_coordinates(data[..., 2], coords, order=order)
-        rgba[..., 3] = scipy.ndimage.map_coordinates(data[..., 3], coords, order=order)
-        return DataAndMetadata.new_data_and_metadata(data=rgba,
-                                                     dimensional_calibrations=data_and_metadata.dimensional_calibrations,
-                                                     intensity_calibration=data_and_metadata.intensity_calibration)
+    if data_and_metadata.is_data_rgb_type:
+        def map_coordinates(data: _ImageDataType, output: _ImageDataType) -> None:
+            scipy.ndimage.map_coordinates(data, coords, output=output, order=order)
+
+        rgb_data: numpy.typing.NDArray[numpy.uint8] = numpy.empty(tuple(coords.shape[1:]) + (data.shape[-1],), numpy.uint8)
+        _filter_channels(map_coordinates, data, rgb_data, filter_alpha=True)
+        return DataAndMetadata.new_data_and_metadata(data=rgb_data,
+                                                     dimensional_calibrations=data_and_metadata._shared_dimensional_calibrations,
+                                                     intensity_calibration=data_and_metadata._shared_intensity_calibration)
     else:
         return DataAndMetadata.new_data_and_metadata(
             data=scipy.ndimage.map_coordinates(data, coords, order=order),
-            dimensional_calibrations=data_and_metadata.dimensional_calibrations,
-            intensity_calibration=data_and_metadata.intensity_calibration)
+            dimensional_calibrations=data_and_metadata._shared_dimensional_calibrations,
+            intensity_calibration=data_and_metadata._shared_intensity_calibration)
 
 
 def calculate_coordinates_for_affine_transform(data_and_metadata_in: _DataAndMetadataLike, transformation_matrix: _ImageDataType) -> typing.Sequence[DataAndMetadata.DataAndMetadata]:
@@ -1861,22 +2206,85 @@ def function_affine_transform(data_and_metadata_in: _DataAndMetadataLike, transf
     return function_warp(data_and_metadata_in, coordinates, order=order)
 
 
-def function_histogram(data_and_metadata_in: _DataAndMetadataLike, bins: int) -> DataAndMetadata.DataAndMetadata:
+@Memoization.memoize
+def function_histogram(data_and_metadata_in: _DataAndMetadataLike, bins: int, *, statistics: typing.Optional[Statistics.DataStatistics] = None) -> DataAndMetadata.DataAndMetadata:
+    """Calculate the histogram of the data over its range, ignoring NaN values.
+
+    If statistics with the same number of bins is passed (see Statistics.calculate_statistics), its histogram is used.
+    """
     data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Resample: invalid data")
 
-    histogram_data = numpy.histogram(data_and_metadata._data_ex, bins=bins)
-    min_x = data_and_metadata.intensity_calibration.convert_to_calibrated_value(histogram_data[1][0])
-    max_x = data_and_metadata.intensity_calibration.convert_to_calibrated_value(histogram_data[1][-1])
-    result_data: numpy.typing.NDArray[numpy.int32] = histogram_data[0].astype(numpy.int32)
+    if bins < 1:
+        raise ValueError("Histogram: bins must be positive")
+
+    if statistics is not None and statistics.bins == bins:
+        histogram, bin_edges = statistics.histogram, statistics.bin_edges
+    else:
+        histogram, bin_edges = Statistics.calculate_histogram(data_and_metadata._data_ex, bins)
+
+    if histogram is None or bin_edges is None:
+        raise ValueError("Histogram: data range is not finite")
 
-    x_calibration = Calibration.Calibration(min_x, (max_x - min_x) / bins, data_and_metadata.intensity_calibration.units)
+    min_x = data_and_metadata._shared_intensity_calibration.convert_to_calibrated_value(bin_edges[0])
+    max_x = data_and_metadata._shared_intensity_calibration.convert_to_calibrated_value(bin_edges[-1])
+    result_data: numpy.typing.NDArray[numpy.int32] = histogram.astype(numpy.int32)
+
+    x_calibration = Calibration.Calibration(min_x, (max_x - min_x) / bins, data_and_metadata._shared_intensity_calibration.units)
 
     return DataAndMetadata.new_data_and_metadata(data=result_data, dimensional_calibrations=[x_calibration])
 
 
+def _get_line_profile_coordinates(start: typing.Tuple[int, int], end: typing.Tuple[int, int], n: int) -> typing.Tuple[_ImageDataType, _ImageDataType]:
+    # calculate grid of coordinates. returns n coordinate arrays for each row.
+    # start and end are in data coordinates.
+    # n is a positive integer, not zero
+    assert n > 0
+    # n=1 => 0
+    # n=2 => -0.5, 0.5
+    # n=3 => -1, 0, 1
+    # n=4 => -1.5, -0.5, 0.5, 1.5
+    length_f = math.sqrt(math.pow(end[0] - start[0], 2) + math.pow(end[1] - start[1], 2))
+    samples = int(math.floor(length_f))
+    a = numpy.linspace(0, samples - 1, samples)  # along
+    t = numpy.linspace(-(n - 1) * 0.5, (n - 1) * 0.5, round(n))  # transverse
+    dy = (end[0] - start[0]) / samples
+    dx = (end[1] - start[1]) / samples
+    ix, iy = numpy.meshgrid(a, t)
+    yy = start[0] + dy * ix + dx * iy
+    xx = start[1] + dx * ix - dy * iy
+    return yy, xx
+
+
+class _LineProfileGrid(typing.NamedTuple):
+    indexes: _ImageDataType  # the flattened index of each sample in the image, shape (width, length)
+    valid: _ImageDataType  # whether each sample is within the image
+
+
+@functools.lru_cache(maxsize=256)
+def _get_line_profile_grid(shape: DataAndMetadata.Shape2dType, vector: typing.Tuple[typing.Tuple[float, float], typing.Tuple[float, float]], integration_width: int) -> typing.Optional[_LineProfileGrid]:
+    # return the samples of the line profile along vector in an image of shape, or None if the line is too short.
+    # samples are the nearest pixel and are zero outside of the image, the same as map_coordinates with order 0.
+    start, end = vector
+    start_data = int(shape[0] * start[0]), int(shape[1] * start[1])
+    end_data = int(shape[0] * end[0]), int(shape[1] * end[1])
+    length = math.sqrt(math.pow(end_data[1] - start_data[1], 2) + math.pow(end_data[0] - start_data[0], 2))
+    if length <= 1.0:
+        return None
+    yy, xx = _get_line_profile_coordinates(start_data, end_data, integration_width)
+    valid = (yy >= 0) & (yy <= shape[0] - 1) & (xx >= 0) & (xx <= shape[1] - 1)
+    indexes = numpy.where(valid, numpy.floor(yy + 0.5) * shape[1] + numpy.floor(xx + 0.5), 0).astype(numpy.intp)
+    indexes.flags.writeable = False
+    valid.flags.writeable = False
+    return _LineProfileGrid(indexes, valid)
+
+
+def _get_line_profile_integration_width(shape: DataAndMetadata.ShapeType, integration_width: float) -> int:
+    return int(min(max(shape[0], shape[1]), round(integration_width)))  # limit integration width to sensible value
+
+
 def function_line_profile(data_and_metadata_in: _DataAndMetadataLike, vector: NormVectorType,
                           integration_width: float) -> DataAndMetadata.DataAndMetadata:
     data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
@@ -1889,53 +2297,22 @@ def function_line_profile(data_and_metadata_in: _DataAndMetadataLike, vector: No
 
     assert round(integration_width) > 0  # leave this here for test_evaluation_error_recovers_gracefully
 
-    # calculate grid of coordinates. returns n coordinate arrays for each row.
-    # start and end are in data coordinates.
-    # n is a positive integer, not zero
-    def get_coordinates(start: _ImageDataType, end: _ImageDataType, n: int) -> typing.Tuple[_ImageDataType, _ImageDataType]:
-        assert n > 0
-        # n=1 => 0
-        # n=2 => -0.5, 0.5
-        # n=3 => -1, 0, 1
-        # n=4 => -1.5, -0.5, 0.5, 1.5
-        length_f = math.sqrt(math.pow(end[0] - start[0], 2) + math.pow(end[1] - start[1], 2))
-        samples = int(math.floor(length_f))
-        a = numpy.linspace(0, samples - 1, samples)  # along
-        t = numpy.linspace(-(n - 1) * 0.5, (n - 1) * 0.5, round(n))  # transverse
-        dy = (end[0] - start[0]) / samples
-        dx = (end[1] - start[1]) / samples
-        ix, iy = numpy.meshgrid(a, t)
-        yy = start[0] + dy * ix + dx * iy
-        xx = start[1] + dx * ix - dy * iy
-        return yy, xx
-
-    # xx, yy = __coordinates(None, (4,4), (8,4), 3)
-
     data = data_and_metadata._data_ex
     shape = data.shape
-    actual_integration_width = min(max(shape[0], shape[1]), round(integration_width))  # limit integration width to sensible value
+    actual_integration_width = _get_line_profile_integration_width(shape, integration_width)
 
     def calculate_data(data: _ImageDataType) -> _ImageDataType:
         if Image.is_data_rgb_type(data):
             data = Image.convert_to_grayscale(data, numpy.double)
-        start, end = vector
-        start_data: numpy.typing.NDArray[typing.Any] = numpy.array([int(shape[0] * start[0]), int(shape[1] * start[1])])
-        end_data: numpy.typing.NDArray[typing.Any] = numpy.array([int(shape[0] * end[0]), int(shape[1] * end[1])])
-        length = math.sqrt(math.pow(end_data[1] - start_data[1], 2) + math.pow(end_data[0] - start_data[0], 2))
-        if length > 1.0:
-            spline_order_lookup = {"nearest": 0, "linear": 1, "quadratic": 2, "cubic": 3}
-            method = "nearest"
-            spline_order = spline_order_lookup[method]
-            yy, xx = get_coordinates(start_data, end_data, actual_integration_width)
-            samples = scipy.ndimage.map_coordinates(data, (yy, xx), order=spline_order)
-            if len(samples.shape) > 1:
-                return typing.cast(_ImageDataType, numpy.sum(samples, 0, dtype=data.dtype))
-            else:
-                return typing.cast(_ImageDataType, samples)
+        (start_y, start_x), (end_y, end_x) = vector
+        grid = _get_line_profile_grid((data.shape[0], data.shape[1]), ((start_y, start_x), (end_y, end_x)), actual_integration_width)
+        if grid is not None:
+            samples = numpy.take(data, grid.indexes)
+            return typing.cast(_ImageDataType, numpy.sum(samples, 0, dtype=data.dtype, where=grid.valid))
         else:
             return numpy.zeros((1,))
 
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
 
     dimensional_calibrations = [Calibration.Calibration(0.0, dimensional_calibrations[1].scale, dimensional_calibrations[1].units)]
 
@@ -1946,19 +2323,128 @@ def function_line_profile(data_and_metadata_in: _DataAndMetadataLike, vector: No
                                                  dimensional_calibrations=dimensional_calibrations)
 
 
-def function_radial_profile(data_and_metadata_in: _DataAndMetadataLike, center: typing.Optional[NormPointType] = None) -> DataAndMetadata.DataAndMetadata:
+def function_line_profiles(data_and_metadata_in: _DataAndMetadataLike, vectors: typing.Sequence[NormVectorType],
+                           integration_width: float) -> DataAndMetadata.DataAndMetadata:
+    """Return the line profiles along each of the vectors, with the same samples as function_line_profile.
+
+    2D data returns an array of shape (len(vectors), length), where length is the length of the longest profile;
+    shorter profiles are padded with zeros. Data with a 2D datum and navigation axes (for instance a sequence of images)
+    returns the profiles of each datum, with the navigation axes of the data. The profiles are an additional collection
+    axis, unless the data already has two collection axes, in which case each datum of the result is the 2D array of
+    profiles. The samples for an image shape, vector, and integration width are calculated once and reused.
+    """
+    data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
+
+    if not Image.is_data_valid(data_and_metadata.data):
+        raise ValueError("Line profiles: invalid data")
+
+    is_batch = data_and_metadata.is_navigable and data_and_metadata.datum_dimension_count == 2
+    if not Image.is_data_2d(data_and_metadata.data) and not is_batch:
+        raise ValueError("Line profiles: data must be 2D or have a 2D datum")
+
+    if not vectors:
+        raise ValueError("Line profiles: vectors must not be empty")
+
+    if not round(integration_width) > 0:
+        raise ValueError("Line profiles: integration width must be positive")
+
+    datum_shape = typing.cast(DataAndMetadata.Shape2dType, tuple(data_and_metadata.dimensional_shape[-2:]))
+    navigation_shape = tuple(data_and_metadata.dimensional_shape[:-2])
+    actual_integration_width = _get_line_profile_integration_width(datum_shape, integration_width)
+    grids = [_get_line_profile_grid(datum_shape, ((float(start[0]), float(start[1])), (float(end[0]), float(end[1]))), actual_integration_width) for start, end in vectors]
+    length = max([grid.indexes.shape[-1] for grid in grids if grid is not None] + [1])
+
+    # combine the samples of all profiles, padding shorter profiles with samples which are not valid.
+    indexes = numpy.zeros((len(vectors), actual_integration_width, length), dtype=numpy.intp)
+    valid = numpy.zeros((len(vectors), actual_integration_width, length), dtype=bool)
+    for i, grid in enumerate(grids):
+        if grid is not None:
+            indexes[i, :, :grid.indexes.shape[-1]] = grid.indexes
+            valid[i, :, :grid.valid.shape[-1]] = grid.valid
+
+    data = data_and_metadata._data_ex
+    result_dtype = numpy.dtype(numpy.double) if data_and_metadata.is_data_rgb_type else data.dtype
+    result_data = numpy.empty(navigation_shape + (len(vectors), length), dtype=result_dtype)
+    if not navigation_shape:
+        data = numpy.asarray(data)[numpy.newaxis]
+        result_data = result_data[numpy.newaxis]
+    # process the navigation axes in blocks along the first axis so that h5py data is read in pieces. the samples of all
+    # profiles in all frames of a block are taken together.
+    slice_nbytes = math.prod(data.shape[1:]) * data.dtype.itemsize
+    block_length = max(1, _REDUCTION_BLOCK_SIZE // max(1, slice_nbytes))
+    for i in range(0, data.shape[0], block_length):
+        block = numpy.asarray(data[i:i + block_length])
+        if Image.is_shape_and_dtype_rgb_type(block.shape, block.dtype):
+            block = Image.convert_to_grayscale(block, numpy.double)
+        block = block.reshape(-1, datum_shape[0] * datum_shape[1])
+        samples = numpy.take(block, indexes, axis=1)
+        numpy.sum(samples, axis=2, dtype=result_dtype, where=valid, out=result_data[i:i + block_length].reshape(-1, len(vectors), length))
+    if not navigation_shape:
+        result_data = result_data[0]
+
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations
+    profile_calibration = Calibration.Calibration(0.0, dimensional_calibrations[-1].scale, dimensional_calibrations[-1].units)
+
+    intensity_calibration = copy.deepcopy(data_and_metadata.intensity_calibration)
+    intensity_calibration.scale /= actual_integration_width
+
+    # a collection can have at most two dimensions.
+    if data_and_metadata.collection_dimension_count < 2:
+        data_descriptor = DataAndMetadata.DataDescriptor(data_and_metadata.is_sequence, data_and_metadata.collection_dimension_count + 1, 1)
+    else:
+        data_descriptor = DataAndMetadata.DataDescriptor(data_and_metadata.is_sequence, data_and_metadata.collection_dimension_count, 2)
+
+    return DataAndMetadata.new_data_and_metadata(data=result_data,
+                                                 intensity_calibration=intensity_calibration,
+                                                 dimensional_calibrations=list(dimensional_calibrations[:-2]) + [Calibration.Calibration(), profile_calibration],
+                                                 data_descriptor=data_descriptor,
+                                                 timestamp=data_and_metadata.timestamp,
+                                                 timezone=data_and_metadata.timezone,
+                                                 timezone_offset=data_and_metadata.timezone_offset)
+
+
+class _RadialProfilePlan(typing.NamedTuple):
+    bin_indices: _ImageDataType  # the flattened bin index of each pixel
+    counts: _ImageDataType  # the number of pixels in each bin
+
+
+@functools.lru_cache(maxsize=16)
+def _get_radial_profile_plan(shape: DataAndMetadata.Shape2dType, center: typing.Tuple[float, float], bin_width: float) -> _RadialProfilePlan:
+    # see https://stackoverflow.com/questions/21242011/most-efficient-way-to-calculate-radial-profile
+    y, x = numpy.indices(shape, sparse=True)
+    r = numpy.sqrt((x - center[1]) ** 2 + (y - center[0]) ** 2)
+    if bin_width != 1.0:
+        r /= bin_width
+    bin_indices = r.astype(int).ravel()
+    bin_indices.flags.writeable = False
+    counts = numpy.bincount(bin_indices)
+    counts.flags.writeable = False
+    return _RadialProfilePlan(bin_indices, counts)
+
+
+def function_radial_profile(data_and_metadata_in: _DataAndMetadataLike, center: typing.Optional[NormPointType] = None, bin_width: float = 1.0) -> DataAndMetadata.DataAndMetadata:
+    """Return the average of the data in rings of bin_width pixels around center.
+
+    Data with a 2D datum and navigation axes (for instance a 4D scan) returns a radial profile for each datum, with the
+    navigation axes of the data. The bins for a shape, center, and bin width are calculated once and reused.
+    """
     data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Radial profile: invalid data")
 
-    if not Image.is_data_2d(data_and_metadata.data):
-        raise ValueError("Radial profile: data must be 2D")
+    is_batch = data_and_metadata.is_navigable and data_and_metadata.datum_dimension_count == 2
+    if not Image.is_data_2d(data_and_metadata.data) and not is_batch:
+        raise ValueError("Radial profile: data must be 2D or have a 2D datum")
 
     if data_and_metadata.is_data_complex_type:
         raise ValueError("Radial profile: data must be scalar (not complex)")
 
-    dimensional_calibrations = data_and_metadata.dimensional_calibrations
+    if not bin_width > 0:
+        raise ValueError("Radial profile: bin width must be positive")
+
+    datum_shape = typing.cast(DataAndMetadata.Shape2dType, tuple(data_and_metadata.data_shape[-2:]))
+    dimensional_calibrations = data_and_metadata._shared_dimensional_calibrations[-2:]
     is_uniform_calibration = dimensional_calibrations[0].units == dimensional_calibrations[1].units
 
     if center:
@@ -1966,23 +2452,39 @@ def function_radial_profile(data_and_metadata_in: _DataAndMetadataLike, center:
     elif is_uniform_calibration:
         center_point = Geometry.FloatPoint(y=dimensional_calibrations[0].convert_from_calibrated_value(0.0), x=dimensional_calibrations[1].convert_from_calibrated_value(0.0))
     else:
-        center_point = Geometry.FloatPoint(y=data_and_metadata.data_shape[0] / 2.0, x=data_and_metadata.data_shape[1] / 2.0)
+        center_point = Geometry.FloatPoint(y=datum_shape[0] / 2.0, x=datum_shape[1] / 2.0)
 
-    # see https://stackoverflow.com/questions/21242011/most-efficient-way-to-calculate-radial-profile
-    y, x = numpy.indices((data_and_metadata.data_shape), sparse=True)
-    r = (numpy.sqrt((x - center_point.x) ** 2 + (y - center_point.y) ** 2)).astype(int)
-    total_binned = numpy.bincount(r.ravel(), data_and_metadata.data.ravel())
-    radial_count = numpy.bincount(r.ravel())
-    result_data = total_binned / radial_count
+    plan = _get_radial_profile_plan(datum_shape, (center_point.y, center_point.x), float(bin_width))
+
+    if is_batch:
+        data = data_and_metadata.data
+        navigation_shape = tuple(data_and_metadata.data_shape[:-2])
+        result_data = numpy.empty(navigation_shape + plan.counts.shape, dtype=numpy.float64)
+        # process the navigation axes in blocks along the first axis so that h5py data is read in pieces.
+        datum_size = int(numpy.prod(datum_shape, dtype=numpy.int64)) * numpy.dtype(data_and_metadata.data_dtype).itemsize
+        block_length = max(1, _REDUCTION_BLOCK_SIZE * navigation_shape[0] // max(1, datum_size * int(numpy.prod(navigation_shape, dtype=numpy.int64))))
+        for i in range(0, navigation_shape[0], block_length):
+            block = numpy.asarray(data[i:i + block_length]).reshape(-1, plan.bin_indices.shape[0])
+            result_block = result_data[i:i + block_length].reshape(-1, plan.counts.shape[0])
+            # a bincount per datum is faster than a single bincount with offset indices or a sparse matrix product.
+            for j in range(block.shape[0]):
+                result_block[j] = numpy.bincount(plan.bin_indices, block[j], minlength=plan.counts.shape[0])
+        result_data /= plan.counts
+    else:
+        total_binned = numpy.bincount(plan.bin_indices, data_and_metadata.data.ravel())
+        result_data = total_binned / plan.counts
 
     if is_uniform_calibration:
-        dimensional_calibrations = [Calibration.Calibration(0.0, dimensional_calibrations[1].scale, dimensional_calibrations[1].units)]
+        radial_calibration = Calibration.Calibration(0.0, dimensional_calibrations[1].scale * bin_width, dimensional_calibrations[1].units)
     else:
-        dimensional_calibrations = [Calibration.Calibration()]
+        radial_calibration = Calibration.Calibration(0.0, bin_width) if bin_width != 1.0 else Calibration.Calibration()
+
+    data_descriptor = DataAndMetadata.DataDescriptor(data_and_metadata.is_sequence, data_and_metadata.collection_dimension_count, 1) if is_batch else None
 
     return DataAndMetadata.new_data_and_metadata(data=result_data,
-                                                 intensity_calibration=data_and_metadata.intensity_calibration,
-                                                 dimensional_calibrations=dimensional_calibrations,
+                                                 intensity_calibration=data_and_metadata._shared_intensity_calibration,
+                                                 dimensional_calibrations=list(data_and_metadata._shared_dimensional_calibrations[:-2]) + [radial_calibration],
+                                                 data_descriptor=data_descriptor,
                                                  timestamp=data_and_metadata.timestamp,
                                                  timezone=data_and_metadata.timezone,
                                                  timezone_offset=data_and_metadata.timezone_offset)
@@ -2022,8 +2524,8 @@ def function_array(array_fn: typing.Callable[..., typing.Any], data_and_metadata
     data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
     data = array_fn(data_and_metadata.data, *args, **kwargs)
     return DataAndMetadata.new_data_and_metadata(data=data,
-                                                 intensity_calibration=data_and_metadata.intensity_calibration,
-                                                 dimensional_calibrations=data_and_metadata.dimensional_calibrations,
+                                                 intensity_calibration=data_and_metadata._shared_intensity_calibration,
+                                                 dimensional_calibrations=data_and_metadata._shared_dimensional_calibrations,
                                                  timestamp=data_and_metadata.timestamp,
                                                  timezone=data_and_metadata.timezone,
                                                  timezone_offset=data_and_metadata.timezone_offset)
@@ -2045,6 +2547,7 @@ def function_element_data_no_copy(data_and_metadata: DataAndMetadata._DataAndMet
     # flag16 is for backwards compatibility with 0.15.2 and earlier. new callers should set it to False.
     # always return an ndarray, never a slice into another type of array (h5py). this helps ensure the display pipeline
     # works correctly by ensuring the data is always a numpy array and allow downstream operations will work.
+    # slices of ndarray data are read-only views of the data, not copies.
     data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata)
     result: typing.Optional[DataAndMetadata.DataAndMetadata] = data_and_metadata
     dimensional_shape = data_and_metadata.dimensional_shape
@@ -2061,14 +2564,14 @@ def function_element_data_no_copy(data_and_metadata: DataAndMetadata._DataAndMet
         assert collection_index is not None
         sequence_index = min(max(sequence_index, 0), dimensional_shape[next_dimension])
         data_slice = (sequence_index,) + tuple(collection_index[0:collection_dimension_count]) + (...,)
-        result = DataAndMetadata.function_data_slice(data_and_metadata, DataAndMetadata.key_to_list(tuple(data_slice)))
+        result = DataAndMetadata.function_data_slice(data_and_metadata, DataAndMetadata.key_to_list(tuple(data_slice)), copy=False)
         modified = True
     else:
         if data_and_metadata.is_sequence:
             # next dimension is treated as a sequence index, which may be time or just a sequence index
             sequence_index = min(max(sequence_index, 0), dimensional_shape[next_dimension])
             data_slice = (sequence_index, ...)
-            result = DataAndMetadata.function_data_slice(data_and_metadata, DataAndMetadata.key_to_list(data_slice))
+            result = DataAndMetadata.function_data_slice(data_and_metadata, DataAndMetadata.key_to_list(data_slice), copy=False)
             modified = True
             next_dimension += 1
         if result and result.is_collection:
@@ -2081,7 +2584,7 @@ def function_element_data_no_copy(data_and_metadata: DataAndMetadata._DataAndMet
                 modified = True
             else:  # default, "pick"
                 collection_slice = tuple(collection_index[0:collection_dimension_count]) + (...,)
-                result = DataAndMetadata.function_data_slice(result, DataAndMetadata.key_to_list(collection_slice))
+                result = DataAndMetadata.function_data_slice(result, DataAndMetadata.key_to_list(collection_slice), copy=False)
                 modified = True
             next_dimension += collection_dimension_count + datum_dimension_count
     if result and functools.reduce(operator.mul, result.dimensional_shape) == 0:
@@ -2130,18 +2633,43 @@ def function_display_data(data_and_metadata: DataAndMetadata.DataAndMetadata, se
                           slice_center: int = 0, slice_width: int = 1,
                           complex_display_type: typing.Optional[str] = None) -> typing.Optional[DataAndMetadata.DataAndMetadata]:
     result, modified = function_display_data_no_copy(data_and_metadata, sequence_index, collection_index, slice_center, slice_width, complex_display_type)
-    return copy.deepcopy(result) if result and not modified else result
+    # copy the result if it is the source or a view of the source.
+    return copy.deepcopy(result) if result and (not modified or result._data_ex.base is not None) else result
 
 
 def function_display_rgba(data_and_metadata: DataAndMetadata.DataAndMetadata,
                           display_range: typing.Optional[typing.Tuple[float, float]] = None,
-                          color_table: typing.Optional[_ImageDataType] = None) -> typing.Optional[DataAndMetadata.DataAndMetadata]:
+                          color_table: typing.Optional[_ImageDataType] = None,
+                          *,
+                          out: typing.Optional[DataAndMetadata.DataAndMetadata] = None,
+                          dirty_rect: typing.Optional[typing.Union[Geometry.IntRect, Geometry.IntRectTuple]] = None) -> typing.Optional[DataAndMetadata.DataAndMetadata]:
+    """Return the display rgba of the 1d or 2d data.
+
+    If out is passed, the rgba data is written into the data of out, which must be a uint32 array with the 2d shape of
+    the data, and out is returned. If dirty_rect is also passed, only the pixels within it are written and the rest of
+    out is left unchanged. Use this to update the display of partially acquired data, passing the rows which changed
+    as ((top, 0), (height, width)). dirty_rect is in pixels and is clipped to the data.
+    """
     data_2d = data_and_metadata._data_ex
     if Image.is_data_1d(data_2d):
         data_2d = data_2d.reshape(1, *data_2d.shape)
     if not Image.is_data_rgb_type(data_2d):
         assert display_range is not None
     assert len(Image.dimensional_shape_from_data(data_2d) or ()) == 2
+    if out is not None:
+        out_data = _get_out_data(out, data_2d.shape[:2], numpy.uint32, "Display RGBA")
+        assert out_data is not None
+        if dirty_rect is not None:
+            rect = Geometry.IntRect.make(dirty_rect).intersect(Geometry.IntRect.from_tlbr(0, 0, data_2d.shape[0], data_2d.shape[1]))
+            if rect.height <= 0 or rect.width <= 0:
+                return out
+            rect_slice = (slice(rect.top, rect.bottom), slice(rect.left, rect.right))
+            Image.create_rgba_image_from_array(data_2d[rect_slice], display_limits=display_range, lookup=color_table, out=out_data[rect_slice])
+        else:
+            Image.create_rgba_image_from_array(data_2d, display_limits=display_range, lookup=color_table, out=out_data)
+        return out
+    if dirty_rect is not None:
+        raise ValueError("Display RGBA: dirty_rect requires out")
     rgba_data = Image.create_rgba_image_from_array(data_2d, display_limits=display_range, lookup=color_table)
     return DataAndMetadata.new_data_and_metadata(data=rgba_data, timestamp=data_and_metadata.timestamp, timezone=data_and_metadata.timezone, timezone_offset=data_and_metadata.timezone_offset)
 
@@ -2174,7 +2702,7 @@ def function_convert_to_scalar(data_and_metadata: DataAndMetadata.DataAndMetadat
 def calibrated_subtract_spectrum(data1: DataAndMetadata.DataAndMetadata, data2: DataAndMetadata.DataAndMetadata) -> DataAndMetadata.DataAndMetadata:
     assert data1.is_datum_1d
     assert data2.is_datum_1d
-    assert data1.intensity_calibration == data2.intensity_calibration
+    assert data1._shared_intensity_calibration == data2._shared_intensity_calibration
     calibration1 = data1.datum_dimensional_calibrations[0]
     calibration2 = data2.datum_dimensional_calibrations[0]
     assert calibration1.units == calibration2.units
@@ -2252,7 +2780,8 @@ def _kittler(hist: _ImageDataType, bins: _ImageDataType) -> float:
     return float(bins[numpy.argmin(crit)] + min_value)
 
 
-def auto_threshold(data_and_metadata_in: _DataAndMetadataLike, *, auto_threshold_method: str='average', number_bins: int=1000, **kwargs: typing.Any) -> float:
+@Memoization.memoize
+def auto_threshold(data_and_metadata_in: _DataAndMetadataLike, *, auto_threshold_method: str='average', number_bins: int=1000, statistics: typing.Optional[Statistics.DataStatistics] = None, **kwargs: typing.Any) -> float:
     """
     Finds a good threshold value for `image` by means of `auto_threshold_method`.
 
@@ -2272,15 +2801,21 @@ def auto_threshold(data_and_metadata_in: _DataAndMetadataLike, *, auto_threshold
             other hand ususally finds a very low threshold so that bright background objects can be marked as
             foreground. Using (2 * kittler + iso_data) / 3 has shown good results. Since these are very
             fast calculations (~100 us), the performance loss is negligible.
+
+    If statistics with `number_bins` bins is passed (see Statistics.calculate_statistics), its histogram is used.
     """
     data_and_metadata = DataAndMetadata.promote_ndarray(data_and_metadata_in)
 
     if not Image.is_data_valid(data_and_metadata.data):
         raise ValueError("Auto threshold: invalid data")
 
-    data = data_and_metadata._data_ex
+    if statistics is not None and statistics.bins == number_bins:
+        hist, bins = statistics.histogram, statistics.bin_edges
+    else:
+        hist, bins = Statistics.calculate_histogram(data_and_metadata._data_ex, number_bins)
 
-    hist, bins = numpy.histogram(data, bins=number_bins)
+    if hist is None or bins is None:
+        raise ValueError("Auto threshold: data range is not finite")
     if auto_threshold_method == 'average':
         return (_kittler(hist, bins) * 2.0 + _iso_data(hist, bins)) / 3.0
     if auto_threshold_method == 'yen':
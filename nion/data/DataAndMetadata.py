@@ -3,10 +3,13 @@ from __future__ import annotations
 # standard libraries
 import base64
 import collections.abc
+import contextlib
 import copy
 import datetime
 import gettext
+import json
 import logging
+import math
 import numbers
 import pickle
 import threading
@@ -40,6 +43,9 @@ _SliceDictKeyType = typing.Sequence[typing.Dict[str, typing.Any] | _SliceKeyElem
 
 class DataDescriptor:
     """A class describing the layout of data."""
+
+    __slots__ = ("is_sequence", "collection_dimension_count", "datum_dimension_count", "__weakref__")
+
     def __init__(self, is_sequence: bool, collection_dimension_count: int, datum_dimension_count: int):
         assert datum_dimension_count in (0, 1, 2), f"datum_dimension_count ({datum_dimension_count}) must be 0, 1 or 2"
         assert collection_dimension_count in (0, 1, 2), f"collection_dimension_count ({collection_dimension_count}) must be 0, 1 or 2"
@@ -51,7 +57,7 @@ class DataDescriptor:
         return ("sequence of " if self.is_sequence else "") + "[" + str(self.collection_dimension_count) + "," + str(self.datum_dimension_count) + "]"
 
     def __eq__(self, other: typing.Any) -> bool:
-        return isinstance(other, self.__class__) and self.is_sequence == other.is_sequence and self.collection_dimension_count == other.collection_dimension_count and self.datum_dimension_count == other.datum_dimension_count
+        return isinstance(other, DataDescriptor) and self.is_sequence == other.is_sequence and self.collection_dimension_count == other.collection_dimension_count and self.datum_dimension_count == other.datum_dimension_count
 
     @property
     def expected_dimension_count(self) -> int:
@@ -103,6 +109,47 @@ class DataDescriptor:
             return range(self.collection_dimension_count, self.collection_dimension_count + self.datum_dimension_count)
 
 
+class ImmutableDataDescriptor(DataDescriptor):
+    """A data descriptor which cannot be changed and can therefore be shared instead of copied.
+
+    Copies are mutable data descriptors. Use make to get an immutable data descriptor from any data descriptor without
+    copying data descriptors which are already immutable.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, is_sequence: bool, collection_dimension_count: int, datum_dimension_count: int):
+        assert datum_dimension_count in (0, 1, 2), f"datum_dimension_count ({datum_dimension_count}) must be 0, 1 or 2"
+        assert collection_dimension_count in (0, 1, 2), f"collection_dimension_count ({collection_dimension_count}) must be 0, 1 or 2"
+        object.__setattr__(self, "is_sequence", is_sequence)
+        object.__setattr__(self, "collection_dimension_count", collection_dimension_count)
+        object.__setattr__(self, "datum_dimension_count", datum_dimension_count)
+
+    @classmethod
+    def make(cls, data_descriptor: DataDescriptor) -> ImmutableDataDescriptor:
+        if isinstance(data_descriptor, ImmutableDataDescriptor):
+            return data_descriptor
+        return cls(data_descriptor.is_sequence, data_descriptor.collection_dimension_count, data_descriptor.datum_dimension_count)
+
+    def __setattr__(self, name: str, value: typing.Any) -> None:
+        raise AttributeError("Data descriptor is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("Data descriptor is immutable")
+
+    def __hash__(self) -> int:
+        return hash((self.is_sequence, self.collection_dimension_count, self.datum_dimension_count))
+
+    def __copy__(self) -> DataDescriptor:
+        return DataDescriptor(self.is_sequence, self.collection_dimension_count, self.datum_dimension_count)
+
+    def __deepcopy__(self, memo: typing.Dict[typing.Any, typing.Any]) -> DataDescriptor:
+        return DataDescriptor(self.is_sequence, self.collection_dimension_count, self.datum_dimension_count)
+
+    def __reduce__(self) -> typing.Tuple[typing.Any, ...]:
+        return ImmutableDataDescriptor, (self.is_sequence, self.collection_dimension_count, self.datum_dimension_count)
+
+
 def get_size_str(data_shape: typing.Sequence[int], is_spatial: bool = False) -> str:
     spatial_shape_str = " x ".join([str(d) for d in data_shape])
     if is_spatial and len(data_shape) == 1:
@@ -110,6 +157,9 @@ def get_size_str(data_shape: typing.Sequence[int], is_spatial: bool = False) ->
     return "(" + spatial_shape_str + ")"
 
 
+_UNCALIBRATED = Calibration.ImmutableCalibration()
+
+
 class DataMetadata:
     """A class describing data metadata, including size, data type, calibrations, the metadata dict, and the creation timestamp.
 
@@ -120,6 +170,10 @@ class DataMetadata:
     string for a given timestamp.
 
     Values passed to init and set methods are copied before storing. Returned values are return directly and not copied.
+
+    Calibrations and the data descriptor are stored as immutable values (see Calibration.ImmutableCalibration and
+    ImmutableDataDescriptor), which are shared instead of copied when they are already immutable. The calibration
+    properties return mutable copies, so changing a returned calibration does not change the stored one.
     """
 
     def __init__(self,
@@ -152,20 +206,18 @@ class DataMetadata:
             is_sequence = False
             collection_dimension_count = 2 if dimension_count in (3, 4) else 0
             datum_dimension_count = dimension_count - collection_dimension_count
-            data_descriptor = DataDescriptor(is_sequence, collection_dimension_count, datum_dimension_count)
+            data_descriptor = ImmutableDataDescriptor(is_sequence, collection_dimension_count, datum_dimension_count)
 
         assert data_descriptor.expected_dimension_count == dimension_count, f"Expected {data_descriptor.expected_dimension_count}, got {dimension_count}"
         assert timezone is None or timezone
         assert timezone_offset is None or timezone_offset
 
-        self.__data_descriptor = data_descriptor
+        self.__data_descriptor = ImmutableDataDescriptor.make(data_descriptor)
 
-        self.__intensity_calibration: Calibration.Calibration = copy.deepcopy(intensity_calibration) if intensity_calibration else Calibration.Calibration()
+        self.__intensity_calibration = Calibration.ImmutableCalibration.make(intensity_calibration) if intensity_calibration else _UNCALIBRATED
         if dimensional_calibrations is None:
-            dimensional_calibrations = list()
-            for _ in dimensional_shape:
-                dimensional_calibrations.append(Calibration.Calibration())
-        self.__dimensional_calibrations = copy.deepcopy(dimensional_calibrations)
+            dimensional_calibrations = [_UNCALIBRATED] * len(dimensional_shape)
+        self.__dimensional_calibrations = tuple(Calibration.ImmutableCalibration.make(dimensional_calibration) for dimensional_calibration in dimensional_calibrations)
         self.__timestamp = timestamp if timestamp else DateTime.utcnow()
         self.__timezone = timezone
         self.__timezone_offset = timezone_offset
@@ -182,9 +234,9 @@ class DataMetadata:
             return False
         if self.data_descriptor != other.data_descriptor:
             return False
-        if self.intensity_calibration != other.intensity_calibration:
+        if self.__intensity_calibration != other.__intensity_calibration:
             return False
-        if self.dimensional_calibrations != other.dimensional_calibrations:
+        if self.__dimensional_calibrations != other.__dimensional_calibrations:
             return False
         if self.timezone != other.timezone:
             return False
@@ -199,8 +251,8 @@ class DataMetadata:
         return DataMetadata(
             data_shape=self.data_shape,
             data_dtype=self.data_dtype,
-            intensity_calibration=self.intensity_calibration,
-            dimensional_calibrations=self.dimensional_calibrations,
+            intensity_calibration=self.__intensity_calibration,
+            dimensional_calibrations=self.__dimensional_calibrations,
             metadata=self.__metadata,
             timestamp=self.timestamp,
             data_descriptor=self.data_descriptor,
@@ -227,10 +279,21 @@ class DataMetadata:
 
     @property
     def intensity_calibration(self) -> Calibration.Calibration:
-        return copy.deepcopy(self.__intensity_calibration)
+        return self.__intensity_calibration._make_mutable_copy()
 
     @property
     def dimensional_calibrations(self) -> CalibrationListType:
+        return [dimensional_calibration._make_mutable_copy() for dimensional_calibration in self.__dimensional_calibrations]
+
+    @property
+    def _shared_intensity_calibration(self) -> Calibration.Calibration:
+        # the stored immutable calibration, for reading it or passing it to a new data metadata without copying.
+        return self.__intensity_calibration
+
+    @property
+    def _shared_dimensional_calibrations(self) -> CalibrationListType:
+        # the stored immutable calibrations, for reading them or passing them to a new data metadata without copying.
+        # they are a tuple and cannot be changed.
         return self.__dimensional_calibrations
 
     @property
@@ -344,42 +407,42 @@ class DataMetadata:
 
     @property
     def sequence_dimensional_calibration(self) -> typing.Optional[Calibration.Calibration]:
-        return self.dimensional_calibrations[self.data_descriptor.sequence_dimension_index_slice.start] if self.is_sequence else None
+        return self.__dimensional_calibrations[self.data_descriptor.sequence_dimension_index_slice.start]._make_mutable_copy() if self.is_sequence else None
 
     @property
     def sequence_dimensional_calibrations(self) -> CalibrationListType:
-        return self.dimensional_calibrations[self.data_descriptor.sequence_dimension_index_slice] if self.is_sequence else list()
+        return [dimensional_calibration._make_mutable_copy() for dimensional_calibration in self.__dimensional_calibrations[self.data_descriptor.sequence_dimension_index_slice]] if self.is_sequence else list()
 
     @property
     def collection_dimensional_calibrations(self) -> CalibrationListType:
-        return self.dimensional_calibrations[self.data_descriptor.collection_dimension_index_slice]
+        return [dimensional_calibration._make_mutable_copy() for dimensional_calibration in self.__dimensional_calibrations[self.data_descriptor.collection_dimension_index_slice]]
 
     @property
     def navigation_dimensional_calibrations(self) -> CalibrationListType:
-        return self.dimensional_calibrations[self.data_descriptor.navigation_dimension_index_slice]
+        return [dimensional_calibration._make_mutable_copy() for dimensional_calibration in self.__dimensional_calibrations[self.data_descriptor.navigation_dimension_index_slice]]
 
     @property
     def datum_dimensional_calibrations(self) -> CalibrationListType:
-        return self.dimensional_calibrations[self.data_descriptor.datum_dimension_index_slice]
+        return [dimensional_calibration._make_mutable_copy() for dimensional_calibration in self.__dimensional_calibrations[self.data_descriptor.datum_dimension_index_slice]]
 
     def get_intensity_calibration(self) -> Calibration.Calibration:
         return self.intensity_calibration
 
     def get_dimensional_calibration(self, index: int) -> Calibration.Calibration:
-        return self.dimensional_calibrations[index]
+        return self.__dimensional_calibrations[index]._make_mutable_copy()
 
     def _set_data_shape_and_dtype(self, data_shape_and_dtype: typing.Optional[typing.Tuple[ShapeType, numpy.typing.DTypeLike]]) -> None:
         self.__data_shape_and_dtype = data_shape_and_dtype
 
     def _set_intensity_calibration(self, intensity_calibration: Calibration.Calibration) -> None:
-        self.__intensity_calibration = copy.deepcopy(intensity_calibration)
+        self.__intensity_calibration = Calibration.ImmutableCalibration.make(intensity_calibration)
 
     def _set_dimensional_calibrations(self, dimensional_calibrations: CalibrationListType) -> None:
         assert len(dimensional_calibrations) == len(self.dimensional_shape), f"dimensional_calibrations ({len(dimensional_calibrations)}) must match dimensional_shape ({len(self.dimensional_shape)})"
-        self.__dimensional_calibrations = copy.deepcopy(dimensional_calibrations)
+        self.__dimensional_calibrations = tuple(Calibration.ImmutableCalibration.make(dimensional_calibration) for dimensional_calibration in dimensional_calibrations)
 
     def _set_data_descriptor(self, data_descriptor: DataDescriptor) -> None:
-        self.__data_descriptor = copy.deepcopy(data_descriptor)
+        self.__data_descriptor = ImmutableDataDescriptor.make(data_descriptor)
 
     def _set_metadata(self, metadata: MetadataType) -> None:
         self.__metadata = dict(metadata)
@@ -516,6 +579,95 @@ class DataMetadata:
             raise
 
 
+# the approximate size of the temporaries used for each block while evaluating a lazy expression.
+_LAZY_EVALUATION_BLOCK_SIZE = 8 * 1024 * 1024
+
+_lazy_evaluation_local = threading.local()
+
+
+@contextlib.contextmanager
+def lazy_evaluation() -> typing.Iterator[None]:
+    """Defer evaluation of data and metadata arithmetic performed within the context.
+
+    Operators on data and metadata objects build an expression graph instead of computing intermediate arrays. The graph
+    is evaluated in a single pass, block by block along the first axis, the first time the data of the result is
+    accessed. Peak memory is approximately one output array plus a few block sized temporaries.
+
+    Operands are referenced, not copied. Modifying an operand array before the result is evaluated changes the result.
+    """
+    depth = getattr(_lazy_evaluation_local, "depth", 0)
+    _lazy_evaluation_local.depth = depth + 1
+    try:
+        yield
+    finally:
+        _lazy_evaluation_local.depth = depth
+
+
+def _is_lazy_evaluation_enabled() -> bool:
+    return getattr(_lazy_evaluation_local, "depth", 0) > 0
+
+
+class _LazyExpression:
+    """An element-wise numpy ufunc applied to operands which are arrays, scalars, or other lazy expressions."""
+
+    def __init__(self, op: numpy.ufunc, operands: typing.Sequence[typing.Any]) -> None:
+        self.op = op
+        self.operands = tuple(operands)
+        self.shape: ShapeType = tuple(numpy.broadcast_shapes(*(numpy.shape(operand) for operand in self.operands)))
+        # determine the result type the same way numpy does, keeping python scalars as weakly typed values. arrays,
+        # including 0-d arrays and expressions, are strongly typed and are represented by a sample of their dtype.
+        samples = [numpy.zeros((1,), dtype=operand.dtype) if hasattr(operand, "dtype") else operand for operand in self.operands]
+        with numpy.errstate(all="ignore"):
+            self.dtype = numpy.dtype(op(*samples).dtype)
+
+    def evaluate(self) -> _ImageDataType:
+        result = numpy.empty(self.shape, self.dtype)
+        if result.ndim == 0:
+            result[()] = self.__evaluate(None, self.shape)
+            return result
+        row_size = max(1, math.prod(self.shape[1:]) * self.__max_item_size())
+        rows_per_block = max(1, _LAZY_EVALUATION_BLOCK_SIZE // row_size)
+        for start in range(0, self.shape[0], rows_per_block):
+            block = slice(start, min(start + rows_per_block, self.shape[0]))
+            self.__evaluate(block, self.shape, result[block])
+        return result
+
+    def __max_item_size(self) -> int:
+        item_size: int = self.dtype.itemsize
+        for operand in self.operands:
+            if isinstance(operand, _LazyExpression):
+                item_size = max(item_size, operand.__max_item_size())
+        return item_size
+
+    def __evaluate(self, block: typing.Optional[slice], root_shape: ShapeType, out: typing.Optional[_ImageDataType] = None) -> typing.Any:
+        # evaluate the block of the root expression. operands which broadcast along the first axis are used whole.
+        args = list[typing.Any]()
+        temporaries = list[_ImageDataType]()
+        for operand in self.operands:
+            operand_shape = numpy.shape(operand)
+            # 0-d roots are evaluated whole, so operands are only split when the root has a first axis.
+            operand_block = block if block is not None and len(operand_shape) == len(root_shape) and operand_shape[0] == root_shape[0] else None
+            if isinstance(operand, _LazyExpression):
+                value = operand.__evaluate(operand_block, root_shape)
+                temporaries.append(value)
+            elif operand_block is not None:
+                value = operand[operand_block]
+            elif hasattr(operand, "__array__") and not isinstance(operand, numpy.ndarray):
+                value = numpy.asarray(operand)
+            else:
+                value = operand
+            args.append(value)
+        if out is None:
+            # reuse a temporary from a sub-expression as the output when it is compatible, avoiding an allocation.
+            shape = numpy.broadcast_shapes(*(numpy.shape(arg) for arg in args))
+            for temporary in temporaries:
+                # 0-d sub-expressions evaluate to numpy scalars, which cannot be used as an output.
+                if isinstance(temporary, numpy.ndarray) and temporary.shape == shape and temporary.dtype == self.dtype:
+                    out = temporary
+                    break
+        return self.op(*args, out=out)
+
+
 class DataAndMetadata:
     """A class encapsulating a data future and metadata about the data.
 
@@ -542,7 +694,7 @@ class DataAndMetadata:
                  data_shape: ShapeType | None = None,
                  data_dtype: numpy.typing.DTypeLike | None = None):
         self.__data_lock = threading.RLock()
-        self.__data = data
+        self.__data: _ImageDataType | _LazyExpression = data
         assert isinstance(metadata, dict) if metadata is not None else True
         self.__data_metadata = DataMetadata(
             data_shape_and_dtype=data_shape_and_dtype,
@@ -570,8 +722,8 @@ class DataAndMetadata:
         data_copy = numpy.copy(self.data)
         deepcopy = DataAndMetadata.from_data(
             data=data_copy,
-            intensity_calibration=self.intensity_calibration,
-            dimensional_calibrations=self.dimensional_calibrations,
+            intensity_calibration=self._shared_intensity_calibration,
+            dimensional_calibrations=self._shared_dimensional_calibrations,
             metadata=self.metadata,
             timestamp=self.timestamp,
             data_descriptor=self.data_descriptor,
@@ -609,7 +761,14 @@ class DataAndMetadata:
 
     @property
     def data(self) -> _ImageDataType:
-        return self.__data
+        data = self.__data
+        if isinstance(data, _LazyExpression):
+            with self.__data_lock:
+                data = self.__data
+                if isinstance(data, _LazyExpression):
+                    data = data.evaluate()
+                    self.__data = data
+        return data
 
     @property
     def _data_ex(self) -> _ImageDataType:
@@ -618,8 +777,8 @@ class DataAndMetadata:
     def clone_with_data(self, data: _ImageDataType) -> DataAndMetadata:
         return new_data_and_metadata(
             data=data,
-            intensity_calibration=self.intensity_calibration,
-            dimensional_calibrations=self.dimensional_calibrations,
+            intensity_calibration=self._shared_intensity_calibration,
+            dimensional_calibrations=self._shared_dimensional_calibrations,
             metadata=self.metadata,
             timestamp=self.timestamp,
             data_descriptor=self.data_descriptor,
@@ -648,7 +807,7 @@ class DataAndMetadata:
 
     @property
     def data_descriptor(self) -> DataDescriptor:
-        return copy.deepcopy(self.__data_metadata.data_descriptor)
+        return copy.copy(self.__data_metadata.data_descriptor)
 
     @property
     def is_sequence(self) -> bool:
@@ -754,6 +913,14 @@ class DataAndMetadata:
     def dimensional_calibrations(self) -> CalibrationListType:
         return self.__data_metadata.dimensional_calibrations
 
+    @property
+    def _shared_intensity_calibration(self) -> Calibration.Calibration:
+        return self.__data_metadata._shared_intensity_calibration
+
+    @property
+    def _shared_dimensional_calibrations(self) -> CalibrationListType:
+        return self.__data_metadata._shared_dimensional_calibrations
+
     @property
     def metadata(self) -> MetadataType:
         return self.__data_metadata.metadata
@@ -882,23 +1049,58 @@ class DataAndMetadata:
                 return  data[int(pos[0]), int(pos[1]), int(pos[2]), int(pos[3]), int(pos[4])]
         return None
 
+    def __lazy_operand(self) -> typing.Any:
+        data = self.__data
+        return data if isinstance(data, _LazyExpression) else self._data_ex
+
+    def __lazy_op(self, op: typing.Callable[..., _ImageDataType], operands: typing.Sequence[typing.Any]) -> typing.Optional[DataAndMetadata]:
+        # build a lazy expression if lazy evaluation is enabled and the operation is an element-wise ufunc.
+        if not _is_lazy_evaluation_enabled() or not isinstance(op, numpy.ufunc):
+            return None
+        lazy_operands = list[typing.Any]()
+        for operand in operands:
+            if isinstance(operand, DataAndMetadata):
+                lazy_operands.append(operand.__lazy_operand())
+            elif isinstance(operand, ScalarAndMetadata):
+                lazy_operands.append(operand.value)
+            elif isinstance(operand, numbers.Number) or hasattr(operand, "__array__"):
+                lazy_operands.append(operand)
+            else:
+                return None
+        expression = _LazyExpression(op, lazy_operands)
+        return DataAndMetadata(
+            data=typing.cast(_ImageDataType, expression),
+            data_shape=expression.shape,
+            data_dtype=expression.dtype,
+            intensity_calibration=self._shared_intensity_calibration,
+            dimensional_calibrations=self._shared_dimensional_calibrations)
+
     def __unary_op(self, op: typing.Callable[[_ImageDataType], _ImageDataType]) -> DataAndMetadata:
+        lazy_result = self.__lazy_op(op, (self,))
+        if lazy_result is not None:
+            return lazy_result
         return new_data_and_metadata(
             data=op(self._data_ex),
-            intensity_calibration=self.intensity_calibration,
-            dimensional_calibrations=self.dimensional_calibrations)
+            intensity_calibration=self._shared_intensity_calibration,
+            dimensional_calibrations=self._shared_dimensional_calibrations)
 
     def __binary_op(self, op: typing.Callable[[_ImageDataType, _ImageDataType], _ImageDataType], other: _DataAndMetadataIndeterminateSizeLike) -> DataAndMetadata:
+        lazy_result = self.__lazy_op(op, (self, other))
+        if lazy_result is not None:
+            return lazy_result
         return new_data_and_metadata(
             data=op(self._data_ex, extract_data(other)),
-            intensity_calibration=self.intensity_calibration,
-            dimensional_calibrations=self.dimensional_calibrations)
+            intensity_calibration=self._shared_intensity_calibration,
+            dimensional_calibrations=self._shared_dimensional_calibrations)
 
     def __rbinary_op(self, op: typing.Callable[[_ImageDataType, _ImageDataType], _ImageDataType], other: _DataAndMetadataIndeterminateSizeLike) -> DataAndMetadata:
+        lazy_result = self.__lazy_op(op, (other, self))
+        if lazy_result is not None:
+            return lazy_result
         return new_data_and_metadata(
             data=op(extract_data(other), self._data_ex),
-            intensity_calibration=self.intensity_calibration,
-            dimensional_calibrations=self.dimensional_calibrations)
+            intensity_calibration=self._shared_intensity_calibration,
+            dimensional_calibrations=self._shared_dimensional_calibrations)
 
     def __abs__(self) -> DataAndMetadata:
         return self.__unary_op(numpy.abs)
@@ -972,13 +1174,39 @@ class DataAndMetadata:
     def __getitem__(self, key: typing.Union[_SliceKeyType, _SliceKeyElementType]) -> DataAndMetadata:
         return function_data_slice(self, key_to_list(key))
 
+    def __copy__(self) -> DataAndMetadata:
+        # shallow copies share the data and metadata; see __reduce_ex__ for pickling.
+        result = self.__class__.__new__(self.__class__)
+        result.__dict__.update(self.__dict__)
+        return result
+
+    def __reduce_ex__(self, protocol: typing.SupportsIndex) -> typing.Tuple[typing.Any, ...]:
+        # the data is pickled as an ndarray, which pickle protocol 5 transfers as an out-of-band buffer when a
+        # buffer_callback is passed to pickle.dumps.
+        return DataAndMetadata._from_rpc_dict_and_data, (self.__rpc_metadata_dict(), numpy.require(self.data, requirements="C"))
+
     @classmethod
     def from_rpc_dict(cls, d: typing.Mapping[str, typing.Any]) -> typing.Optional[DataAndMetadata]:
         if d is None:
             return None
         data = pickle.loads(base64.b64decode(d["data"].encode('utf-8')))
+        return cls._from_rpc_dict_and_data(d, data)
+
+    @classmethod
+    def from_rpc_message(cls, header: typing.Union[bytes, str], buffers: typing.Sequence[typing.Any]) -> DataAndMetadata:
+        """Return a new data and metadata from a header and buffers created with to_rpc_message.
+
+        The data wraps the first buffer without copying it. The buffer can be any object supporting the buffer protocol,
+        for instance bytes received from a socket, a memory-mapped file, or the buffer of shared memory. The buffer must
+        stay valid while the data is in use and the data is read-only if the buffer is read-only.
+        """
+        d = json.loads(header)
+        data = numpy.frombuffer(buffers[0], dtype=numpy.dtype(d["dtype"])).reshape(d["shape"])
+        return cls._from_rpc_dict_and_data(d, data)
+
+    @classmethod
+    def _from_rpc_dict_and_data(cls, d: typing.Mapping[str, typing.Any], data: _ImageDataType) -> DataAndMetadata:
         dimensional_shape = Image.dimensional_shape_from_data(data) or tuple()
-        data_shape_and_dtype = data.shape, data.dtype
         intensity_calibration_d = d.get("intensity_calibration")
         intensity_calibration = Calibration.Calibration.from_rpc_dict(intensity_calibration_d) if intensity_calibration_d else None
         dimensional_calibrations_d = d.get("dimensional_calibrations")
@@ -1012,10 +1240,30 @@ class DataAndMetadata:
 
     @property
     def rpc_dict(self) -> typing.Dict[str, typing.Any]:
-        d = dict[str, typing.Any]()
+        d = self.__rpc_metadata_dict()
         data = self.data
         if data is not None:
             d["data"] = base64.b64encode(numpy.ndarray.dumps(data)).decode('utf=8')
+        return d
+
+    def to_rpc_message(self) -> typing.Tuple[bytes, typing.List[pickle.PickleBuffer]]:
+        """Return a header and buffers for sending the data and metadata to another process.
+
+        The header is the metadata encoded as compact JSON. The buffers hold the raw data and reference the data without
+        copying it when the data is contiguous. Pass the header and the received buffers to from_rpc_message to
+        reconstruct the data and metadata. The metadata must be JSON serializable.
+        """
+        data = numpy.require(self.data, requirements="C")
+        if data.dtype.hasobject:
+            raise ValueError("RPC message: invalid data")
+        d = self.__rpc_metadata_dict()
+        d["shape"] = data.shape
+        d["dtype"] = data.dtype.str
+        header = json.dumps(d, separators=(",", ":")).encode("utf-8")
+        return header, [pickle.PickleBuffer(data.data)]
+
+    def __rpc_metadata_dict(self) -> typing.Dict[str, typing.Any]:
+        d = dict[str, typing.Any]()
         if self.intensity_calibration:
             d["intensity_calibration"] = self.intensity_calibration.rpc_dict
         if self.dimensional_calibrations:
@@ -1137,12 +1385,15 @@ def list_to_key(l: _SliceDictKeyType) -> _SliceKeyType:
     return tuple(key)
 
 
-def function_data_slice(data_and_metadata_like: _DataAndMetadataLike, key: _SliceDictKeyType) -> DataAndMetadata:
+def function_data_slice(data_and_metadata_like: _DataAndMetadataLike, key: _SliceDictKeyType, *, copy: bool = True) -> DataAndMetadata:
     """Slice data.
 
     a[2, :]
 
     Keeps calibrations.
+
+    If copy is False and the data is an ndarray, the sliced data is a read-only view of the data instead of a copy. The
+    view reflects later changes to the data.
     """
 
     # (4, 8, 8)[:, 4, 4]
@@ -1219,8 +1470,8 @@ def function_data_slice(data_and_metadata_like: _DataAndMetadataLike, key: _Slic
             if normalized_slice[1]:  # is_newaxis
                 cropped_calibration = Calibration.Calibration()
                 cropped_dimensional_calibrations.append(cropped_calibration)
-            elif dimensional_calibration_index < len(data_and_metadata.dimensional_calibrations):
-                dimensional_calibration = data_and_metadata.dimensional_calibrations[dimensional_calibration_index]
+            elif dimensional_calibration_index < len(data_and_metadata._shared_dimensional_calibrations):
+                dimensional_calibration = data_and_metadata._shared_dimensional_calibrations[dimensional_calibration_index]
                 cropped_calibration = Calibration.Calibration(
                     dimensional_calibration.offset + normalized_slice[2].start * dimensional_calibration.scale,
                     dimensional_calibration.scale / normalized_slice[2].step, dimensional_calibration.units)
@@ -1289,7 +1540,12 @@ def function_data_slice(data_and_metadata_like: _DataAndMetadataLike, key: _Slic
         datum_dimension_count = collection_dimension_count
         collection_dimension_count = 0
 
-    data = data_and_metadata._data_ex[slices].copy()
+    data = data_and_metadata._data_ex[slices]
+    if copy:
+        data = data.copy()
+    elif isinstance(data, numpy.ndarray) and data.base is not None:
+        # a view; make it read-only so that callers cannot change the sliced data.
+        data.flags.writeable = False
     # print(f"was {new_data_and_metadata(data, data_and_metadata.intensity_calibration, cropped_dimensional_calibrations).data_descriptor}")
     # print(f"now [{is_sequence if is_sequence else ''}{collection_dimension_count},{datum_dimension_count}]")
 
@@ -1297,7 +1553,7 @@ def function_data_slice(data_and_metadata_like: _DataAndMetadataLike, key: _Slic
     # print(f"data descriptor {data_descriptor}")
 
     return new_data_and_metadata(data=data,
-                                 intensity_calibration=data_and_metadata.intensity_calibration,
+                                 intensity_calibration=data_and_metadata._shared_intensity_calibration,
                                  dimensional_calibrations=cropped_dimensional_calibrations,
                                  data_descriptor=data_descriptor,
                                  timestamp=data_and_metadata.timestamp,
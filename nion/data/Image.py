@@ -1,17 +1,18 @@
 # standard libraries
 import functools
 import sys
-import warnings
 
 # third party libraries
 import numpy
 import numpy.typing
 import scipy
 import scipy.interpolate
+import scipy.linalg
+import scipy.sparse
 import typing
 
 # local libraries
-# None
+from nion.data import Parallel
 
 
 ShapeType = typing.Sequence[int]
@@ -37,47 +38,107 @@ def scale_multidimensional(image: _ImageDataType, scaled_size: ShapeType) -> _Im
     coords = [numpy.rint(x).astype(int) for x in numpy.ogrid[slices]]
     # coords is now, for an array image of dimension n, a list of n 1d arrays we the
     # coords we want to take from image:
-    return image[coords]
+    return typing.cast(_ImageDataType, image[tuple(coords)])
+
+
+class _ScaleMatrices(typing.NamedTuple):
+    evaluation: typing.Any  # sparse matrix of the weights of the source values or spline coefficients for each destination value
+    collocation: typing.Optional[_ImageDataType]  # banded matrix of the spline at the source positions; None if linear
+    bandwidths: typing.Tuple[int, int]  # the lower and upper bandwidths of the collocation matrix
+
+
+@functools.lru_cache(maxsize=64)
+def _get_scale_matrices(src_length: int, dst_length: int, method: str) -> _ScaleMatrices:
+    # return the matrices which interpolate src_length evenly spaced values at dst_length evenly spaced positions over
+    # the same range, matching RectBivariateSpline with s=0 along one axis. cubic interpolation solves for the
+    # coefficients of a not-a-knot spline, then evaluates them; axes too short for a cubic spline are linear.
+    x = numpy.arange(src_length, dtype=numpy.float64)
+    positions = numpy.linspace(0, src_length - 1, dst_length)
+    if src_length == 1:
+        return _ScaleMatrices(scipy.sparse.csr_matrix(numpy.ones((dst_length, 1))), None, (0, 0))
+    if method == 'cubic' and src_length > 3:
+        knots = numpy.concatenate([[x[0]] * 4, x[2:-2], [x[-1]] * 4])
+        collocation = scipy.interpolate.BSpline.design_matrix(x, knots, 3).tocoo()
+        lower = int(numpy.amax(collocation.row - collocation.col))
+        upper = int(numpy.amax(collocation.col - collocation.row))
+        banded_collocation = numpy.zeros((lower + upper + 1, src_length))
+        banded_collocation[upper + collocation.row - collocation.col, collocation.col] = collocation.data
+        banded_collocation.flags.writeable = False
+        return _ScaleMatrices(scipy.interpolate.BSpline.design_matrix(positions, knots, 3).tocsr(), banded_collocation, (lower, upper))
+    knots = numpy.concatenate([[x[0]], x, [x[-1]]])
+    return _ScaleMatrices(scipy.interpolate.BSpline.design_matrix(positions, knots, 1).tocsr(), None, (0, 0))
+
+
+def _scale_axes(data: _ImageDataType, axes: typing.Sequence[int], size: ShapeType, method: str) -> _ImageDataType:
+    # interpolate the float64 data along each of axes to the corresponding length in size. the other axes (channels
+    # and stack) are interpolated together, one matrix product per axis.
+    for axis, dst_length in zip(axes, size):
+        matrices = _get_scale_matrices(data.shape[axis], dst_length, method)
+        values = numpy.moveaxis(data, axis, 0)
+        other_shape = values.shape[1:]
+        values = numpy.reshape(values, (values.shape[0], -1))
+        if matrices.collocation is not None:
+            values = scipy.linalg.solve_banded(matrices.bandwidths, matrices.collocation, numpy.asfortranarray(values), check_finite=False)
+        data = numpy.moveaxis(numpy.reshape(matrices.evaluation @ values, (dst_length,) + other_shape), 0, axis)
+    return data
 
 
 # size is c-indexed (height, width)
 def scaled(image: _ImageDataType, size: ShapeType, method: str = 'linear') -> _ImageDataType:
+    """Return the 2D, RGB, or RGBA image interpolated to size with method 'nearest', 'linear', or 'cubic'.
+
+    The linear and cubic interpolation matrices for a source and destination length are calculated once and reused.
+    Scalar images return float64 values; RGB and RGBA images return uint8 values with all channels interpolated
+    together.
+    """
     size = tuple(size)
 
     if method=='nearest':
         return scale_multidimensional(image, size)
 
     assert numpy.ndim(image) in (2,3)
-    if numpy.ndim(image) == 2:
-        if method == 'cubic':
-            iy = numpy.linspace(0, image.shape[0]-1, size[0])
-            ix = numpy.linspace(0, image.shape[1]-1, size[1])
-            f = scipy.interpolate.RectBivariateSpline(numpy.arange(image.shape[0]), numpy.arange(image.shape[1]), image, ky=3, kx=3)
-            return typing.cast(_ImageDataType, f(iy, ix))
-        elif method == 'linear':
-            iy = numpy.linspace(0, image.shape[0]-1, size[0])
-            ix = numpy.linspace(0, image.shape[1]-1, size[1])
-            f = scipy.interpolate.RectBivariateSpline(numpy.arange(image.shape[0]), numpy.arange(image.shape[1]), image, ky=1, kx=1)
-            return typing.cast(_ImageDataType, f(iy, ix))
-        else:  # nearest
-            dst: numpy.typing.NDArray[typing.Any] = numpy.empty(size, image.dtype)
-            indices = numpy.indices(size)
-            indices[0] = ((image.shape[0]-1) * indices[0].astype(float) / size[0]).round()
-            indices[1] = ((image.shape[1]-1) * indices[1].astype(float) / size[1]).round()
-            dst[:, :] = image[(indices[0], indices[1])]
-            return dst
-    elif numpy.ndim(image) == 3:
+    if method in ('linear', 'cubic'):
+        if numpy.ndim(image) == 2:
+            return _scale_axes(numpy.asarray(image, dtype=numpy.float64), (0, 1), size, method)
         assert image.shape[2] in (3,4)  # rgb, rgba
         dst_image: numpy.typing.NDArray[numpy.uint8] = numpy.empty(size + (image.shape[2],), numpy.uint8)
-        dst_image[:, :, 0] = scaled(image[:, :, 0], size, method=method)
-        dst_image[:, :, 1] = scaled(image[:, :, 1], size, method=method)
-        dst_image[:, :, 2] = scaled(image[:, :, 2], size, method=method)
-        if image.shape[2] == 4:
-            dst_image[:, :, 3] = scaled(image[:, :, 3], size, method=method)
+        dst_image[...] = _scale_axes(numpy.asarray(image, dtype=numpy.float64), (0, 1), size, method)
         return dst_image
+    if numpy.ndim(image) == 2:
+        # nearest
+        dst: numpy.typing.NDArray[typing.Any] = numpy.empty(size, image.dtype)
+        indices = numpy.indices(size)
+        indices[0] = ((image.shape[0]-1) * indices[0].astype(float) / size[0]).round()
+        indices[1] = ((image.shape[1]-1) * indices[1].astype(float) / size[1]).round()
+        dst[:, :] = image[(indices[0], indices[1])]
+        return dst
+    elif numpy.ndim(image) == 3:
+        assert image.shape[2] in (3,4)  # rgb, rgba
+        dst_channels_image: numpy.typing.NDArray[numpy.uint8] = numpy.empty(size + (image.shape[2],), numpy.uint8)
+        for channel in range(image.shape[2]):
+            dst_channels_image[:, :, channel] = scaled(image[:, :, channel], size, method=method)
+        return dst_channels_image
     raise Exception("Unable to scale image")
 
 
+def scaled_stack(images: _ImageDataType, size: ShapeType, method: str = 'linear') -> _ImageDataType:
+    """Return each image of a stack of 2D, RGB, or RGBA images scaled to size, the same as scaled for each image.
+
+    All images are interpolated together, one matrix product per axis.
+    """
+    size = tuple(size)
+
+    assert numpy.ndim(images) in (3, 4)
+    if method == 'nearest':
+        return scale_multidimensional(images, (images.shape[0],) + size)
+    if numpy.ndim(images) == 3:
+        return _scale_axes(numpy.asarray(images, dtype=numpy.float64), (1, 2), size, method)
+    assert images.shape[3] in (3, 4)  # rgb, rgba
+    dst_images: numpy.typing.NDArray[numpy.uint8] = numpy.empty((images.shape[0],) + size + (images.shape[3],), numpy.uint8)
+    dst_images[...] = _scale_axes(numpy.asarray(images, dtype=numpy.float64), (1, 2), size, method)
+    return dst_images
+
+
 def rebin_1d(src: _ImageDataType, len: int, retained: typing.Optional[typing.Dict[str, typing.Any]] = None) -> _ImageDataType:
     src_len = src.shape[0]
     if len < src_len:
@@ -356,90 +417,149 @@ def scalar_from_array(array: _ImageDataType, normalize: bool = True) -> _ImageDa
     return array
 
 
+# size in bytes of the input rows rendered together when creating an rgba image. the rows and the temporary arrays
+# for them should stay in the processor cache while the rows are rendered.
+_RGBA_BLOCK_SIZE = 256 * 1024
+
+
+def _get_rgba_row_blocks(array: _ImageDataType) -> typing.List[typing.Tuple[int, int]]:
+    row_nbytes = max(1, array.shape[1] * numpy.dtype(array.dtype).itemsize)
+    block_height = max(1, _RGBA_BLOCK_SIZE // row_nbytes)
+    return [(row, min(row + block_height, array.shape[0])) for row in range(0, array.shape[0], block_height)]
+
+
+def _run_on_rgba_row_blocks(array: _ImageDataType, fn: typing.Callable[[int, int], None]) -> None:
+    # render the row blocks, splitting them between the workers of the shared worker pool.
+    row_blocks = _get_rgba_row_blocks(array)
+
+    def process_row_blocks(block_range: range) -> None:
+        with numpy.errstate(invalid="ignore"):
+            for block_index in block_range:
+                fn(*row_blocks[block_index])
+
+    Parallel.run(process_row_blocks, Parallel.split_range(0, len(row_blocks)))
+
+
+def _get_data_range(array: _ImageDataType) -> typing.Tuple[typing.Any, typing.Any]:
+    row_blocks = _get_rgba_row_blocks(array)
+    block_mins: typing.List[typing.Any] = [None] * len(row_blocks)
+    block_maxs: typing.List[typing.Any] = [None] * len(row_blocks)
+
+    def process_row_blocks(block_range: range) -> None:
+        for block_index in block_range:
+            row_start, row_stop = row_blocks[block_index]
+            block = numpy.asarray(array[row_start:row_stop])
+            block_mins[block_index] = numpy.amin(block)
+            block_maxs[block_index] = numpy.amax(block)
+
+    Parallel.run(process_row_blocks, Parallel.split_range(0, len(row_blocks)))
+    return numpy.amin(block_mins), numpy.amax(block_maxs)
+
+
+def _set_rgba_gray(rgba_block: _RGBAImageDataType, values: _ImageDataType) -> None:
+    # write the values, truncated to uint8, to the red, green, and blue components and set alpha to 255 in one pass.
+    # values may have NaNs; by experiment they get treated as zero.
+    gray = values.astype(numpy.uint8) if values.dtype != numpy.uint8 else values
+    numpy.multiply(gray, numpy.uint32(0x00010101), out=rgba_block, dtype=numpy.uint32)
+    numpy.bitwise_or(rgba_block, numpy.uint32(0xFF000000), out=rgba_block)
+
+
+def _set_rgba_lookup(rgba_block: _RGBAImageDataType, indexes: _ImageDataType, lookup: _RGBAImageDataType) -> None:
+    get_rgb_view(rgba_block)[:] = lookup[numpy.clip(indexes, 0, 255)]
+    get_alpha_view(rgba_block)[:] = 255
+
+
 # data_range and display_limits are in data value units. both are option parameters.
 # if display limits is specified, values out of range are mapped to the min/max colors.
 # if display limits are not specified, data range can be passed to avoid calculating min/max again.
 # if underlimit/overlimit are specified and display limits are specified, values out of the under/over
 #   limit percentage values are mapped to blue and red.
-# may return a new array or a view on the existing array
+# if out is specified, it must be a uint32 array with the shape of the image; the image is written to it and out is
+#   returned. otherwise may return a new array or a view on the existing array.
+# scalar images are rendered in blocks of rows using the shared worker pool. the under/over limit colors are applied
+#   to each block as it is rendered.
 def create_rgba_image_from_array(array: _ImageDataType, normalize: bool = True,
                                  data_range: typing.Optional[typing.Tuple[float, float]] = None,
                                  display_limits: typing.Optional[typing.Tuple[float, float]] = None,
                                  underlimit: typing.Optional[float] = None, overlimit: typing.Optional[float] = None,
-                                 lookup: typing.Optional[_RGBAImageDataType] = None) -> _RGBAImageDataType:
+                                 lookup: typing.Optional[_RGBAImageDataType] = None,
+                                 out: typing.Optional[_RGBAImageDataType] = None) -> _RGBAImageDataType:
     assert numpy.ndim(array) in (1, 2, 3)
     assert numpy.can_cast(array.dtype, numpy.double)
     if numpy.ndim(array) == 1:  # temporary hack to display 1-d images
         array = array.reshape((1,) + array.shape)
     if numpy.ndim(array) == 2:
-        rgba_image: numpy.typing.NDArray[numpy.uint32] = numpy.empty(array.shape, numpy.uint32)
+        if out is not None:
+            assert out.shape == array.shape and out.dtype == numpy.uint32
+            rgba_image: numpy.typing.NDArray[numpy.uint32] = out
+        else:
+            rgba_image = numpy.empty(array.shape, numpy.uint32)
         if normalize:
             if display_limits and len(display_limits) == 2:
                 nmin_new = display_limits[0]
                 nmax_new = display_limits[1]
                 # scalar data assigned to each component of rgb view
                 m = 255.0 / (nmax_new - nmin_new) if nmax_new != nmin_new else 1
-                if lookup is not None:
-                    get_rgb_view(rgba_image)[:] = lookup[numpy.clip(typing.cast(_ImageDataType, m * (array - nmin_new)).astype(int), 0, 255)]
-                else:
-                    # slower by 5ms
-                    # get_rgb_view(rgba_image)[:] = numpy.clip(numpy.multiply(m, numpy.subtract(array[..., numpy.newaxis], nmin_new)), 0, 255)
-                    # slowest by 15ms
-                    # clipped_array = numpy.clip(array, nmin_new, nmax_new)
-                    # get_rgb_view(rgba_image)[:] = m * (clipped_array[..., numpy.newaxis] - nmin_new)
-                    # best (in place)
-                    clipped_array = numpy.clip(array, nmin_new, nmax_new)  # 12ms
-                    if clipped_array.dtype in (numpy.dtype(numpy.float32), numpy.dtype(numpy.float64)):
-                        # 12ms
-                        numpy.subtract(clipped_array, nmin_new, out=clipped_array)
-                        numpy.multiply(clipped_array, m, out=clipped_array)
+
+                def render_display_limits(row_start: int, row_stop: int) -> None:
+                    block = numpy.asarray(array[row_start:row_stop])
+                    rgba_block = rgba_image[row_start:row_stop]
+                    if lookup is not None:
+                        _set_rgba_lookup(rgba_block, typing.cast(_ImageDataType, m * (block - nmin_new)).astype(int), lookup)
                     else:
-                        clipped_array = (clipped_array - nmin_new) * m
-                    # 16ms
-                    with warnings.catch_warnings():
-                        # clipped_array may have NaNs; ignore the warnings, by experiment they get treated as zero.
-                        warnings.simplefilter("ignore")
-                        get_red_view(rgba_image)[:] = clipped_array
-                        get_green_view(rgba_image)[:] = clipped_array
-                        get_blue_view(rgba_image)[:] = clipped_array
-                if overlimit:
-                    rgba_image = numpy.where(numpy.less(array - nmin_new, nmax_new - nmin_new * overlimit), rgba_image, 0xFFFF0000)
-                if underlimit:
-                    rgba_image = numpy.where(numpy.greater(array - nmin_new, nmax_new - nmin_new * underlimit), rgba_image, 0xFF0000FF)
+                        clipped_block = numpy.clip(block, nmin_new, nmax_new)
+                        if clipped_block.dtype in (numpy.dtype(numpy.float32), numpy.dtype(numpy.float64)):
+                            numpy.subtract(clipped_block, nmin_new, out=clipped_block)
+                            numpy.multiply(clipped_block, m, out=clipped_block)
+                        else:
+                            clipped_block = (clipped_block - nmin_new) * m
+                        _set_rgba_gray(rgba_block, clipped_block)
+                    if overlimit:
+                        numpy.copyto(rgba_block, numpy.uint32(0xFFFF0000), where=numpy.logical_not(numpy.less(block - nmin_new, nmax_new - nmin_new * overlimit)))
+                    if underlimit:
+                        numpy.copyto(rgba_block, numpy.uint32(0xFF0000FF), where=numpy.logical_not(numpy.greater(block - nmin_new, nmax_new - nmin_new * underlimit)))
+
+                _run_on_rgba_row_blocks(array, render_display_limits)
             elif array.size:
-                nmin = data_range[0] if data_range else numpy.amin(array)
-                nmax = data_range[1] if data_range else numpy.amax(array)
+                nmin, nmax = data_range if data_range else _get_data_range(array)
                 # scalar data assigned to each component of rgb view
                 m = 255.0 / (nmax - nmin) if nmax != nmin else 1.0
-                if lookup is not None:
-                    get_rgb_view(rgba_image)[:] = lookup[numpy.clip((m * (array - nmin)).astype(int), 0, 255)]
-                else:
-                    # get_rgb_view(rgba_image)[:] = m * (array[..., numpy.newaxis] - nmin)
-                    # optimized version below
-                    r0: numpy.typing.NDArray[numpy.uint8] = numpy.empty(array.shape, numpy.uint8)
-                    r0[:] = (m * (array - nmin))
-                    rgb_view = get_dtype_view(rgba_image, numpy.uint8).reshape(rgba_image.shape + (-1, ))[..., :3]
-                    rgb_view[..., 0] = rgb_view[..., 1] = rgb_view[..., 2] = r0
-                if overlimit:
-                    rgba_image = numpy.where(numpy.less(array - nmin, (nmax - nmin) * overlimit), rgba_image, 0xFFFF0000)
-                if underlimit:
-                    rgba_image = numpy.where(numpy.greater(array - nmin, (nmax - nmin) * underlimit), rgba_image, 0xFF0000FF)
+
+                def render_data_range(row_start: int, row_stop: int) -> None:
+                    block = numpy.asarray(array[row_start:row_stop])
+                    rgba_block = rgba_image[row_start:row_stop]
+                    if lookup is not None:
+                        _set_rgba_lookup(rgba_block, (m * (block - nmin)).astype(int), lookup)
+                    else:
+                        _set_rgba_gray(rgba_block, m * (block - nmin))
+                    if overlimit:
+                        numpy.copyto(rgba_block, numpy.uint32(0xFFFF0000), where=numpy.logical_not(numpy.less(block - nmin, (nmax - nmin) * overlimit)))
+                    if underlimit:
+                        numpy.copyto(rgba_block, numpy.uint32(0xFF0000FF), where=numpy.logical_not(numpy.greater(block - nmin, (nmax - nmin) * underlimit)))
+
+                _run_on_rgba_row_blocks(array, render_data_range)
         else:
-            get_rgb_view(rgba_image)[:] = array[..., numpy.newaxis]  # scalar data assigned to each component of rgb view
-        if rgba_image.size:
-            # 3ms
-            get_alpha_view(rgba_image)[:] = 255
+            def render_unnormalized(row_start: int, row_stop: int) -> None:
+                # scalar data assigned to each component of rgb view
+                _set_rgba_gray(rgba_image[row_start:row_stop], numpy.asarray(array[row_start:row_stop]))
+
+            _run_on_rgba_row_blocks(array, render_unnormalized)
         return rgba_image
     elif numpy.ndim(array) == 3:
         assert array.shape[2] in (3,4)  # rgb, rgba
         if array.shape[2] == 4:
-            return get_dtype_view(array, numpy.uint32).reshape(array.shape[:-1])  # squash the color into uint32
+            rgba_data = get_dtype_view(array, numpy.uint32).reshape(array.shape[:-1])  # squash the color into uint32
         else:
             assert array.shape[2] == 3
-            rgba_image = numpy.empty(array.shape[:-1] + (4,), numpy.uint8)
-            rgba_image[:,:,0:3] = array
-            rgba_image[:,:,3] = 255
-            return get_dtype_view(rgba_image, numpy.uint32).reshape(rgba_image.shape[:-1])  # squash the color into uint32
+            rgba_bytes = numpy.empty(array.shape[:-1] + (4,), numpy.uint8)
+            rgba_bytes[:,:,0:3] = array
+            rgba_bytes[:,:,3] = 255
+            rgba_data = get_dtype_view(rgba_bytes, numpy.uint32).reshape(rgba_bytes.shape[:-1])  # squash the color into uint32
+        if out is not None:
+            assert out.shape == rgba_data.shape and out.dtype == numpy.uint32
+            out[...] = rgba_data
+            return out
+        return rgba_data
     raise Exception("Could not create RGBA from data.")
 
 
@@ -0,0 +1,277 @@
+"""Opt-in memoization of expensive data processing functions.
+
+Functions decorated with memoize return a cached result when they are called again with the same data and the same
+parameters. The cache is disabled by default; use configure to enable it with a maximum size in bytes. Least recently
+used results are evicted when the cache is full.
+
+Data is identified by the identity of its array and a generation counter for the array's buffer. Code which modifies
+an array in place should call mark_modified so that results calculated from the previous contents are not returned. As
+a fallback, a hash of a sample of the data is compared when a cached result is found, which catches most unmarked
+modifications but not all of them.
+
+Cached data is read-only. Each call returns a new data and metadata object, but the data array is shared with the
+cache and with other callers.
+"""
+
+# standard libraries
+import collections
+import dataclasses
+import functools
+import sys
+import threading
+import typing
+import weakref
+
+# third party libraries
+import numpy
+import numpy.typing
+
+# local libraries
+from nion.data import DataAndMetadata
+
+
+_F = typing.TypeVar("_F", bound=typing.Callable[..., typing.Any])
+
+# arrays with at most this many elements are hashed completely; larger arrays are hashed at this many evenly spaced
+# elements.
+_SAMPLE_COUNT = 4096
+
+
+@dataclasses.dataclass(frozen=True)
+class CacheStatistics:
+    hits: int
+    misses: int
+    evictions: int
+    entry_count: int
+    nbytes: int
+    max_bytes: int
+
+
+class _Uncacheable(Exception):
+    pass
+
+
+@dataclasses.dataclass
+class _CacheEntry:
+    value: typing.Any
+    nbytes: int
+    array_refs: typing.List[weakref.ReferenceType[numpy.typing.NDArray[typing.Any]]]
+    sample_hashes: typing.List[int]
+
+
+_lock = threading.RLock()
+_max_bytes = 0
+_nbytes = 0
+_hits = 0
+_misses = 0
+_evictions = 0
+_entries: collections.OrderedDict[typing.Hashable, _CacheEntry] = collections.OrderedDict()
+# keys of entries whose data has been garbage collected; removed on the next cache operation.
+_dead_keys: collections.deque[typing.Hashable] = collections.deque()
+# buffer generations by id of the buffer's base array. entries are removed when the base array is garbage collected.
+_generations: typing.Dict[int, int] = dict()
+
+
+def configure(*, max_bytes: int = 0) -> None:
+    """Configure the cache and clear it. A max_bytes of zero, the default, disables the cache."""
+    global _max_bytes
+    if max_bytes < 0:
+        raise ValueError("Memoization: max_bytes must not be negative")
+    with _lock:
+        _max_bytes = max_bytes
+        clear()
+
+
+def clear() -> None:
+    """Remove all results from the cache and reset the statistics."""
+    global _nbytes, _hits, _misses, _evictions
+    with _lock:
+        _entries.clear()
+        _dead_keys.clear()
+        _nbytes = 0
+        _hits = 0
+        _misses = 0
+        _evictions = 0
+
+
+def get_statistics() -> CacheStatistics:
+    """Return the hit, miss, and eviction counts since the cache was last cleared, and the current size."""
+    with _lock:
+        _remove_dead_entries()
+        return CacheStatistics(_hits, _misses, _evictions, len(_entries), _nbytes, _max_bytes)
+
+
+def mark_modified(data: typing.Union[numpy.typing.NDArray[typing.Any], DataAndMetadata.DataAndMetadata]) -> None:
+    """Mark the buffer of data as modified, so that results calculated from its previous contents are not returned.
+
+    Marking any array or view marks the buffer, so results calculated from other views of it are not returned either.
+    """
+    array = data._data_ex if isinstance(data, DataAndMetadata.DataAndMetadata) else data
+    if isinstance(array, numpy.ndarray):
+        base = _get_base(array)
+        with _lock:
+            base_id = id(base)
+            if base_id not in _generations:
+                weakref.finalize(base, _generations.pop, base_id, None)
+            _generations[base_id] = _generations.get(base_id, 0) + 1
+
+
+def memoize(fn: _F) -> _F:
+    """Decorate fn so that its results are cached when the cache is enabled (see configure).
+
+    The arguments of fn must be arrays, data and metadata objects, or hashable values. Calls with other arguments are
+    not cached. Array results, including the data of data and metadata results, are made read-only.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        if _max_bytes <= 0:
+            return fn(*args, **kwargs)
+        arrays: typing.List[numpy.typing.NDArray[typing.Any]] = list()
+        try:
+            key = (fn.__module__, fn.__qualname__, _get_fingerprint(args, arrays), _get_fingerprint(tuple(sorted(kwargs.items())), arrays))
+            hash(key)
+        except (_Uncacheable, TypeError):
+            return fn(*args, **kwargs)
+        cached_value = _get(key, arrays)
+        if cached_value is not None:
+            return _share(cached_value)
+        value = fn(*args, **kwargs)
+        _freeze(value)
+        _put(key, arrays, value)
+        return _share(value)
+
+    return typing.cast(_F, wrapper)
+
+
+def _get_base(array: numpy.typing.NDArray[typing.Any]) -> numpy.typing.NDArray[typing.Any]:
+    while isinstance(array.base, numpy.ndarray):
+        array = array.base
+    return array
+
+
+def _get_sample_hash(array: numpy.typing.NDArray[typing.Any]) -> int:
+    if array.size <= _SAMPLE_COUNT:
+        return hash(numpy.ascontiguousarray(array).tobytes())
+    indexes = numpy.linspace(0, array.size - 1, _SAMPLE_COUNT, dtype=numpy.int64)
+    return hash(array.flat[indexes].tobytes())
+
+
+def _get_array_fingerprint(array: numpy.typing.NDArray[typing.Any], arrays: typing.List[numpy.typing.NDArray[typing.Any]]) -> typing.Hashable:
+    arrays.append(array)
+    base = _get_base(array)
+    return id(array), array.__array_interface__["data"][0], array.shape, array.strides, array.dtype.str, id(base), _generations.get(id(base), 0)
+
+
+def _get_calibration_fingerprint(calibration: typing.Any) -> typing.Hashable:
+    return calibration.offset, calibration.scale, calibration.units
+
+
+def _get_fingerprint(value: typing.Any, arrays: typing.List[numpy.typing.NDArray[typing.Any]]) -> typing.Hashable:
+    # return a hashable fingerprint of value, adding the arrays in value to arrays. raise _Uncacheable if value
+    # cannot be fingerprinted.
+    if isinstance(value, DataAndMetadata.DataAndMetadata):
+        data = value._data_ex
+        if not isinstance(data, numpy.ndarray):
+            raise _Uncacheable()
+        data_descriptor = value.data_descriptor
+        return ("xdata", _get_array_fingerprint(data, arrays),
+                _get_calibration_fingerprint(value.intensity_calibration),
+                tuple(_get_calibration_fingerprint(c) for c in value.dimensional_calibrations),
+                (data_descriptor.is_sequence, data_descriptor.collection_dimension_count, data_descriptor.datum_dimension_count))
+    if isinstance(value, numpy.ndarray):
+        return "array", _get_array_fingerprint(value, arrays)
+    if isinstance(value, (tuple, list)):
+        return type(value).__name__, tuple(_get_fingerprint(v, arrays) for v in value)
+    if isinstance(value, dict) or getattr(type(value), "__hash__", None) is object.__hash__:
+        # objects hashed by identity do not identify their contents.
+        raise _Uncacheable()
+    return typing.cast(typing.Hashable, value)
+
+
+def _remove_dead_entries() -> None:
+    global _nbytes
+    while _dead_keys:
+        entry = _entries.pop(_dead_keys.popleft(), None)
+        if entry:
+            _nbytes -= entry.nbytes
+
+
+def _get(key: typing.Hashable, arrays: typing.Sequence[numpy.typing.NDArray[typing.Any]]) -> typing.Any:
+    global _hits, _misses, _nbytes
+    with _lock:
+        _remove_dead_entries()
+        entry = _entries.get(key)
+        if entry is not None:
+            # the arrays must be the same objects (ids may be reused) with the same sampled contents.
+            if len(entry.array_refs) == len(arrays) and all(ref() is array for ref, array in zip(entry.array_refs, arrays)):
+                if entry.sample_hashes == [_get_sample_hash(array) for array in arrays]:
+                    _entries.move_to_end(key)
+                    _hits += 1
+                    return entry.value
+            del _entries[key]
+            _nbytes -= entry.nbytes
+        _misses += 1
+        return None
+
+
+def _put(key: typing.Hashable, arrays: typing.Sequence[numpy.typing.NDArray[typing.Any]], value: typing.Any) -> None:
+    global _nbytes, _evictions
+    nbytes = _get_nbytes(value)
+    if value is None or nbytes > _max_bytes:
+        return
+
+    def remove_key(ref: typing.Any) -> None:
+        _dead_keys.append(key)
+
+    entry = _CacheEntry(value, nbytes, [weakref.ref(array, remove_key) for array in arrays], [_get_sample_hash(array) for array in arrays])
+    with _lock:
+        _remove_dead_entries()
+        old_entry = _entries.pop(key, None)
+        if old_entry:
+            _nbytes -= old_entry.nbytes
+        _entries[key] = entry
+        _nbytes += nbytes
+        while _nbytes > _max_bytes and _entries:
+            _, evicted_entry = _entries.popitem(last=False)
+            _nbytes -= evicted_entry.nbytes
+            _evictions += 1
+
+
+def _get_nbytes(value: typing.Any) -> int:
+    if isinstance(value, DataAndMetadata.DataAndMetadata):
+        return int(value._data_ex.nbytes)
+    if isinstance(value, numpy.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(_get_nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def _freeze(value: typing.Any) -> None:
+    if isinstance(value, DataAndMetadata.DataAndMetadata):
+        _freeze(value._data_ex)
+    elif isinstance(value, numpy.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, (tuple, list)):
+        for v in value:
+            _freeze(v)
+
+
+def _share(value: typing.Any) -> typing.Any:
+    # return value for a caller, sharing the read-only data with the cache. data and metadata objects are recreated so
+    # that changing the calibrations or metadata of the returned object does not change the cached result.
+    if isinstance(value, DataAndMetadata.DataAndMetadata):
+        return DataAndMetadata.new_data_and_metadata(data=value._data_ex,
+                                                     intensity_calibration=value.intensity_calibration,
+                                                     dimensional_calibrations=value.dimensional_calibrations,
+                                                     metadata=value.metadata,
+                                                     timestamp=value.timestamp,
+                                                     data_descriptor=value.data_descriptor,
+                                                     timezone=value.timezone,
+                                                     timezone_offset=value.timezone_offset)
+    if isinstance(value, list):
+        return [_share(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_share(v) for v in value)
+    return value
@@ -1,7 +1,7 @@
 import copy
+import functools
 import gettext
-import logging
-import multiprocessing
+import multiprocessing.shared_memory
 import numpy
 import scipy.ndimage
 import threading
@@ -10,14 +10,9 @@ import typing
 from nion.data import Calibration
 from nion.data import Core
 from nion.data import DataAndMetadata
-
-
-try:
-    import mkl
-except ModuleNotFoundError:
-    _has_mkl = False
-else:
-    _has_mkl = True
+from nion.data import Parallel
+from nion.data import Sparse
+from nion.data import TemplateMatching
 
 
 _ = gettext.gettext
@@ -25,6 +20,9 @@ _ = gettext.gettext
 
 _ImageDataType = DataAndMetadata._ImageDataType
 
+# the size of the blocks in bytes used to copy data in and out of shared memory.
+_SHARED_MEMORY_COPY_BLOCK_SIZE = 64 * 1024 * 1024
+
 
 def function_integrate_along_axis(input_xdata: DataAndMetadata.DataAndMetadata,
                                   integration_axes: typing.Tuple[int, ...],
@@ -51,18 +49,27 @@ def function_integrate_along_axis(input_xdata: DataAndMetadata.DataAndMetadata,
     integration_axis_shape = tuple((input_xdata.data_shape[i] for i in integration_axes))
     # chr(97) == 'a' so we get letters in alphabetic order here (a, b, c, d, ...)
     sum_str = ''.join([chr(i + 97) for i in range(len(integration_axis_shape))])
-    operands = [input_xdata.data]
-    if integration_mask is not None:
-        operands.append(integration_mask)
-        sum_str = data_str + ',' + mask_str
+    data = input_xdata._data_ex
+    if isinstance(data, Sparse.EventArray):
+        # sum sparse data from its events, with the same result dtype as einsum.
+        if integration_mask is not None:
+            weights = numpy.reshape(integration_mask, tuple(n if i in integration_axes else 1 for i, n in enumerate(input_xdata.data_shape)))
+            result_data = data.sum(integration_axes, weights=weights).astype(numpy.result_type(data.dtype, integration_mask.dtype), copy=False)
+        else:
+            result_data = data.sum(integration_axes).astype(data.dtype, copy=False)
     else:
-        sum_str = data_str + '->' + navigation_str
-    result_data = numpy.einsum(sum_str, *operands)
+        operands = [input_xdata.data]
+        if integration_mask is not None:
+            operands.append(integration_mask)
+            sum_str = data_str + ',' + mask_str
+        else:
+            sum_str = data_str + '->' + navigation_str
+        result_data = numpy.einsum(sum_str, *operands)
 
     result_dimensional_calibrations = []
     for i in range(len(input_xdata.data_shape)):
         if not i in integration_axes:
-            result_dimensional_calibrations.append(input_xdata.dimensional_calibrations[i])
+            result_dimensional_calibrations.append(input_xdata._shared_dimensional_calibrations[i])
 
     result_data = numpy.atleast_1d(result_data)
 
@@ -97,7 +104,7 @@ def function_integrate_along_axis(input_xdata: DataAndMetadata.DataAndMetadata,
     result_data_descriptor = DataAndMetadata.DataDescriptor(is_sequence, collection_dimension_count, datum_dimension_count)
 
     return DataAndMetadata.new_data_and_metadata(data=result_data,
-                                                 intensity_calibration=input_xdata.intensity_calibration,
+                                                 intensity_calibration=input_xdata._shared_intensity_calibration,
                                                  dimensional_calibrations=result_dimensional_calibrations,
                                                  data_descriptor=result_data_descriptor)
 
@@ -180,10 +187,15 @@ def function_measure_multi_dimensional_shifts(xdata: DataAndMetadata.DataAndMeta
                                               reference_index: typing.Optional[int] = None,
                                               bounds: typing.Optional[typing.Union[Core.NormIntervalType, Core.NormRectangleType]] = None,
                                               max_shift: typing.Optional[int] = None,
-                                              origin: typing.Optional[typing.Tuple[int, ...]] = None) -> DataAndMetadata.DataAndMetadata:
+                                              origin: typing.Optional[typing.Tuple[int, ...]] = None,
+                                              *,
+                                              cancel_event: typing.Optional[threading.Event] = None) -> DataAndMetadata.DataAndMetadata:
     """
     "max_shift" defines the maximum allowed template shift in pixels. "max_shift" is calculated around "origin", which
     is the offset from the center of the image.
+
+    The shifts are measured using the shared worker pool (see Parallel). Setting "cancel_event" stops the measurement
+    and raises concurrent.futures.CancelledError.
     """
 
     iteration_shape: typing.Tuple[int, ...] = tuple()
@@ -192,9 +204,9 @@ def function_measure_multi_dimensional_shifts(xdata: DataAndMetadata.DataAndMeta
     for i in range(len(xdata.data_shape)):
         if not i in shift_axes:
             iteration_shape += (xdata.data_shape[i],)
-            dimensional_calibrations.append(xdata.dimensional_calibrations[i])
+            dimensional_calibrations.append(xdata._shared_dimensional_calibrations[i])
         else:
-            intensity_calibration = Calibration.Calibration(scale=xdata.dimensional_calibrations[i].scale, units=xdata.dimensional_calibrations[i].units)
+            intensity_calibration = Calibration.Calibration(scale=xdata._shared_dimensional_calibrations[i].scale, units=xdata._shared_dimensional_calibrations[i].units)
 
     shape: typing.Tuple[int, ...]
     register_slice: typing.Union[slice, typing.Tuple[slice, slice]]
@@ -247,15 +259,6 @@ def function_measure_multi_dimensional_shifts(xdata: DataAndMetadata.DataAndMeta
     shifts = numpy.zeros(result_shape, dtype=numpy.float32)
     start_index = 0 if reference_index is not None else 1
     navigation_len = int(numpy.prod(iteration_shape, dtype=numpy.int64))
-    num_cpus = 8
-    try:
-        num_cpus = multiprocessing.cpu_count()
-    except NotImplementedError:
-        logging.warning('Could not determine the number of CPU cores. Defaulting to 8.')
-    finally:
-        # Use a little bit more than half the CPU cores, but not more than 20 because then we actually get a slowdown
-        # because of our HDF5 storage handler not being able to grant parallel access to the data
-        num_threads = min(int(round(num_cpus * 0.6)), 20)
 
     # Unfortunately multi-threading cannot be used when we cross-correlate with the first frame and max_shift
     # is not None because in order to create the mask for each frame we need the shift from the previous frame.
@@ -263,66 +266,55 @@ def function_measure_multi_dimensional_shifts(xdata: DataAndMetadata.DataAndMeta
     # do a single-threaded calculation in this case.
     # If the shifts reference is not the first or last frame in the sequence, we can actually use two threads, both
     # starting from reference_index and iterating away from it.
+    ranges: typing.List[range]
     if max_shift is not None and reference_index is not None:
-        if reference_index == 0 or reference_index == navigation_len - 1:
-            sections = [start_index, navigation_len]
+        if reference_index == 0:
+            ranges = [range(start_index, navigation_len)]
+        elif reference_index == navigation_len - 1:
+            # Reference index is the last frame, so go backwards from there
+            ranges = [range(navigation_len - 1, start_index - 1, -1)]
         else:
-            sections = [start_index, reference_index, navigation_len]
+            # If the reference index is somewhere inside the sequence, we can use two threads, one going from
+            # reference_index to 0 (backwards) and one gaing from reference_index to the end.
+            ranges = [range(reference_index, start_index - 1, -1), range(reference_index, navigation_len)]
     else:
-        sections = list(range(start_index, navigation_len, max(1, navigation_len//num_threads)))
-        sections.append(navigation_len)
-    barrier = threading.Barrier(len(sections))
+        ranges = Parallel.split_range(start_index, navigation_len)
 
     def run_on_thread(range_: range) -> None:
-        if _has_mkl:
-            mkl.set_num_threads_local(1)
         local_mask = mask
         local_reference_data = typing.cast(_ImageDataType, reference_data)
-        try:
-            for i in range_:
-                coords = numpy.unravel_index(i, iteration_shape)
-                data_coords = coords[:shift_axes[0]] + (...,) + coords[shift_axes[0]:]
-                if reference_index is None:
-                    coords_ref = numpy.unravel_index(i - range_.step, iteration_shape)
-                    data_coords_ref = coords_ref[:shift_axes[0]] + (...,) + coords_ref[shift_axes[0]:]
-                    local_reference_data = xdata.data[data_coords_ref]
-                elif max_shift is not None and i != range_.start:
-                    last_coords = numpy.unravel_index(i - range_.step, iteration_shape)
-                    last_shift = shifts[last_coords]
-                    data_shape = local_reference_data[register_slice].shape
-                    # Use a local copy of origin here to avoid threading issues.
-                    local_origin = origin
-                    if local_origin is None:
-                        local_origin = tuple([0] * len(data_shape))
-                    if len(data_shape) == 2:
-                        local_mask = _make_mask(max_shift, (local_origin[0] + round(last_shift[0]), local_origin[1] + round(last_shift[1])), data_shape)
-                    else:
-                        local_mask = _make_mask(max_shift, (local_origin[0] + round(last_shift[0]),), data_shape)
+        # the reference does not change, so its spectrum can be reused for all frames. matchers are not thread-safe,
+        # so each range gets its own.
+        matcher = TemplateMatching.ImageMatcher(local_reference_data[register_slice], local_reference_data[register_slice].shape) if reference_index is not None else None
+        for i in range_:
+            Parallel.check_cancelled()
+            coords = numpy.unravel_index(i, iteration_shape)
+            data_coords = coords[:shift_axes[0]] + (...,) + coords[shift_axes[0]:]
+            if reference_index is None:
+                coords_ref = numpy.unravel_index(i - range_.step, iteration_shape)
+                data_coords_ref = coords_ref[:shift_axes[0]] + (...,) + coords_ref[shift_axes[0]:]
+                local_reference_data = xdata.data[data_coords_ref]
+            elif max_shift is not None and i != range_.start:
+                last_coords = numpy.unravel_index(i - range_.step, iteration_shape)
+                last_shift = shifts[last_coords]
+                data_shape = local_reference_data[register_slice].shape
+                # Use a local copy of origin here to avoid threading issues.
+                local_origin = origin
+                if local_origin is None:
+                    local_origin = tuple([0] * len(data_shape))
+                if len(data_shape) == 2:
+                    local_mask = _make_mask(max_shift, (local_origin[0] + round(last_shift[0]), local_origin[1] + round(last_shift[1])), data_shape)
+                else:
+                    local_mask = _make_mask(max_shift, (local_origin[0] + round(last_shift[0]),), data_shape)
+            if matcher:
+                shifts[coords] = matcher.register(xdata.data[data_coords][register_slice], ccorr_mask=local_mask)[1]
+            else:
                 shifts[coords] = Core.function_register_template(local_reference_data[register_slice], xdata.data[data_coords][register_slice], ccorr_mask=local_mask)[1]
-        finally:
-            barrier.wait()
 
-    if max_shift is not None and reference_index is not None:
-        # Set up the threads for the case with max_shift and reference index: As explained above, we need a special
-        # setup because the result relies on the previous shift.
-        if len(sections) == 2:
-            if reference_index == 0:
-                threading.Thread(target=run_on_thread, args=(range(sections[0], sections[1]),)).start()
-            # Reference index is the last frame, so go backwards from there
-            else:
-                threading.Thread(target=run_on_thread, args=(range(sections[1] - 1, sections[0] - 1, -1),)).start()
-        else:
-            # If the reference index is somewhere inside the sequence, we can use two threads, one going from
-            # reference_index to 0 (backwards) and one gaing from reference_index to the end.
-            threading.Thread(target=run_on_thread, args=(range(sections[1], sections[0] - 1, -1),)).start()
-            threading.Thread(target=run_on_thread, args=(range(sections[1], sections[2]),)).start()
-    else:
-        for i in range(len(sections) - 1):
-            threading.Thread(target=run_on_thread, args=(range(sections[i], sections[i+1]),)).start()
-    barrier.wait()
+    Parallel.run(run_on_thread, ranges, cancel_event=cancel_event)
 
-    # For debugging it is helpful to run a non-threaded version of the code. Comment out the 3 lines above and uncomment
-    # the line below to do so. You also need to comment out "barrier.wait()" in the function running on the thread.
+    # For debugging it is helpful to run a non-threaded version of the code. Comment out the line above and uncomment
+    # the line below to do so.
     # run_on_thread(range(start_index, navigation_len))
 
     shifts = numpy.squeeze(shifts)
@@ -337,10 +329,84 @@ def function_measure_multi_dimensional_shifts(xdata: DataAndMetadata.DataAndMeta
                                                  dimensional_calibrations=dimensional_calibrations)
 
 
+def _apply_shifts_to_range(source: _ImageDataType, result: _ImageDataType, shifts: _ImageDataType, shift_axes: typing.Tuple[int, ...],
+                           iteration_shape: typing.Tuple[int, ...], squeezed_iteration_shape: typing.Tuple[int, ...],
+                           shifts_end_axis: int, iteration_shape_offset: int, range_: range) -> None:
+    shifts_array = numpy.zeros(len(shift_axes) + (len(iteration_shape) - len(squeezed_iteration_shape)))
+    if shifts_end_axis < len(shifts.shape):
+        for i in range_:
+            Parallel.check_cancelled()
+            coords = numpy.unravel_index(i, squeezed_iteration_shape)
+            shift_coords = coords[:shifts_end_axis]
+            for j, ind in enumerate(shift_axes):
+                shifts_array[ind - len(squeezed_iteration_shape)] = shifts[shift_coords][j]
+            # if i % max((range_.stop - range_.start) // 4, 1) == 0:
+            #     print(f'Working on slice {coords}: shifting by {shifts_array}')
+            result[coords] = scipy.ndimage.shift(source[coords], shifts_array, order=1)
+    # Note: Once we have multi-dimensional sequences, we need and implementation for iteration_shape_offset != 0
+    # and shifts for more than 1-D data (so similar to the loop above but with offset)
+    elif iteration_shape_offset != 0:
+        offset_slices = tuple([slice(None) for _ in range(iteration_shape_offset)])
+        for i in range_:
+            Parallel.check_cancelled()
+            shift_coords = numpy.unravel_index(i, squeezed_iteration_shape)
+            # need a different name here to make typing happy
+            coords2 = offset_slices + shift_coords
+            shifts_array[0] = shifts[shift_coords]
+            result[coords2] = scipy.ndimage.shift(source[coords2], shifts_array, order=1)
+    else:
+        for i in range_:
+            Parallel.check_cancelled()
+            coords = numpy.unravel_index(i, squeezed_iteration_shape)
+            shifts_array[0] = shifts[coords]
+            result[coords] = scipy.ndimage.shift(source[coords], shifts_array, order=1)
+
+
+def _apply_shifts_to_range_in_shared_memory(source_name: str, result_name: str, shape: typing.Tuple[int, ...], dtype: str,
+                                            shifts: _ImageDataType, shift_axes: typing.Tuple[int, ...],
+                                            iteration_shape: typing.Tuple[int, ...], squeezed_iteration_shape: typing.Tuple[int, ...],
+                                            shifts_end_axis: int, iteration_shape_offset: int, range_: range) -> None:
+    # runs in a worker process. attaches to the shared memory blocks created by the calling process.
+    source_memory = multiprocessing.shared_memory.SharedMemory(name=source_name)
+    try:
+        result_memory = multiprocessing.shared_memory.SharedMemory(name=result_name)
+        try:
+            source: _ImageDataType = numpy.ndarray(shape, dtype=dtype, buffer=source_memory.buf)
+            result: _ImageDataType = numpy.ndarray(shape, dtype=dtype, buffer=result_memory.buf)
+            _apply_shifts_to_range(source, result, shifts, shift_axes, iteration_shape, squeezed_iteration_shape, shifts_end_axis, iteration_shape_offset, range_)
+            del source, result
+        finally:
+            result_memory.close()
+    finally:
+        source_memory.close()
+
+
+def _copy_in_blocks(source: _ImageDataType, destination: _ImageDataType) -> None:
+    # copy along the first axis in blocks so that h5py sources are read in pieces instead of all at once.
+    if destination.ndim == 0 or destination.nbytes == 0:
+        destination[...] = source
+        return
+    block_length = max(1, _SHARED_MEMORY_COPY_BLOCK_SIZE * destination.shape[0] // destination.nbytes)
+    for i in range(0, destination.shape[0], block_length):
+        destination[i:i + block_length] = source[i:i + block_length]
+
+
 def function_apply_multi_dimensional_shifts(xdata: DataAndMetadata.DataAndMetadata,
                                             shifts: _ImageDataType,
                                             shift_axes: typing.Tuple[int, ...],
-                                            out: typing.Optional[DataAndMetadata.DataAndMetadata] = None) -> typing.Optional[DataAndMetadata.DataAndMetadata]:
+                                            out: typing.Optional[DataAndMetadata.DataAndMetadata] = None,
+                                            *,
+                                            cancel_event: typing.Optional[threading.Event] = None,
+                                            use_processes: bool = False) -> typing.Optional[DataAndMetadata.DataAndMetadata]:
+    """Apply shifts along shift_axes, using the shared worker pool (see Parallel).
+
+    Returns None if out is passed. Setting "cancel_event" stops processing and raises concurrent.futures.CancelledError.
+
+    If "use_processes" is True, the shifts are applied in the shared process pool instead of the thread pool. The input
+    and output are placed in shared memory and each process shifts a contiguous block of navigation indices, writing
+    directly into the shared output. This avoids contention on the GIL when shifting many small slices but costs a copy
+    of the input and the output. In this mode cancelling skips blocks which have not started.
+    """
 
     # Find the axes that we do not want to shift (== iteration shape)
     iteration_shape: typing.Tuple[int, ...] = tuple()
@@ -382,51 +448,46 @@ def function_apply_multi_dimensional_shifts(xdata: DataAndMetadata.DataAndMetada
         result = out.data
 
     navigation_len = int(numpy.prod(squeezed_iteration_shape, dtype=numpy.int64))
-    sections = list(range(0, navigation_len, max(1, navigation_len//8)))
-    sections.append(navigation_len)
-    barrier = threading.Barrier(len(sections))
+    ranges = Parallel.split_range(0, navigation_len)
 
-    def run_on_thread(range_: range) -> None:
+    if use_processes:
+        data_shape = tuple(xdata.data_shape)
+        data_dtype = numpy.dtype(xdata.data_dtype)
+        nbytes = max(1, int(numpy.prod(data_shape, dtype=numpy.int64)) * data_dtype.itemsize)
+        source_memory = multiprocessing.shared_memory.SharedMemory(create=True, size=nbytes)
         try:
-            shifts_array = numpy.zeros(len(shift_axes) + (len(iteration_shape) - len(squeezed_iteration_shape)))
-            if shifts_end_axis < len(shifts.shape):
-                for i in range_:
-                    coords = numpy.unravel_index(i, squeezed_iteration_shape)
-                    shift_coords = coords[:shifts_end_axis]
-                    for j, ind in enumerate(shift_axes):
-                        shifts_array[ind - len(squeezed_iteration_shape)] = shifts[shift_coords][j]
-                    # if i % max((range_.stop - range_.start) // 4, 1) == 0:
-                    #     print(f'Working on slice {coords}: shifting by {shifts_array}')
-                    result[coords] = scipy.ndimage.shift(xdata.data[coords], shifts_array, order=1)
-            # Note: Once we have multi-dimensional sequences, we need and implementation for iteration_shape_offset != 0
-            # and shifts for more than 1-D data (so similar to the loop above but with offset)
-            elif iteration_shape_offset != 0:
-                offset_slices = tuple([slice(None) for _ in range(iteration_shape_offset)])
-                for i in range_:
-                    shift_coords = numpy.unravel_index(i, squeezed_iteration_shape)
-                    # need a different name here to make typing happy
-                    coords2 = offset_slices + shift_coords
-                    shifts_array[0] = shifts[shift_coords]
-                    result[coords2] = scipy.ndimage.shift(xdata.data[coords2], shifts_array, order=1)
-            else:
-                for i in range_:
-                    coords = numpy.unravel_index(i, squeezed_iteration_shape)
-                    shifts_array[0] = shifts[coords]
-                    result[coords] = scipy.ndimage.shift(xdata.data[coords], shifts_array, order=1)
+            result_memory = multiprocessing.shared_memory.SharedMemory(create=True, size=nbytes)
+            try:
+                shared_source: _ImageDataType = numpy.ndarray(data_shape, dtype=data_dtype, buffer=source_memory.buf)
+                shared_result: _ImageDataType = numpy.ndarray(data_shape, dtype=data_dtype, buffer=result_memory.buf)
+                _copy_in_blocks(xdata.data, shared_source)
+                fn = functools.partial(_apply_shifts_to_range_in_shared_memory, source_memory.name, result_memory.name,
+                                       data_shape, data_dtype.str, numpy.asarray(shifts), shift_axes, iteration_shape,
+                                       squeezed_iteration_shape, shifts_end_axis, iteration_shape_offset)
+                Parallel.run_in_processes(fn, ranges, cancel_event=cancel_event)
+                _copy_in_blocks(shared_result, result)
+                del shared_source, shared_result
+            finally:
+                result_memory.close()
+                result_memory.unlink()
         finally:
-            barrier.wait()
+            source_memory.close()
+            source_memory.unlink()
+    else:
+        source = xdata.data
+
+        def run_on_thread(range_: range) -> None:
+            _apply_shifts_to_range(source, result, shifts, shift_axes, iteration_shape, squeezed_iteration_shape, shifts_end_axis, iteration_shape_offset, range_)
 
-    for i in range(len(sections) - 1):
-        threading.Thread(target=run_on_thread, args=(range(sections[i], sections[i+1]),)).start()
-    barrier.wait()
-    # For debugging it is helpful to run a non-threaded version of the code. Comment out the 3 lines above and uncomment
-    # the line below to do so. You also need to comment out "barrier.wait()" in the function running on the thread.
-    # run_on_thread(range(0, navigation_len))
+        Parallel.run(run_on_thread, ranges, cancel_event=cancel_event)
+        # For debugging it is helpful to run a non-threaded version of the code. Comment out the line above and uncomment
+        # the line below to do so.
+        # run_on_thread(range(0, navigation_len))
 
     if out is None:
         return DataAndMetadata.new_data_and_metadata(data=result,
-                                                     intensity_calibration=xdata.intensity_calibration,
-                                                     dimensional_calibrations=xdata.dimensional_calibrations,
+                                                     intensity_calibration=xdata._shared_intensity_calibration,
+                                                     dimensional_calibrations=xdata._shared_dimensional_calibrations,
                                                      metadata=xdata.metadata,
                                                      data_descriptor=xdata.data_descriptor)
     return None
@@ -477,7 +538,7 @@ def function_make_tableau_image(xdata: DataAndMetadata.DataAndMetadata,
     dimensional_calibrations = list(copy.deepcopy(xdata.dimensional_calibrations))
     [dimensional_calibrations.pop(iteration_start_index) for _ in range(len(iteration_shape))]
     return DataAndMetadata.new_data_and_metadata(data=result,
-                                                 intensity_calibration=xdata.intensity_calibration,
+                                                 intensity_calibration=xdata._shared_intensity_calibration,
                                                  dimensional_calibrations=dimensional_calibrations,
                                                  metadata=xdata.metadata,
                                                  data_descriptor=data_descriptor)
@@ -0,0 +1,210 @@
+"""Shared worker pool for parallel data processing.
+
+Functions which process data in parallel submit their work to a single process-wide thread pool instead of creating
+threads on each call. Use configure to set the number of workers, the number of MKL threads available to each worker,
+and the number of items in each task.
+
+Work which spends most of its time holding the GIL can instead be submitted to a process-wide process pool with
+run_in_processes. The process pool uses the same number of workers as the thread pool and is started on first use.
+"""
+
+# standard libraries
+import concurrent.futures
+import logging
+import multiprocessing
+import threading
+import typing
+
+# third party libraries
+try:
+    import mkl
+except ModuleNotFoundError:
+    _has_mkl = False
+else:
+    _has_mkl = True
+
+
+_T = typing.TypeVar("_T")
+
+
+def _get_default_max_workers() -> int:
+    num_cpus = 8
+    try:
+        num_cpus = multiprocessing.cpu_count()
+    except NotImplementedError:
+        logging.warning('Could not determine the number of CPU cores. Defaulting to 8.')
+    # Use a little bit more than half the CPU cores, but not more than 20 because then we actually get a slowdown
+    # because of our HDF5 storage handler not being able to grant parallel access to the data
+    return max(1, min(int(round(num_cpus * 0.6)), 20))
+
+
+_lock = threading.RLock()
+_max_workers = _get_default_max_workers()
+_mkl_threads_per_worker = 1
+_chunk_size: typing.Optional[int] = None
+_executor: typing.Optional[concurrent.futures.ThreadPoolExecutor] = None
+_process_executor: typing.Optional[concurrent.futures.ProcessPoolExecutor] = None
+_worker_local = threading.local()
+
+
+def configure(*, max_workers: typing.Optional[int] = None, mkl_threads_per_worker: typing.Optional[int] = None, chunk_size: typing.Optional[int] = None) -> None:
+    """Configure the shared worker pool. Settings which are not passed are reset to their defaults.
+
+    max_workers is the number of worker threads. The default is a little more than half the number of CPU cores.
+
+    mkl_threads_per_worker is the number of threads MKL may use within each worker, if MKL is installed. The default is 1.
+
+    chunk_size is the number of items in each task when splitting a range of items with split_range. The default is to
+    split the items evenly between the workers.
+
+    Work already running on the pool is allowed to finish before the new settings take effect.
+    """
+    global _max_workers, _mkl_threads_per_worker, _chunk_size, _executor, _process_executor
+    if max_workers is not None and max_workers < 1:
+        raise ValueError("Parallel: max_workers must be at least 1")
+    if chunk_size is not None and chunk_size < 1:
+        raise ValueError("Parallel: chunk_size must be at least 1")
+    with _lock:
+        executor = _executor
+        process_executor = _process_executor
+        _executor = None
+        _process_executor = None
+        _max_workers = max_workers if max_workers is not None else _get_default_max_workers()
+        _mkl_threads_per_worker = mkl_threads_per_worker if mkl_threads_per_worker is not None else 1
+        _chunk_size = chunk_size
+    if executor:
+        executor.shutdown(wait=True)
+    if process_executor:
+        process_executor.shutdown(wait=True)
+
+
+def get_max_workers() -> int:
+    """Return the number of workers in the shared worker pool."""
+    return _max_workers
+
+
+def get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Return the shared worker pool, creating it if required."""
+    global _executor
+    with _lock:
+        if not _executor:
+            _executor = concurrent.futures.ThreadPoolExecutor(max_workers=_max_workers,
+                                                              thread_name_prefix="niondata",
+                                                              initializer=_initialize_worker,
+                                                              initargs=(_mkl_threads_per_worker,))
+        return _executor
+
+
+def get_process_executor() -> concurrent.futures.ProcessPoolExecutor:
+    """Return the shared process pool, creating it if required.
+
+    The processes are started with the spawn method, so functions submitted to the pool must be importable at module
+    level and their arguments must be picklable.
+    """
+    global _process_executor
+    with _lock:
+        if not _process_executor:
+            _process_executor = concurrent.futures.ProcessPoolExecutor(max_workers=_max_workers,
+                                                                       mp_context=multiprocessing.get_context("spawn"),
+                                                                       initializer=_initialize_worker,
+                                                                       initargs=(_mkl_threads_per_worker,))
+        return _process_executor
+
+
+def _initialize_worker(mkl_threads_per_worker: int) -> None:
+    _worker_local.is_worker = True
+    if _has_mkl:
+        mkl.set_num_threads_local(mkl_threads_per_worker)
+
+
+def split_range(start: int, stop: int) -> typing.List[range]:
+    """Split range(start, stop) into consecutive ranges, each to be processed as one task."""
+    count = stop - start
+    chunk_size = _chunk_size or max(1, count // _max_workers)
+    return [range(i, min(i + chunk_size, stop)) for i in range(start, stop, chunk_size)]
+
+
+def check_cancelled() -> None:
+    """Raise concurrent.futures.CancelledError if the work running on this thread has been cancelled.
+
+    Functions passed to run which loop over many items should call this periodically.
+    """
+    for event in getattr(_worker_local, "events", tuple()):
+        if event.is_set():
+            raise concurrent.futures.CancelledError()
+
+
+def run(fn: typing.Callable[[_T], None], items: typing.Sequence[_T], *, cancel_event: typing.Optional[threading.Event] = None) -> None:
+    """Call fn with each item using the shared worker pool and wait until all calls are finished.
+
+    If a call raises an exception, calls which have not started are skipped, running calls are cancelled (see
+    check_cancelled), and the exception is re-raised here once they have finished. Setting cancel_event cancels the
+    work in the same way and raises concurrent.futures.CancelledError.
+
+    When called from a worker thread, the items are processed on the calling thread so that a worker never waits on
+    the pool it is running on.
+    """
+    stop_event = threading.Event()
+    events: typing.Tuple[threading.Event, ...] = (stop_event,) + ((cancel_event,) if cancel_event else tuple()) + getattr(_worker_local, "events", tuple())
+
+    def run_item(item: _T) -> None:
+        previous_events: typing.Tuple[threading.Event, ...] = getattr(_worker_local, "events", tuple())
+        _worker_local.events = events
+        try:
+            check_cancelled()
+            fn(item)
+        finally:
+            _worker_local.events = previous_events
+
+    if getattr(_worker_local, "is_worker", False) or len(items) <= 1:
+        for item in items:
+            run_item(item)
+        return
+
+    executor = get_executor()
+    futures = [executor.submit(run_item, item) for item in items]
+    try:
+        concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_EXCEPTION)
+    finally:
+        stop_event.set()
+        for future in futures:
+            future.cancel()
+        concurrent.futures.wait(futures)
+    for future in futures:
+        if not future.cancelled():
+            exception = future.exception()
+            if exception and not isinstance(exception, concurrent.futures.CancelledError):
+                raise exception
+    if cancel_event and cancel_event.is_set():
+        raise concurrent.futures.CancelledError()
+
+
+def run_in_processes(fn: typing.Callable[[_T], None], items: typing.Sequence[_T], *, cancel_event: typing.Optional[threading.Event] = None) -> None:
+    """Call fn with each item using the shared process pool and wait until all calls are finished.
+
+    fn and the items must be picklable (see get_process_executor). Results must be returned through shared memory or
+    files. If a call raises an exception, calls which have not started are skipped and the exception is re-raised here
+    once the running calls have finished. Setting cancel_event skips calls which have not started and raises
+    concurrent.futures.CancelledError; calls which are running in a process are allowed to finish.
+    """
+    executor = get_process_executor()
+    futures = [executor.submit(fn, item) for item in items]
+    try:
+        not_done: typing.Set[concurrent.futures.Future[None]] = set(futures)
+        while not_done:
+            done, not_done = concurrent.futures.wait(not_done, timeout=0.1, return_when=concurrent.futures.FIRST_EXCEPTION)
+            if any(not future.cancelled() and future.exception() for future in done):
+                break
+            if cancel_event and cancel_event.is_set():
+                break
+    finally:
+        for future in futures:
+            future.cancel()
+        concurrent.futures.wait(futures)
+    for future in futures:
+        if not future.cancelled():
+            exception = future.exception()
+            if exception:
+                raise exception
+    if cancel_event and cancel_event.is_set():
+        raise concurrent.futures.CancelledError()
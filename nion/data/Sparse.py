@@ -0,0 +1,237 @@
+"""Sparse event storage for counting detector data.
+
+An EventArray stores data which is mostly zero, such as 4D STEM data recorded by a counting detector, as a list of
+events for each frame, where a frame is one datum at one navigation (sequence and collection) position. The events are
+stored in compressed sparse row (CSR) form: the events of frame i are at positions offsets[i] to offsets[i + 1] of the
+indexes array, which holds the flat index of each event within the datum. An optional values array holds the count of
+each event; if it is None, each event counts one.
+
+An EventArray has a shape and dtype and can be wrapped by DataAndMetadata like storage backed data. Sums, including the
+sums in function_sum, function_sum_region, and function_integrate_along_axis in Core and MultiDimensionalProcessing,
+are calculated from the events without making the data dense, so they take time proportional to the number of events.
+Indexing, which is used by function_pick, makes only the selected frames dense. Other functions make the whole data
+dense using __array__.
+"""
+
+# standard libraries
+import math
+import typing
+
+# third party libraries
+import numpy
+import numpy.typing
+
+
+_ImageDataType = numpy.typing.NDArray[typing.Any]
+ShapeType = typing.Tuple[int, ...]
+
+
+class EventArray:
+    """Sparse data stored as the events of each frame (see module documentation).
+
+    shape is the navigation shape followed by the datum shape, where the datum shape is the last datum_dimension_count
+    dimensions. offsets has one more element than the number of frames. indexes and values, if not None, have one
+    element for each event. The arrays are not copied and should not be modified.
+    """
+
+    def __init__(self, shape: ShapeType, datum_dimension_count: int, offsets: _ImageDataType, indexes: _ImageDataType,
+                 values: typing.Optional[_ImageDataType] = None, dtype: numpy.typing.DTypeLike = numpy.uint32) -> None:
+        shape = tuple(int(n) for n in shape)
+        if not (0 < datum_dimension_count <= len(shape)):
+            raise ValueError("EventArray: datum dimension count must be between one and the number of dimensions")
+        if any(n < 0 for n in shape):
+            raise ValueError("EventArray: shape must not be negative")
+        offsets = numpy.asarray(offsets)
+        indexes = numpy.asarray(indexes)
+        if not (numpy.issubdtype(offsets.dtype, numpy.integer) and numpy.issubdtype(indexes.dtype, numpy.integer)):
+            raise ValueError("EventArray: offsets and indexes must be integers")
+        frame_count = math.prod(shape[:len(shape) - datum_dimension_count])
+        datum_size = math.prod(shape[len(shape) - datum_dimension_count:])
+        if offsets.shape != (frame_count + 1,) or offsets[0] != 0 or offsets[-1] != len(indexes) or numpy.any(numpy.diff(offsets) < 0):
+            raise ValueError("EventArray: offsets must increase from zero to the number of events, with one more element than the number of frames")
+        if indexes.ndim != 1 or (len(indexes) and (indexes.min() < 0 or indexes.max() >= datum_size)):
+            raise ValueError("EventArray: indexes must be one dimensional and within the datum")
+        if values is not None:
+            values = numpy.asarray(values)
+            if values.shape != indexes.shape:
+                raise ValueError("EventArray: values must have one element for each event")
+        self.__shape = shape
+        self.__datum_dimension_count = datum_dimension_count
+        self.__dtype = numpy.dtype(dtype)
+        self.__offsets = offsets
+        self.__indexes = indexes
+        self.__values = values
+
+    @classmethod
+    def from_dense(cls, data: _ImageDataType, datum_dimension_count: int) -> "EventArray":
+        """Return an event array with the non-zero elements of data as events."""
+        data = numpy.asarray(data)
+        if not (0 < datum_dimension_count <= data.ndim):
+            raise ValueError("EventArray: datum dimension count must be between one and the number of dimensions")
+        datum_size = math.prod(data.shape[data.ndim - datum_dimension_count:])
+        frame_data = data.reshape(-1, datum_size)
+        frames, indexes = numpy.nonzero(frame_data)
+        offsets = numpy.zeros(frame_data.shape[0] + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(frames, minlength=frame_data.shape[0]), out=offsets[1:])
+        values: typing.Optional[_ImageDataType] = frame_data[frames, indexes]
+        if values is not None and numpy.all(values == 1):
+            values = None
+        index_dtype = numpy.uint32 if datum_size <= numpy.iinfo(numpy.uint32).max + 1 else numpy.int64
+        return cls(data.shape, datum_dimension_count, offsets, indexes.astype(index_dtype), values, data.dtype)
+
+    @property
+    def shape(self) -> ShapeType:
+        return self.__shape
+
+    @property
+    def dtype(self) -> numpy.dtype[typing.Any]:
+        return self.__dtype
+
+    @property
+    def ndim(self) -> int:
+        return len(self.__shape)
+
+    @property
+    def size(self) -> int:
+        return math.prod(self.__shape)
+
+    @property
+    def nbytes(self) -> int:
+        """Return the number of bytes used by the events, not the number of bytes of the dense data."""
+        return int(self.__offsets.nbytes + self.__indexes.nbytes + (self.__values.nbytes if self.__values is not None else 0))
+
+    @property
+    def datum_dimension_count(self) -> int:
+        return self.__datum_dimension_count
+
+    @property
+    def navigation_shape(self) -> ShapeType:
+        return self.__shape[:len(self.__shape) - self.__datum_dimension_count]
+
+    @property
+    def datum_shape(self) -> ShapeType:
+        return self.__shape[len(self.__shape) - self.__datum_dimension_count:]
+
+    @property
+    def event_count(self) -> int:
+        return len(self.__indexes)
+
+    @property
+    def offsets(self) -> _ImageDataType:
+        return self.__offsets
+
+    @property
+    def indexes(self) -> _ImageDataType:
+        return self.__indexes
+
+    @property
+    def values(self) -> typing.Optional[_ImageDataType]:
+        return self.__values
+
+    def __len__(self) -> int:
+        return self.__shape[0]
+
+    def __array__(self, dtype: typing.Optional[numpy.typing.DTypeLike] = None, *, copy: bool | None = None) -> _ImageDataType:
+        # the dense array is always a new array, so it cannot be returned without a copy.
+        if copy is False:
+            raise ValueError("EventArray: cannot be converted to an array without a copy")
+        data = self.to_dense()
+        return data.astype(dtype, copy=False) if dtype is not None else data
+
+    def to_dense(self) -> _ImageDataType:
+        """Return the data as a dense array."""
+        return self.__get_frames(numpy.arange(math.prod(self.navigation_shape))).reshape(self.__shape)
+
+    def __getitem__(self, key: typing.Any) -> _ImageDataType:
+        """Return the data selected by key, which may contain integers, slices, and an ellipsis, as a dense array.
+
+        Only the selected frames are made dense.
+        """
+        key = key if isinstance(key, tuple) else (key,)
+        ellipsis_indexes = [i for i, k in enumerate(key) if k is Ellipsis]
+        if len(ellipsis_indexes) > 1:
+            raise IndexError("EventArray: an index can only have a single ellipsis")
+        if ellipsis_indexes:
+            ellipsis_index = ellipsis_indexes[0]
+            key = key[:ellipsis_index] + (slice(None),) * (self.ndim - len(key) + 1) + key[ellipsis_index + 1:]
+        if len(key) > self.ndim:
+            raise IndexError("EventArray: too many indices")
+        key = key + (slice(None),) * (self.ndim - len(key))
+        navigation_dimension_count = self.ndim - self.__datum_dimension_count
+        frames = numpy.arange(math.prod(self.navigation_shape)).reshape(self.navigation_shape)[key[:navigation_dimension_count]]
+        frame_data = self.__get_frames(numpy.reshape(frames, -1)).reshape(numpy.shape(frames) + self.datum_shape)
+        return typing.cast(_ImageDataType, frame_data[(slice(None),) * numpy.ndim(frames) + key[navigation_dimension_count:]])
+
+    def sum(self, axis: int | typing.Sequence[int] | None = None, keepdims: bool = False,
+            where: typing.Optional[_ImageDataType] = None, weights: typing.Optional[_ImageDataType] = None) -> _ImageDataType:
+        """Return the sum over axis, calculated from the events.
+
+        where, if not None, is broadcast to the shape and only the elements where it is True are summed. weights, if not
+        None, is broadcast to the shape and each element is multiplied by its weight before it is summed. The result
+        has the dtype of numpy.sum, or of the product with the weights if weights is not None.
+        """
+        ndim = self.ndim
+        axes = set(range(ndim)) if axis is None else {a % ndim for a in numpy.atleast_1d(axis).tolist()}
+        kept_axes = [i for i in range(ndim) if i not in axes]
+        navigation_axes = list(range(ndim - self.__datum_dimension_count))
+        datum_axes = list(range(ndim - self.__datum_dimension_count, ndim))
+        result_shape = tuple(self.__shape[i] for i in kept_axes)
+        result_dtype = numpy.sum(numpy.zeros((1,), dtype=self.__dtype)).dtype
+        if weights is not None:
+            result_dtype = numpy.result_type(result_dtype, numpy.asarray(weights).dtype)
+
+        if kept_axes == navigation_axes and self.__values is None and where is None and weights is None:
+            # the sum of each frame is its number of events.
+            result = numpy.diff(self.__offsets).astype(result_dtype).reshape(result_shape)
+        else:
+            event_values = self.__values
+            coordinates: typing.Optional[typing.Tuple[_ImageDataType, ...]] = None
+            frame_ids: typing.Optional[_ImageDataType] = None
+            indexes = self.__indexes
+            if where is not None or weights is not None or kept_axes not in (navigation_axes, datum_axes):
+                frame_ids = self.__get_frame_ids()
+                coordinates = numpy.unravel_index(frame_ids, self.navigation_shape) + numpy.unravel_index(indexes, self.datum_shape)
+            elif kept_axes == navigation_axes:
+                frame_ids = self.__get_frame_ids()
+            if where is not None:
+                assert coordinates is not None
+                selected = numpy.broadcast_to(numpy.asarray(where, dtype=bool), self.__shape)[coordinates]
+                coordinates = tuple(c[selected] for c in coordinates)
+                frame_ids = frame_ids[selected] if frame_ids is not None else None
+                indexes = indexes[selected]
+                event_values = event_values[selected] if event_values is not None else None
+            if weights is not None:
+                assert coordinates is not None
+                event_weights = numpy.broadcast_to(weights, self.__shape)[coordinates]
+                event_values = event_values * event_weights if event_values is not None else event_weights
+            if kept_axes == navigation_axes:
+                assert frame_ids is not None
+                bins = frame_ids
+            elif kept_axes == datum_axes:
+                bins = indexes
+            elif kept_axes:
+                assert coordinates is not None
+                bins = numpy.ravel_multi_index(tuple(coordinates[i] for i in kept_axes), result_shape)
+            else:
+                bins = numpy.zeros(len(indexes), dtype=numpy.intp)
+            result = numpy.bincount(bins, weights=event_values, minlength=math.prod(result_shape)).astype(result_dtype, copy=False).reshape(result_shape)
+
+        if keepdims:
+            result = result.reshape(tuple(1 if i in axes else n for i, n in enumerate(self.__shape)))
+        return typing.cast(_ImageDataType, result)
+
+    def __get_frame_ids(self) -> _ImageDataType:
+        # return the index of the frame of each event.
+        return numpy.repeat(numpy.arange(len(self.__offsets) - 1), numpy.diff(self.__offsets))
+
+    def __get_frames(self, frames: _ImageDataType) -> _ImageDataType:
+        # return the frames as a dense array with one flattened datum per row.
+        datum_size = math.prod(self.datum_shape)
+        starts = self.__offsets[frames]
+        lengths = self.__offsets[frames + 1] - starts
+        # the positions of the events of each frame, one range of positions after the other.
+        positions = numpy.repeat(starts - (numpy.cumsum(lengths) - lengths), lengths) + numpy.arange(numpy.sum(lengths))
+        bins = numpy.repeat(numpy.arange(len(frames)) * datum_size, lengths) + self.__indexes[positions]
+        event_values = self.__values[positions] if self.__values is not None else None
+        frame_data = numpy.bincount(bins, weights=event_values, minlength=len(frames) * datum_size)
+        return frame_data.astype(self.__dtype, copy=False).reshape(len(frames), datum_size)
@@ -0,0 +1,212 @@
+"""Statistics of data calculated in blocks using the shared worker pool (see Parallel).
+
+calculate_statistics calculates the minimum, maximum, sum, mean, NaN count, and optionally a histogram of the data.
+Each block of the data is read once to calculate the minimum, maximum, sum, and NaN count, and the histogram is then
+calculated for each block using the range of the whole data. If the histogram range is passed, the histogram is
+calculated in the same pass as the other statistics. calculate_histogram calculates only the histogram, reading each
+block for its minimum and maximum only, which is faster when the other statistics are not needed.
+
+Functions which need these statistics, such as function_histogram, auto_threshold, and function_rescale in Core, take
+the statistics as an optional argument so that one calculation can be shared between them.
+"""
+
+# standard libraries
+import dataclasses
+import math
+import typing
+
+# third party libraries
+import numpy
+import numpy.typing
+
+# local libraries
+from nion.data import Parallel
+
+
+_ImageDataType = numpy.typing.NDArray[typing.Any]
+
+# the size in bytes of the blocks of data reduced together. the block and the temporary arrays for it should stay in
+# the processor cache.
+_STATISTICS_BLOCK_SIZE = 1024 * 1024
+
+
+@dataclasses.dataclass(frozen=True, eq=False)
+class DataStatistics:
+    """Statistics of data. NaN values are counted in nan_count and ignored in the other statistics.
+
+    min, max, and mean are NaN if the data has no values other than NaN. histogram and bin_edges are None if no
+    histogram was requested or if the range of the data is not finite.
+    """
+    count: int
+    nan_count: int
+    min: float
+    max: float
+    sum: float
+    mean: float
+    histogram: typing.Optional[numpy.typing.NDArray[numpy.int64]] = None
+    bin_edges: typing.Optional[numpy.typing.NDArray[typing.Any]] = None
+
+    @property
+    def bins(self) -> int:
+        return len(self.histogram) if self.histogram is not None else 0
+
+
+@dataclasses.dataclass
+class _BlockStatistics:
+    nan_count: int = 0
+    min: typing.Any = None
+    max: typing.Any = None
+    sum: float = 0.0
+    histogram: typing.Optional[numpy.typing.NDArray[numpy.int64]] = None
+
+
+def _get_blocks(data: _ImageDataType) -> typing.List[_ImageDataType]:
+    # split the data into blocks of about _STATISTICS_BLOCK_SIZE bytes without copying it.
+    if data.ndim == 0 or data.flags.c_contiguous:
+        data = data.reshape(-1)
+    if data.ndim == 0 or len(data) == 0:
+        return [data]
+    row_nbytes = max(1, data.nbytes // len(data))
+    rows_per_block = max(1, _STATISTICS_BLOCK_SIZE // row_nbytes)
+    return [data[i:i + rows_per_block] for i in range(0, len(data), rows_per_block)]
+
+
+def _get_histogram_range(minimum: typing.Any, maximum: typing.Any) -> typing.Optional[typing.Tuple[typing.Any, typing.Any]]:
+    # the range used by numpy.histogram when the range is not passed.
+    if minimum is None or not (numpy.isfinite(minimum) and numpy.isfinite(maximum)):
+        return None
+    if minimum == maximum:
+        return minimum - 0.5, maximum + 0.5
+    return minimum, maximum
+
+
+def _calculate_histogram(blocks: typing.Sequence[_ImageDataType], bins: int, histogram_range: typing.Tuple[typing.Any, typing.Any]) -> numpy.typing.NDArray[numpy.int64]:
+    block_histograms: typing.List[typing.Optional[numpy.typing.NDArray[numpy.int64]]] = [None] * len(blocks)
+
+    def calculate_block_histograms(block_range: range) -> None:
+        for block_index in block_range:
+            block_histograms[block_index] = numpy.histogram(blocks[block_index], bins=bins, range=histogram_range)[0]
+            Parallel.check_cancelled()
+
+    Parallel.run(calculate_block_histograms, Parallel.split_range(0, len(blocks)))
+    histogram = numpy.zeros(bins, dtype=numpy.int64)
+    for block_histogram in block_histograms:
+        assert block_histogram is not None
+        histogram += block_histogram
+    return histogram
+
+
+def _get_bin_edges(data: _ImageDataType, bins: int, histogram_range: typing.Tuple[typing.Any, typing.Any]) -> numpy.typing.NDArray[typing.Any]:
+    # calculate the edges in the same way as numpy.histogram.
+    return numpy.histogram(data.reshape(-1)[:0], bins=bins, range=histogram_range)[1]
+
+
+def _check_real_data(data: _ImageDataType, bins: int) -> None:
+    if numpy.iscomplexobj(data) or not numpy.can_cast(data.dtype, numpy.double):
+        raise ValueError("Statistics: data must be real")
+    if bins < 0:
+        raise ValueError("Statistics: bins must not be negative")
+
+
+def calculate_statistics(data: _ImageDataType, *, bins: int = 0,
+                         histogram_range: typing.Optional[typing.Tuple[float, float]] = None) -> DataStatistics:
+    """Calculate the statistics of real data, including a histogram with the given number of bins if bins > 0.
+
+    If histogram_range is None, the histogram spans the minimum to the maximum of the data and the counts match those
+    of numpy.histogram(data, bins) for data without NaN values.
+    """
+    data = numpy.asarray(data)
+    _check_real_data(data, bins)
+    blocks = _get_blocks(data)
+    block_statistics = [_BlockStatistics() for _ in blocks]
+    is_float = numpy.issubdtype(data.dtype, numpy.floating)
+
+    def calculate_block_statistics(block_range: range) -> None:
+        for block_index in block_range:
+            block = blocks[block_index]
+            statistics = block_statistics[block_index]
+            if block.size:
+                block_sum = numpy.sum(block, dtype=numpy.float64)
+                # only count the NaN values if the sum shows there may be some.
+                if is_float and numpy.isnan(block_sum):
+                    statistics.nan_count = int(numpy.count_nonzero(numpy.isnan(block)))
+                    block_sum = numpy.nansum(block, dtype=numpy.float64)
+                if statistics.nan_count < block.size:
+                    # fmin and fmax ignore NaN values.
+                    statistics.min = numpy.fmin.reduce(block, axis=None)
+                    statistics.max = numpy.fmax.reduce(block, axis=None)
+                    statistics.sum = float(block_sum)
+            if bins and histogram_range is not None:
+                statistics.histogram = numpy.histogram(block, bins=bins, range=histogram_range)[0]
+            Parallel.check_cancelled()
+
+    Parallel.run(calculate_block_statistics, Parallel.split_range(0, len(blocks)))
+
+    nan_count = sum(statistics.nan_count for statistics in block_statistics)
+    block_mins = [statistics.min for statistics in block_statistics if statistics.min is not None]
+    block_maxs = [statistics.max for statistics in block_statistics if statistics.max is not None]
+    minimum = numpy.fmin.reduce(block_mins) if block_mins else None
+    maximum = numpy.fmax.reduce(block_maxs) if block_maxs else None
+    total = math.fsum(statistics.sum for statistics in block_statistics)
+    count = int(data.size) - nan_count
+
+    histogram: typing.Optional[numpy.typing.NDArray[numpy.int64]] = None
+    bin_edges: typing.Optional[numpy.typing.NDArray[typing.Any]] = None
+    if bins:
+        used_histogram_range = histogram_range if histogram_range is not None else _get_histogram_range(minimum, maximum)
+        if used_histogram_range is not None:
+            if histogram_range is None:
+                histogram = _calculate_histogram(blocks, bins, used_histogram_range)
+            else:
+                histogram = numpy.zeros(bins, dtype=numpy.int64)
+                for statistics in block_statistics:
+                    assert statistics.histogram is not None
+                    histogram += statistics.histogram
+            bin_edges = _get_bin_edges(data, bins, used_histogram_range)
+
+    return DataStatistics(count=count,
+                          nan_count=nan_count,
+                          min=float(minimum) if minimum is not None else math.nan,
+                          max=float(maximum) if maximum is not None else math.nan,
+                          sum=total,
+                          mean=total / count if count else math.nan,
+                          histogram=histogram,
+                          bin_edges=bin_edges)
+
+
+def calculate_histogram(data: _ImageDataType, bins: int) -> typing.Tuple[typing.Optional[numpy.typing.NDArray[numpy.int64]], typing.Optional[numpy.typing.NDArray[typing.Any]]]:
+    """Calculate the histogram and bin edges of real data over its range, ignoring NaN values.
+
+    The result is the same as the histogram and bin edges of calculate_statistics, including None for both if the
+    range of the data is not finite, but only the minimum and maximum are calculated in the first pass.
+    """
+    data = numpy.asarray(data)
+    _check_real_data(data, bins)
+    blocks = _get_blocks(data)
+    block_mins: typing.List[typing.Any] = [None] * len(blocks)
+    block_maxs: typing.List[typing.Any] = [None] * len(blocks)
+    is_float = numpy.issubdtype(data.dtype, numpy.floating)
+
+    def calculate_block_ranges(block_range: range) -> None:
+        for block_index in block_range:
+            block = blocks[block_index]
+            if block.size:
+                block_min = numpy.min(block)
+                block_max = numpy.max(block)
+                # min and max propagate NaN values. fmin and fmax ignore them, but are slower, so only use them if needed.
+                if is_float and numpy.isnan(block_min):
+                    block_min = numpy.fmin.reduce(block, axis=None)
+                    block_max = numpy.fmax.reduce(block, axis=None)
+                if not numpy.isnan(block_min):
+                    block_mins[block_index] = block_min
+                    block_maxs[block_index] = block_max
+            Parallel.check_cancelled()
+
+    Parallel.run(calculate_block_ranges, Parallel.split_range(0, len(blocks)))
+
+    used_block_mins = [block_min for block_min in block_mins if block_min is not None]
+    used_block_maxs = [block_max for block_max in block_maxs if block_max is not None]
+    histogram_range = _get_histogram_range(min(used_block_mins), max(used_block_maxs)) if used_block_mins else None
+    if not bins or histogram_range is None:
+        return None, None
+    return _calculate_histogram(blocks, bins, histogram_range), _get_bin_edges(data, bins, histogram_range)
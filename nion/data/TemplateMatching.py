@@ -1,13 +1,64 @@
+import math
 import numpy
+import numpy.typing
 import scipy.fft
 import scipy.ndimage
 import typing
 
 from nion.data import Image
+from nion.data import Parallel
 
 _ShapeType = Image.ShapeType
 _ImageDataType = Image._ImageDataType
 
+# the approximate number of bytes of work arrays used when matching stacks of images or templates.
+_BATCH_BLOCK_SIZE = 128 * 1024 * 1024
+
+
+def _uniform_filter_transfer(image_shape: _ShapeType, template_shape: _ShapeType, dtype: numpy.typing.DTypeLike) -> _ImageDataType:
+    # the transfer function of a uniform filter with the template shape for real fft spectra of the image shape.
+    spectrum_shape = tuple(image_shape[:-1]) + (image_shape[-1] // 2 + 1,)
+    return typing.cast(_ImageDataType, scipy.ndimage.fourier_uniform(numpy.ones(spectrum_shape), template_shape, n=image_shape[-1]).astype(dtype))
+
+
+def _image_terms(image: _ImageDataType, template_shape: _ShapeType, transfer: _ImageDataType, dtype: numpy.typing.DTypeLike) -> typing.Tuple[_ImageDataType, _ImageDataType]:
+    # returns the spectrum of the images and the variance of the images within a window of the template shape. the last
+    # two axes are the image axes, any leading axes are stacked images.
+    image_shape = image.shape[-2:]
+    image = numpy.asarray(image, dtype=dtype)
+    fft_image = scipy.fft.rfft2(image)
+    fft_image_squared = scipy.fft.rfft2(image ** 2)
+    fft_image_squared *= transfer
+    image_means_squared = scipy.fft.irfft2(fft_image * transfer, s=image_shape) ** 2
+    # use Var(X) = E(X^2) - E(X)^2 to calculate variance
+    image_variance = scipy.fft.irfft2(fft_image_squared, s=image_shape)
+    image_variance -= image_means_squared
+    return fft_image, image_variance
+
+
+def _template_terms(template: _ImageDataType, image_shape: _ShapeType, dtype: numpy.typing.DTypeLike) -> typing.Tuple[_ImageDataType, _ImageDataType]:
+    # returns the conjugated spectrum of the normalized templates and the sum of squares of the normalized templates.
+    # the last two axes are the template axes, any leading axes are stacked templates.
+    template = numpy.asarray(template, dtype=dtype)
+    normalized_template = template - numpy.mean(template, axis=(-2, -1), keepdims=True)
+    # inverting the axis of a real image is the same as taking the conjugate of the fourier transform
+    fft_normalized_template_conj = scipy.fft.rfft2(normalized_template[..., ::-1, ::-1], s=image_shape)
+    return fft_normalized_template_conj, numpy.sum(normalized_template ** 2, axis=(-2, -1), keepdims=True)
+
+
+def _normalized_corr(fft_image: _ImageDataType, image_variance: _ImageDataType, fft_normalized_template_conj: _ImageDataType,
+                     template_sum_squares: _ImageDataType, image_shape: _ShapeType, template_shape: _ShapeType,
+                     out: typing.Optional[_ImageDataType] = None) -> _ImageDataType:
+    # only normalizing the template is equivalent to normalizing both (see paper in normalized_corr for details)
+    fft_corr = numpy.multiply(fft_image, fft_normalized_template_conj, out=out)
+    # we need to shift the result back by half the template size
+    shift = (int(-1 * (template_shape[0] - 1) / 2), int(-1 * (template_shape[1] - 1) / 2))
+    corr = numpy.roll(scipy.fft.irfft2(fft_corr, s=image_shape), shift=shift, axis=(-2, -1))
+    denom = image_variance * math.prod(template_shape) * template_sum_squares
+    denom = numpy.where(denom < 0, numpy.amax(denom, axis=(-2, -1), keepdims=True), denom)
+    corr /= numpy.sqrt(denom)
+    return typing.cast(_ImageDataType, corr)
+
 
 def normalized_corr(image: _ImageDataType, template: _ImageDataType) -> _ImageDataType:
     """
@@ -18,26 +69,10 @@ def normalized_corr(image: _ImageDataType, template: _ImageDataType) -> _ImageDa
     http://scribblethink.org/Work/nvisionInterface/nip.pdf (which is an extended version of this paper:
     J. P. Lewis, "FastTemplateMatching", Vision Interface, p. 120-123, 1995)
     """
-    template = template.astype(numpy.float64)
-    image = image.astype(numpy.float64)
-    normalized_template = template - numpy.mean(template)
-    # inverting the axis of a real image is the same as taking the conjugate of the fourier transform
-    fft_normalized_template_conj = scipy.fft.fft2(normalized_template[::-1, ::-1], s=image.shape)
-    fft_image = scipy.fft.fft2(image)
-    fft_image_squared = scipy.fft.fft2(image ** 2)
-    fft_image_squared_means = scipy.ndimage.fourier_uniform(fft_image_squared, template.shape)
-    image_means_squared = (scipy.fft.ifft2(
-        scipy.ndimage.fourier_uniform(fft_image, template.shape)).real) ** 2
-    # only normalizing the template is equivalent to normalizing both (see paper in docstring for details)
-    fft_corr = fft_image * fft_normalized_template_conj
-    # we need to shift the result back by half the template size
-    shift = (int(-1 * (template.shape[0] - 1) / 2), int(-1 * (template.shape[1] - 1) / 2))
-    corr = numpy.roll(scipy.fft.ifft2(fft_corr).real, shift=shift, axis=(0, 1))
-    # use Var(X) = E(X^2) - E(X)^2 to calculate variance
-    image_variance = scipy.fft.ifft2(fft_image_squared_means).real - image_means_squared
-    denom = image_variance * template.size * numpy.sum(normalized_template ** 2)
-    denom[denom < 0] = numpy.amax(denom)
-    return typing.cast(_ImageDataType, corr / numpy.sqrt(denom))
+    transfer = _uniform_filter_transfer(image.shape, template.shape, numpy.float64)
+    fft_image, image_variance = _image_terms(image, template.shape, transfer, numpy.float64)
+    fft_normalized_template_conj, template_sum_squares = _template_terms(template, image.shape, numpy.float64)
+    return _normalized_corr(fft_image, image_variance, fft_normalized_template_conj, template_sum_squares, image.shape, template.shape)
 
 
 def parabola_through_three_points(p1: typing.Tuple[int, int], p2: typing.Tuple[int, int], p3: typing.Tuple[int, int]) -> typing.Tuple[float, float, float]:
@@ -89,7 +124,161 @@ def find_ccorr_max(ccorr: _ImageDataType) -> typing.Tuple[int, typing.Optional[f
     return 0, ccorr[max_pos], (parabola[1],)
 
 
+def find_ccorr_max_batch(ccorr: _ImageDataType) -> typing.Tuple[_ImageDataType, _ImageDataType, _ImageDataType]:
+    """
+    Finds the maxima of a stack of 1D or 2D cross-correlations, stacked along the first axis. This is the vectorized
+    equivalent of calling find_ccorr_max for each cross-correlation.
+    Returns a tuple of arrays (errors, values, positions) with the shapes (n,), (n,) and (n, ndim). If a maximum is on
+    the border, its error is 1 and its position is not refined.
+    """
+    if ccorr.ndim not in (2, 3):
+        raise ValueError("Find cross-correlation maximum: must be a stack of 1D or 2D data.")
+    count = ccorr.shape[0]
+    frame_shape = ccorr.shape[1:]
+    flat_ccorr = ccorr.reshape(count, -1)
+    indexes = numpy.arange(count)
+    max_index = numpy.argmax(flat_ccorr, axis=1)
+    values = flat_ccorr[indexes, max_index]
+    max_pos = numpy.stack(numpy.unravel_index(max_index, frame_shape), axis=-1)
+    errors = numpy.any((max_pos < 1) | (max_pos > numpy.array(frame_shape) - 2), axis=1).astype(numpy.int_)
+    positions = max_pos.astype(numpy.float64)
+    valid = errors == 0
+    valid_indexes = indexes[valid]
+    valid_pos = max_pos[valid]
+    y1 = values[valid].astype(numpy.float64)
+    for axis in range(len(frame_shape)):
+        # fit a parabola through the maximum and its two neighbors along the axis. the vertex is at
+        # pos + (y0 - y2) / (2 * (y0 - 2 * y1 + y2)), the same as parabola_through_three_points.
+        lower_pos = valid_pos.copy()
+        lower_pos[:, axis] -= 1
+        upper_pos = valid_pos.copy()
+        upper_pos[:, axis] += 1
+        y0 = ccorr[(valid_indexes,) + tuple(lower_pos.T)].astype(numpy.float64)
+        y2 = ccorr[(valid_indexes,) + tuple(upper_pos.T)].astype(numpy.float64)
+        denominator = 2 * (y0 - 2 * y1 + y2)
+        offset = numpy.divide(y0 - y2, denominator, out=numpy.zeros_like(y0), where=denominator != 0)
+        positions[valid, axis] += offset
+    return errors, values, positions
+
+
 def match_template(image: _ImageDataType, template: _ImageDataType) -> _ImageDataType:
     ccorr = normalized_corr(image, template)
     ccorr[ccorr > 1.1] = 0
     return ccorr
+
+
+def match_template_batch(image: _ImageDataType, template: _ImageDataType, datum_ndim: int) -> _ImageDataType:
+    """
+    Matches a stack of images against one template, one image against a stack of templates, or a stack of images
+    against a stack of templates of the same length. Stacks are along the first axis and their items have datum_ndim
+    (1 or 2) dimensions. Returns the stack of normalized cross-correlations, the same as calling match_template for each
+    item. The FFTs use the shared worker pool size (see Parallel) and large stacks are processed in blocks.
+    """
+    is_image_stack = image.ndim > datum_ndim
+    is_template_stack = template.ndim > datum_ndim
+    assert is_image_stack or is_template_stack
+    count = image.shape[0] if is_image_stack else template.shape[0]
+    assert not (is_image_stack and is_template_stack) or template.shape[0] == count
+    if datum_ndim == 1:
+        image = image[..., numpy.newaxis]
+        template = template[..., numpy.newaxis]
+    image_shape = image.shape[-2:]
+    template_shape = template.shape[-2:]
+    assert numpy.less_equal(template_shape, image_shape).all()
+    result = numpy.empty((count,) + image_shape, dtype=numpy.float64)
+    spectrum_size = image_shape[0] * (image_shape[1] // 2 + 1) * numpy.dtype(numpy.complex128).itemsize
+    block_length = max(1, _BATCH_BLOCK_SIZE // (4 * spectrum_size))
+    with scipy.fft.set_workers(Parallel.get_max_workers()):
+        transfer = _uniform_filter_transfer(image_shape, template_shape, numpy.float64)
+        if not is_image_stack:
+            fft_image, image_variance = _image_terms(image, template_shape, transfer, numpy.float64)
+        if not is_template_stack:
+            fft_template_conj, template_sum_squares = _template_terms(template, image_shape, numpy.float64)
+        for start in range(0, count, block_length):
+            block = slice(start, min(start + block_length, count))
+            if is_image_stack:
+                fft_image, image_variance = _image_terms(image[block], template_shape, transfer, numpy.float64)
+            if is_template_stack:
+                fft_template_conj, template_sum_squares = _template_terms(template[block], image_shape, numpy.float64)
+            result[block] = _normalized_corr(fft_image, image_variance, fft_template_conj, template_sum_squares, image_shape, template_shape)
+    result[result > 1.1] = 0
+    return result[..., 0] if datum_ndim == 1 else result
+
+
+def _register(ccorr: _ImageDataType, image_shape: _ShapeType, ccorr_mask: typing.Optional[_ImageDataType]) -> typing.Tuple[float, typing.Tuple[float, ...]]:
+    if ccorr_mask is not None:
+        ccorr *= ccorr_mask
+    error, ccoeff, max_pos = find_ccorr_max(ccorr)
+    if not error and ccoeff is not None and max_pos is not None:
+        return float(ccoeff), tuple(max_pos[i] - image_shape[i] // 2 for i in range(len(image_shape)))
+    return 0.0, (0.0, ) * len(image_shape)
+
+
+class TemplateMatcher:
+    """
+    Matches one template against many images of the same shape using normalized cross-correlation (see
+    normalized_corr). The template spectrum and normalization are calculated once, when the matcher is created.
+    Inputs can be 1D or 2D and the template must be smaller than or the same size as the images.
+    Pass dtype=numpy.float32 to calculate in single precision, which is faster and uses less memory.
+    A matcher keeps work buffers and must not be used from more than one thread at a time.
+    """
+
+    def __init__(self, template: _ImageDataType, image_shape: _ShapeType, *, dtype: numpy.typing.DTypeLike = numpy.float64) -> None:
+        self.__is_1d = len(image_shape) == 1
+        self.__image_shape = tuple(image_shape)
+        self.__image_shape_2d = self.__image_shape + (1,) if self.__is_1d else self.__image_shape
+        template = template[..., numpy.newaxis] if self.__is_1d else template
+        assert numpy.less_equal(template.shape, self.__image_shape_2d).all()
+        self.__template_shape = template.shape
+        self.__dtype = numpy.dtype(dtype)
+        self.__transfer = _uniform_filter_transfer(self.__image_shape_2d, self.__template_shape, self.__dtype)
+        self.__fft_template_conj, self.__template_sum_squares = _template_terms(template, self.__image_shape_2d, self.__dtype)
+        self.__fft_corr = numpy.empty_like(self.__fft_template_conj)
+
+    def match(self, image: _ImageDataType) -> _ImageDataType:
+        """Return the normalized cross-correlation of the template with the image, like match_template."""
+        assert image.shape == self.__image_shape
+        image = image[..., numpy.newaxis] if self.__is_1d else image
+        fft_image, image_variance = _image_terms(image, self.__template_shape, self.__transfer, self.__dtype)
+        ccorr = _normalized_corr(fft_image, image_variance, self.__fft_template_conj, self.__template_sum_squares, self.__image_shape_2d, self.__template_shape, self.__fft_corr)
+        ccorr[ccorr > 1.1] = 0
+        return ccorr[..., 0] if self.__is_1d else ccorr
+
+    def register(self, image: _ImageDataType, ccorr_mask: typing.Optional[_ImageDataType] = None) -> typing.Tuple[float, typing.Tuple[float, ...]]:
+        """Return the peak value and sub-pixel position of the template on the image, like register_template in Core."""
+        return _register(self.match(image), self.__image_shape, ccorr_mask)
+
+
+class ImageMatcher:
+    """
+    Matches many templates of the same shape against one image using normalized cross-correlation (see
+    normalized_corr). The image spectrum and local variance are calculated once, when the matcher is created.
+    Inputs can be 1D or 2D and the templates must be smaller than or the same size as the image.
+    Pass dtype=numpy.float32 to calculate in single precision, which is faster and uses less memory.
+    A matcher keeps work buffers and must not be used from more than one thread at a time.
+    """
+
+    def __init__(self, image: _ImageDataType, template_shape: _ShapeType, *, dtype: numpy.typing.DTypeLike = numpy.float64) -> None:
+        self.__is_1d = len(image.shape) == 1
+        self.__image_shape = tuple(image.shape)
+        self.__template_shape = tuple(template_shape) + (1,) if self.__is_1d else tuple(template_shape)
+        image = image[..., numpy.newaxis] if self.__is_1d else image
+        assert numpy.less_equal(self.__template_shape, image.shape).all()
+        self.__image_shape_2d = image.shape
+        self.__dtype = numpy.dtype(dtype)
+        transfer = _uniform_filter_transfer(self.__image_shape_2d, self.__template_shape, self.__dtype)
+        self.__fft_image, self.__image_variance = _image_terms(image, self.__template_shape, transfer, self.__dtype)
+        self.__fft_corr = numpy.empty_like(self.__fft_image)
+
+    def match(self, template: _ImageDataType) -> _ImageDataType:
+        """Return the normalized cross-correlation of the template with the image, like match_template."""
+        template = template[..., numpy.newaxis] if self.__is_1d else template
+        assert template.shape == self.__template_shape
+        fft_template_conj, template_sum_squares = _template_terms(template, self.__image_shape_2d, self.__dtype)
+        ccorr = _normalized_corr(self.__fft_image, self.__image_variance, fft_template_conj, template_sum_squares, self.__image_shape_2d, self.__template_shape, self.__fft_corr)
+        ccorr[ccorr > 1.1] = 0
+        return ccorr[..., 0] if self.__is_1d else ccorr
+
+    def register(self, template: _ImageDataType, ccorr_mask: typing.Optional[_ImageDataType] = None) -> typing.Tuple[float, typing.Tuple[float, ...]]:
+        """Return the peak value and sub-pixel position of the template on the image, like register_template in Core."""
+        return _register(self.match(template), self.__image_shape, ccorr_mask)
@@ -0,0 +1,200 @@
+"""Benchmarks for data processing hot paths.
+
+Run the benchmarks with:
+
+    python -m nion.data.test.Benchmarks [--quick] [--filter TEXT] [--repeat N] [--save FILE] [--compare FILE]
+
+Each benchmark reports the best and median time of several runs, the throughput in MB of input data per second, and the
+peak memory allocated during a separate run. Use --save to store the results as a baseline and --compare to show the
+change relative to a stored baseline, for instance before and after a performance change. Use --quick to run on small
+datasets, which is useful to check that the benchmarks still run.
+
+This module is not collected by the test runner.
+"""
+
+# standard libraries
+import argparse
+import dataclasses
+import functools
+import json
+import platform
+import statistics
+import sys
+import timeit
+import tracemalloc
+import typing
+
+# third party libraries
+import numpy
+import scipy
+
+# local libraries
+from nion.data import Core
+from nion.data import DataAndMetadata
+from nion.data import Image
+from nion.data import MultiDimensionalProcessing
+
+
+@dataclasses.dataclass
+class Benchmark:
+    name: str
+    input_nbytes: int
+    fn: typing.Callable[[], typing.Any]
+
+
+@dataclasses.dataclass
+class BenchmarkResult:
+    name: str
+    best: float
+    median: float
+    throughput: float
+    peak_memory: int
+
+
+def make_datasets(quick: bool = False) -> typing.Dict[str, DataAndMetadata.DataAndMetadata]:
+    """Return synthetic float32 datasets of realistic sizes, or small datasets if quick is True."""
+    rng = numpy.random.default_rng(0)
+
+    def make(shape: typing.Tuple[int, ...], data_descriptor: DataAndMetadata.DataDescriptor) -> DataAndMetadata.DataAndMetadata:
+        data = rng.standard_normal(shape, dtype=numpy.float32)
+        data += 10.0
+        return DataAndMetadata.new_data_and_metadata(data=data, data_descriptor=data_descriptor)
+
+    if quick:
+        return {
+            "1d": make((4096,), DataAndMetadata.DataDescriptor(False, 0, 1)),
+            "2d": make((256, 256), DataAndMetadata.DataDescriptor(False, 0, 2)),
+            "3d": make((8, 64, 64), DataAndMetadata.DataDescriptor(True, 0, 2)),
+            "4d": make((8, 8, 32, 32), DataAndMetadata.DataDescriptor(False, 2, 2)),
+            "5d": make((4, 4, 4, 16, 16), DataAndMetadata.DataDescriptor(True, 2, 2)),
+        }
+    return {
+        # a spectrum, an image, an image sequence, a 4D scan, and a sequence of 4D scans.
+        "1d": make((1024 * 1024,), DataAndMetadata.DataDescriptor(False, 0, 1)),
+        "2d": make((2048, 2048), DataAndMetadata.DataDescriptor(False, 0, 2)),
+        "3d": make((100, 512, 512), DataAndMetadata.DataDescriptor(True, 0, 2)),
+        "4d": make((64, 64, 64, 64), DataAndMetadata.DataDescriptor(False, 2, 2)),
+        "5d": make((10, 32, 32, 32, 32), DataAndMetadata.DataDescriptor(True, 2, 2)),
+    }
+
+
+def make_benchmarks(datasets: typing.Mapping[str, DataAndMetadata.DataAndMetadata]) -> typing.List[Benchmark]:
+    benchmarks = list()
+
+    def add(name: str, xdata: DataAndMetadata.DataAndMetadata, fn: typing.Callable[[], typing.Any]) -> None:
+        benchmarks.append(Benchmark(name, xdata.data.nbytes, fn))
+
+    for key in ("1d", "2d"):
+        xdata = datasets[key]
+        add(f"function_fft[{key}]", xdata, functools.partial(Core.function_fft, xdata))
+        binning = (4,) * len(xdata.data_shape)
+        add(f"function_rebin_factor[{key}]", xdata, functools.partial(Core.function_rebin_factor, xdata, binning))
+
+    for key, xdata in datasets.items():
+        # slice the middle of the first axis.
+        slice_key = [slice(xdata.data_shape[0] // 4, xdata.data_shape[0] * 3 // 4)]
+        add(f"function_data_slice[{key}]", xdata, functools.partial(DataAndMetadata.function_data_slice, xdata, slice_key))
+
+    for key in ("2d", "3d", "4d", "5d"):
+        xdata = datasets[key]
+        collection_index = (0,) * xdata.collection_dimension_count if xdata.is_collection else None
+        add(f"function_display_data_no_copy[{key}]", xdata, functools.partial(Core.function_display_data_no_copy, xdata, collection_index=collection_index))
+
+    image_xdata = datasets["2d"]
+    add("create_rgba_image_from_array[2d]", image_xdata, lambda: Image.create_rgba_image_from_array(image_xdata.data))
+    add("create_rgba_image_from_array[2d,limits]", image_xdata, lambda: Image.create_rgba_image_from_array(image_xdata.data, display_limits=(9.0, 11.0), underlimit=0.1, overlimit=0.9))
+
+    collection_xdata = datasets["4d"]
+    add("function_rebin_factor[4d]", collection_xdata, functools.partial(Core.function_rebin_factor, collection_xdata, (2, 2, 4, 4)))
+
+    sequence_xdata = datasets["3d"]
+    add("function_measure_multi_dimensional_shifts[3d]", sequence_xdata, lambda: MultiDimensionalProcessing.function_measure_multi_dimensional_shifts(sequence_xdata, (1, 2)))
+    add("function_measure_multi_dimensional_shifts[3d,reference]", sequence_xdata, lambda: MultiDimensionalProcessing.function_measure_multi_dimensional_shifts(sequence_xdata, (1, 2), reference_index=0))
+    add("function_measure_multi_dimensional_shifts[4d]", collection_xdata, lambda: MultiDimensionalProcessing.function_measure_multi_dimensional_shifts(collection_xdata, (2, 3), reference_index=0))
+
+    # small arrays, where the time is dominated by the metadata handling. repeat the call so it can be timed.
+    small_xdata = DataAndMetadata.new_data_and_metadata(data=numpy.ones((4, 4, 8, 8), dtype=numpy.float32), data_descriptor=DataAndMetadata.DataDescriptor(False, 2, 2))
+    small_count = 1000
+
+    def repeated(fn: typing.Callable[[], typing.Any]) -> typing.Callable[[], None]:
+        def run() -> None:
+            for _ in range(small_count):
+                fn()
+        return run
+
+    add(f"new_data_and_metadata[small,x{small_count}]", small_xdata, repeated(lambda: DataAndMetadata.new_data_and_metadata(data=small_xdata.data, intensity_calibration=small_xdata.intensity_calibration, dimensional_calibrations=small_xdata.dimensional_calibrations, data_descriptor=small_xdata.data_descriptor)))
+    add(f"dimensional_calibrations[small,x{small_count}]", small_xdata, repeated(lambda: small_xdata.dimensional_calibrations))
+    add(f"function_pick[small,x{small_count}]", small_xdata, repeated(functools.partial(Core.function_pick, small_xdata, (0.5, 0.5))))
+    add(f"function_sum[small,x{small_count}]", small_xdata, repeated(functools.partial(Core.function_sum, small_xdata, (2, 3))))
+    add(f"function_data_slice[small,x{small_count}]", small_xdata, repeated(functools.partial(DataAndMetadata.function_data_slice, small_xdata, [0, slice(None)])))
+
+    return benchmarks
+
+
+def run_benchmark(benchmark: Benchmark, repeat: int) -> BenchmarkResult:
+    # run once to warm up caches and measure the peak memory, then time the remaining runs without tracing.
+    tracemalloc.start()
+    try:
+        benchmark.fn()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    times = timeit.Timer(benchmark.fn).repeat(repeat=repeat, number=1)
+    best = min(times)
+    return BenchmarkResult(benchmark.name, best, statistics.median(times), benchmark.input_nbytes / best / 1e6, peak_memory)
+
+
+def run_benchmarks(*, quick: bool = False, name_filter: typing.Optional[str] = None, repeat: int = 5) -> typing.List[BenchmarkResult]:
+    """Run the benchmarks whose name contains name_filter and return the results."""
+    benchmarks = make_benchmarks(make_datasets(quick))
+    return [run_benchmark(benchmark, repeat) for benchmark in benchmarks if not name_filter or name_filter in benchmark.name]
+
+
+def save_results(results: typing.Sequence[BenchmarkResult], file_path: str) -> None:
+    d = {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "scipy": scipy.__version__,
+        "results": {result.name: dataclasses.asdict(result) for result in results},
+    }
+    with open(file_path, "w") as f:
+        json.dump(d, f, indent=2)
+
+
+def load_results(file_path: str) -> typing.Dict[str, BenchmarkResult]:
+    with open(file_path) as f:
+        d = json.load(f)
+    return {name: BenchmarkResult(**result_d) for name, result_d in d["results"].items()}
+
+
+def format_results(results: typing.Sequence[BenchmarkResult], baseline: typing.Optional[typing.Mapping[str, BenchmarkResult]] = None) -> str:
+    lines = [f"{'benchmark':<58} {'best ms':>10} {'median ms':>10} {'MB/s':>10} {'peak MB':>10}" + (f" {'speedup':>8}" if baseline is not None else "")]
+    for result in results:
+        line = f"{result.name:<58} {result.best * 1e3:>10.2f} {result.median * 1e3:>10.2f} {result.throughput:>10.1f} {result.peak_memory / 1e6:>10.1f}"
+        if baseline is not None:
+            baseline_result = baseline.get(result.name)
+            line += f" {baseline_result.best / result.best:>7.2f}x" if baseline_result else f" {'-':>8}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: typing.Optional[typing.Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run niondata benchmarks.")
+    parser.add_argument("--quick", action="store_true", help="use small datasets")
+    parser.add_argument("--filter", dest="name_filter", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed runs of each benchmark")
+    parser.add_argument("--save", help="save the results as a baseline to this JSON file")
+    parser.add_argument("--compare", help="compare the results to a baseline saved in this JSON file")
+    args = parser.parse_args(argv)
+    results = run_benchmarks(quick=args.quick, name_filter=args.name_filter, repeat=args.repeat)
+    baseline = load_results(args.compare) if args.compare else None
+    print(format_results(results, baseline))
+    if args.save:
+        save_results(results, args.save)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
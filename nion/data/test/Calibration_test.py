@@ -1,5 +1,7 @@
 # standard libraries
+import copy
 import logging
+import pickle
 import unittest
 
 # third party libraries
@@ -59,6 +61,22 @@ class TestCalibrationClass(unittest.TestCase):
         self.assertEqual(d[Calibration.Calibration(1.0, 2.0, "c")], 1)
 
 
+    def test_immutable_calibration_cannot_be_changed_and_copies_are_mutable(self) -> None:
+        calibration = Calibration.ImmutableCalibration(1.0, 2.0, "c")
+        self.assertEqual(Calibration.Calibration(1.0, 2.0, "c"), calibration)
+        self.assertEqual(calibration, Calibration.Calibration(1.0, 2.0, "c"))
+        self.assertEqual(hash(Calibration.Calibration(1.0, 2.0, "c")), hash(calibration))
+        with self.assertRaises(AttributeError):
+            calibration.offset = 3.0
+        with self.assertRaises(AttributeError):
+            calibration.clear()
+        self.assertIs(calibration, Calibration.ImmutableCalibration.make(calibration))
+        calibration_copy = copy.deepcopy(calibration)
+        calibration_copy.offset = 3.0
+        self.assertEqual(1.0, calibration.offset)
+        self.assertEqual(calibration, pickle.loads(pickle.dumps(calibration)))
+
+
 if __name__ == '__main__':
     logging.getLogger().setLevel(logging.DEBUG)
     unittest.main()
@@ -1,5 +1,6 @@
 # standard libraries
 import copy
+import functools
 import io
 import logging
 import math
@@ -17,6 +18,8 @@ import scipy.ndimage
 from nion.data import Calibration
 from nion.data import Core
 from nion.data import DataAndMetadata
+from nion.data import Parallel
+from nion.data import TemplateMatching
 from nion.data.DataAndMetadata import _ImageDataType
 from nion.utils import Geometry
 
@@ -67,6 +70,54 @@ class TestCore(unittest.TestCase):
             vector = (0.1, 0.2), (0.3, 0.4)
             Core.function_line_profile(DataAndMetadata.new_data_and_metadata(data=numpy.zeros((32, 32), numpy.complex128)), vector, 3.0)
 
+    def test_line_profile_matches_nearest_map_coordinates(self) -> None:
+        data = numpy.random.default_rng(0).random((31, 23))
+        xdata = DataAndMetadata.new_data_and_metadata(data=data)
+        # the lines extend outside the image, where the samples are zero.
+        for vector in (((0.1, 0.2), (0.8, 0.9)), ((-0.2, 0.5), (0.7, 1.3)), ((0.9, 0.1), (0.15, 0.6))):
+            for width in (1, 2, 5):
+                with self.subTest(vector=vector, width=width):
+                    start = numpy.array([int(31 * vector[0][0]), int(23 * vector[0][1])])
+                    end = numpy.array([int(31 * vector[1][0]), int(23 * vector[1][1])])
+                    yy, xx = Core._get_line_profile_coordinates((start[0], start[1]), (end[0], end[1]), width)
+                    expected = numpy.sum(scipy.ndimage.map_coordinates(data, (yy, xx), order=0), 0)
+                    self.assertTrue(numpy.array_equal(expected, Core.function_line_profile(xdata, vector, width).data))
+
+    def test_line_profiles_of_sequence_match_line_profile_of_each_frame(self) -> None:
+        data = numpy.random.default_rng(0).random((3, 32, 32)).astype(numpy.float32)
+        dimensional_calibrations = [Calibration.Calibration(units="s"), Calibration.Calibration(scale=2, units="nm"), Calibration.Calibration(scale=2, units="nm")]
+        xdata = DataAndMetadata.new_data_and_metadata(data=data, dimensional_calibrations=dimensional_calibrations, data_descriptor=DataAndMetadata.DataDescriptor(True, 0, 2))
+        vectors: typing.List[Core.NormVectorType] = [((0.5, 0.5), (0.5 + 0.4 * math.sin(a), 0.5 + 0.4 * math.cos(a))) for a in numpy.linspace(0, math.pi, 7)]
+        vectors.append(((0.2, 0.2), (0.3, 0.3)))  # a shorter profile is padded with zeros
+        line_profiles = Core.function_line_profiles(xdata, vectors, 3)
+        self.assertEqual(DataAndMetadata.DataDescriptor(True, 1, 1), line_profiles.data_descriptor)
+        self.assertEqual((3, len(vectors)), line_profiles.data_shape[:2])
+        self.assertEqual(numpy.float32, line_profiles.data_dtype)
+        self.assertEqual("s", line_profiles.dimensional_calibrations[0].units)
+        self.assertEqual(Calibration.Calibration(0, 2, "nm"), line_profiles.dimensional_calibrations[-1])
+        self.assertAlmostEqual(1 / 3, line_profiles.intensity_calibration.scale)
+        for frame_index in range(3):
+            for vector_index, vector in enumerate(vectors):
+                line_profile = Core.function_line_profile(DataAndMetadata.new_data_and_metadata(data=data[frame_index]), vector, 3).data
+                self.assertTrue(numpy.array_equal(line_profile, line_profiles.data[frame_index, vector_index, :len(line_profile)]))
+                self.assertFalse(numpy.any(line_profiles.data[frame_index, vector_index, len(line_profile):]))
+        image_line_profiles = Core.function_line_profiles(DataAndMetadata.new_data_and_metadata(data=data[1]), vectors, 3)
+        self.assertEqual(DataAndMetadata.DataDescriptor(False, 1, 1), image_line_profiles.data_descriptor)
+        self.assertTrue(numpy.array_equal(line_profiles.data[1], image_line_profiles.data))
+        # the profiles of a 2D collection of images, such as 4D STEM data, are the datum of each collection position.
+        for is_sequence in (False, True):
+            with self.subTest(is_sequence=is_sequence):
+                collection_data = numpy.random.default_rng(1).random(((2,) if is_sequence else ()) + (2, 3, 32, 32)).astype(numpy.float32)
+                navigation_calibrations = ([Calibration.Calibration(units="s")] if is_sequence else []) + [Calibration.Calibration(scale=0.5, units="um")] * 2
+                collection_xdata = DataAndMetadata.new_data_and_metadata(data=collection_data, dimensional_calibrations=navigation_calibrations + dimensional_calibrations[1:], data_descriptor=DataAndMetadata.DataDescriptor(is_sequence, 2, 2))
+                collection_line_profiles = Core.function_line_profiles(collection_xdata, vectors, 3)
+                self.assertEqual(DataAndMetadata.DataDescriptor(is_sequence, 2, 2), collection_line_profiles.data_descriptor)
+                self.assertEqual(collection_data.shape[:-2] + image_line_profiles.data_shape, collection_line_profiles.data_shape)
+                self.assertEqual(navigation_calibrations + [Calibration.Calibration(), Calibration.Calibration(0, 2, "nm")], collection_line_profiles.dimensional_calibrations)
+                for index in numpy.ndindex(collection_data.shape[:-2]):
+                    frame_line_profiles = Core.function_line_profiles(DataAndMetadata.new_data_and_metadata(data=collection_data[index]), vectors, 3)
+                    self.assertTrue(numpy.array_equal(frame_line_profiles.data, collection_line_profiles.data[index]))
+
     def test_fft_produces_correct_calibration(self) -> None:
         src_data = ((numpy.abs(numpy.random.randn(16, 16)) + 1) * 10).astype(numpy.float32)
         dimensional_calibrations = (Calibration.Calibration(offset=3), Calibration.Calibration(offset=2))
@@ -234,6 +285,48 @@ class TestCore(unittest.TestCase):
         self.assertTrue(numpy.array_equal(dst1._data_ex[1], (1, 1, 1, 1)))
         self.assertTrue(numpy.array_equal(dst1._data_ex[2], (0, 0, 0, 0)))
 
+    def test_filters_write_into_out_and_match_new_result(self) -> None:
+        rng = numpy.random.default_rng(0)
+        scalar_xdata = DataAndMetadata.new_data_and_metadata(data=rng.standard_normal((12, 10)).astype(numpy.float32))
+        rgba_xdata = DataAndMetadata.new_data_and_metadata(data=rng.integers(0, 256, (12, 10, 4)).astype(numpy.uint8))
+        functions: typing.List[typing.Callable[..., DataAndMetadata.DataAndMetadata]] = [
+            Core.function_sobel,
+            Core.function_laplace,
+            Core.function_invert,
+            functools.partial(Core.function_gaussian_blur, sigma=1.5),
+            functools.partial(Core.function_median_filter, size=3),
+            functools.partial(Core.function_uniform_filter, size=3),
+            functools.partial(Core.function_transpose_flip, transpose=True, flip_h=True),
+        ]
+        for xdata in (scalar_xdata, rgba_xdata):
+            for fn in functions:
+                with self.subTest(fn=fn, shape=xdata.data_shape):
+                    expected = fn(xdata)
+                    out = DataAndMetadata.new_data_and_metadata(data=numpy.zeros(expected.data.shape, expected.data_dtype))
+                    out_data = out.data
+                    for _ in range(2):
+                        self.assertIs(out, fn(xdata, out=out))
+                    self.assertIs(out_data, out.data)
+                    self.assertTrue(numpy.array_equal(expected.data, out.data))
+        with self.assertRaises(ValueError):
+            Core.function_gaussian_blur(scalar_xdata, 1.5, out=DataAndMetadata.new_data_and_metadata(data=numpy.zeros((12, 10))))
+
+    def test_rgba_filters_match_filtering_each_channel(self) -> None:
+        Parallel.configure(max_workers=4)
+        try:
+            data = numpy.random.default_rng(0).integers(0, 256, (24, 20, 4)).astype(numpy.uint8)
+            xdata = DataAndMetadata.new_data_and_metadata(data=data)
+            blurred = Core.function_gaussian_blur(xdata, 2.0)
+            coordinates = Core.calculate_coordinates_for_affine_transform(xdata, numpy.array([[1.0, 0.1], [0.05, 1.0]]))
+            warped = Core.function_warp(xdata, coordinates, order=3)
+            coords = numpy.stack([coordinate.data for coordinate in coordinates])
+            for channel in range(4):
+                expected_blurred = scipy.ndimage.gaussian_filter(data[..., channel], sigma=2.0) if channel < 3 else data[..., 3]
+                self.assertTrue(numpy.array_equal(expected_blurred, blurred.data[..., channel]))
+                self.assertTrue(numpy.array_equal(scipy.ndimage.map_coordinates(data[..., channel], coords, order=3), warped.data[..., channel]))
+        finally:
+            Parallel.configure()
+
     def test_fourier_filter_gives_sensible_units_when_source_has_units(self) -> None:
         dimensional_calibrations = [Calibration.Calibration(units="mm"), Calibration.Calibration(units="mm")]
         src = DataAndMetadata.new_data_and_metadata(data=numpy.ones((32, 32)), dimensional_calibrations=dimensional_calibrations)
@@ -247,6 +340,68 @@ class TestCore(unittest.TestCase):
         self.assertEqual(dst.dimensional_calibrations[0].units, "")
         self.assertEqual(dst.dimensional_calibrations[1].units, "")
 
+    def test_fft_of_collection_transforms_each_datum(self) -> None:
+        rng = numpy.random.default_rng(0)
+        dimensional_calibrations = [Calibration.Calibration(units="nm")] * 2 + [Calibration.Calibration(scale=0.5, units="mrad")] * 2
+        src = DataAndMetadata.new_data_and_metadata(data=rng.standard_normal((3, 4, 16, 12)), dimensional_calibrations=dimensional_calibrations, data_descriptor=DataAndMetadata.DataDescriptor(False, 2, 2))
+        dst = Core.function_fft(src)
+        datum_fft = Core.function_fft(DataAndMetadata.new_data_and_metadata(data=src.data[1, 2], dimensional_calibrations=dimensional_calibrations[2:4]))
+        self.assertEqual(src.data_descriptor, dst.data_descriptor)
+        self.assertTrue(numpy.allclose(datum_fft.data, dst.data[1, 2]))
+        self.assertEqual(src.dimensional_calibrations[0:2], dst.dimensional_calibrations[0:2])
+        self.assertEqual(datum_fft.dimensional_calibrations, dst.dimensional_calibrations[2:4])
+        self.assertTrue(numpy.allclose(src.data, Core.function_ifft(dst).data))
+        self.assertEqual(src.dimensional_calibrations[2].units, Core.function_ifft(dst).dimensional_calibrations[2].units)
+
+    def test_fft_of_2d_sequence_and_collection_of_spectra_transforms_each_row(self) -> None:
+        # before 15.10, these were transformed as 2d images and returned with a plain 2d data descriptor.
+        data = numpy.random.default_rng(0).standard_normal((6, 32))
+        for data_descriptor in (DataAndMetadata.DataDescriptor(True, 0, 1), DataAndMetadata.DataDescriptor(False, 1, 1)):
+            with self.subTest(data_descriptor=data_descriptor):
+                src = DataAndMetadata.new_data_and_metadata(data=data, data_descriptor=data_descriptor)
+                expected = scipy.fft.fftshift(scipy.fft.fft(data, axis=-1), axes=-1) / math.sqrt(32)
+                dst = Core.function_fft(src)
+                self.assertEqual(data_descriptor, dst.data_descriptor)
+                self.assertTrue(numpy.allclose(expected, dst.data))
+                inverse = Core.function_ifft(DataAndMetadata.new_data_and_metadata(data=expected, data_descriptor=data_descriptor))
+                self.assertEqual(data_descriptor, inverse.data_descriptor)
+                self.assertTrue(numpy.allclose(data, inverse.data))
+                self.assertTrue(numpy.allclose(scipy.fft.ifft(scipy.fft.ifftshift(expected, axes=-1), axis=-1) * math.sqrt(32), inverse.data))
+
+    def test_fft_half_spectrum_matches_full_spectrum(self) -> None:
+        rng = numpy.random.default_rng(0)
+        src = DataAndMetadata.new_data_and_metadata(data=rng.standard_normal((5, 16, 11)), data_descriptor=DataAndMetadata.DataDescriptor(True, 0, 2))
+        full = Core.function_fft(src)
+        half = Core.function_fft(src, rfft=True)
+        self.assertEqual((5, 16, 6), half.data_shape)
+        # the zero frequency is at index 5 of the last axis of the full spectrum and at index 0 of the half spectrum.
+        self.assertTrue(numpy.allclose(full.data[..., 5:], half.data))
+        self.assertAlmostEqual(full.dimensional_calibrations[2].convert_to_calibrated_value(5), half.dimensional_calibrations[2].convert_to_calibrated_value(0))
+        self.assertEqual(full.dimensional_calibrations[1], half.dimensional_calibrations[1])
+        self.assertTrue(numpy.allclose(src.data, Core.function_ifft(half, rfft=True, last_axis_length=11).data))
+        with self.assertRaises(ValueError):
+            Core.function_fft(src.data.astype(numpy.complex128), rfft=True)
+
+    def test_fft_of_sequence_of_spectra_transforms_each_spectrum(self) -> None:
+        rng = numpy.random.default_rng(0)
+        src = DataAndMetadata.new_data_and_metadata(data=rng.standard_normal((10, 64)).astype(numpy.float32), data_descriptor=DataAndMetadata.DataDescriptor(True, 0, 1))
+        full = Core.function_fft(src)
+        half = Core.function_fft(src, rfft=True)
+        spectrum_fft = Core.function_fft(src.data[3])
+        self.assertEqual(src.data_descriptor, full.data_descriptor)
+        self.assertEqual(src.data_descriptor, half.data_descriptor)
+        self.assertTrue(numpy.allclose(spectrum_fft.data, full.data[3]))
+        self.assertTrue(numpy.allclose(full.data[..., 32:], half.data[..., :32]))
+        self.assertEqual(src.dimensional_calibrations[0], full.dimensional_calibrations[0])
+        self.assertEqual(spectrum_fft.dimensional_calibrations[0], full.dimensional_calibrations[1])
+        # results have the same dtype as the 1d and 2d transforms.
+        self.assertEqual(numpy.complex128, spectrum_fft.data_dtype)
+        self.assertEqual(numpy.complex128, full.data_dtype)
+        self.assertEqual(numpy.complex128, half.data_dtype)
+        self.assertEqual(numpy.complex128, Core.function_ifft(full).data_dtype)
+        self.assertEqual(numpy.float64, Core.function_ifft(half, rfft=True).data_dtype)
+        self.assertTrue(numpy.allclose(src.data, Core.function_ifft(full).data, atol=1e-5))
+
     def test_fourier_mask_works_with_all_dimensions(self) -> None:
         dimension_list = [(32, 32), (31, 30), (30, 31), (31, 31), (32, 31), (31, 32)]
         for h, w in dimension_list:
@@ -402,6 +557,23 @@ class TestCore(unittest.TestCase):
         self.assertEqual(average_region.dimensional_calibrations[0], cs)
         self.assertEqual(average_region.dimensional_calibrations[1], c3)
 
+    def test_sum_and_average_region_produce_correct_result_for_2d_datum(self) -> None:
+        mask_data: numpy.typing.NDArray[numpy.int32] = numpy.zeros((3, 4), numpy.int32)
+        mask_data[0, 1] = 1
+        mask_data[2, 2] = 1
+        mask = DataAndMetadata.new_data_and_metadata(data=mask_data)
+        for is_sequence in (False, True):
+            with self.subTest(is_sequence=is_sequence):
+                random_data = numpy.random.randn(*(((2,) if is_sequence else ()) + (3, 4, 5, 6)))
+                data = DataAndMetadata.new_data_and_metadata(data=random_data, data_descriptor=DataAndMetadata.DataDescriptor(is_sequence, 2, 2))
+                expected = random_data[..., 0, 1, :, :] + random_data[..., 2, 2, :, :]
+                sum_region = Core.function_sum_region(data, mask)
+                average_region = Core.function_average_region(data, mask)
+                self.assertTrue(numpy.allclose(expected, sum_region._data_ex))
+                self.assertTrue(numpy.allclose(expected / 2, average_region._data_ex))
+                self.assertEqual(DataAndMetadata.DataDescriptor(is_sequence, 0, 2), average_region.data_descriptor)
+                self.assertEqual(expected.shape, average_region.data_shape)
+
     def test_slice_sum_works_on_2d_data(self) -> None:
         random_data = numpy.random.randn(4, 10)
         c0 = Calibration.Calibration(units="a")
@@ -432,6 +604,27 @@ class TestCore(unittest.TestCase):
         data_and_metadata = DataAndMetadata.new_data_and_metadata(data=random_data)
         Core.function_display_rgba(data_and_metadata)
 
+    def test_display_rgba_updates_dirty_rect_of_out(self) -> None:
+        data = numpy.zeros((32, 24), numpy.float32)
+        xdata = DataAndMetadata.new_data_and_metadata(data=data)
+        out = DataAndMetadata.new_data_and_metadata(data=numpy.zeros((32, 24), numpy.uint32))
+        self.assertIs(out, Core.function_display_rgba(xdata, display_range=(0, 1), out=out))
+        # simulate acquiring rows 8 to 12 of a scan and updating only those rows and a rectangle within them.
+        data[8:12] = numpy.random.rand(4, 24)
+        previous_rgba = out.data.copy()
+        Core.function_display_rgba(xdata, display_range=(0, 1), out=out, dirty_rect=((8, 4), (2, 10)))
+        self.assertTrue(numpy.array_equal(previous_rgba[10:12], out.data[10:12]))
+        self.assertTrue(numpy.array_equal(previous_rgba[8:10, 14:], out.data[8:10, 14:]))
+        Core.function_display_rgba(xdata, display_range=(0, 1), out=out, dirty_rect=((8, 0), (4, 24)))
+        display_rgba = Core.function_display_rgba(xdata, display_range=(0, 1))
+        assert display_rgba
+        self.assertTrue(numpy.array_equal(display_rgba.data, out.data))
+        # rectangles outside of the data are clipped.
+        Core.function_display_rgba(xdata, display_range=(0, 1), out=out, dirty_rect=((30, 20), (10, 10)))
+        self.assertTrue(numpy.array_equal(display_rgba.data, out.data))
+        with self.assertRaises(ValueError):
+            Core.function_display_rgba(xdata, display_range=(0, 1), dirty_rect=((8, 0), (4, 24)))
+
     def test_create_rgba_image_from_uint16(self) -> None:
         image = numpy.mgrid[22000:26096:256, 0:16][0].astype(numpy.uint16)
         display_rgba = Core.function_display_rgba(DataAndMetadata.new_data_and_metadata(data=image), display_range=(22000, 26096))
@@ -447,6 +640,34 @@ class TestCore(unittest.TestCase):
         self.assertIsNotNone(display_data)
         self.assertTrue(modified)
 
+    def test_display_data_no_copy_of_sequence_returns_read_only_view(self) -> None:
+        data = numpy.random.rand(4, 3, 3, 16, 16)
+        xdata = DataAndMetadata.new_data_and_metadata(data=data, data_descriptor=DataAndMetadata.DataDescriptor(True, 2, 2))
+        display_xdata, modified = Core.function_display_data_no_copy(xdata, 2, (1, 2))
+        assert display_xdata is not None
+        self.assertTrue(modified)
+        self.assertTrue(numpy.shares_memory(data, display_xdata.data))
+        self.assertTrue(numpy.array_equal(data[2, 1, 2], display_xdata.data))
+        self.assertFalse(display_xdata.data.flags.writeable)
+        with self.assertRaises(ValueError):
+            display_xdata.data[0, 0] = 1.0
+        display_xdata2 = Core.function_display_data(xdata, 2, (1, 2))
+        assert display_xdata2 is not None
+        self.assertFalse(numpy.shares_memory(data, display_xdata2.data))
+        self.assertTrue(numpy.array_equal(data[2, 1, 2], display_xdata2.data))
+
+    def test_data_slice_without_copy_matches_slice_with_copy(self) -> None:
+        data = numpy.random.rand(4, 8, 6)
+        xdata = DataAndMetadata.new_data_and_metadata(data=data, data_descriptor=DataAndMetadata.DataDescriptor(True, 0, 2))
+        for key in ((2, ...), (slice(1, 3), slice(2, 6, 2)), (..., slice(1, 3)), (1, 2, 3)):
+            with self.subTest(key=key):
+                sliced_xdata = DataAndMetadata.function_data_slice(xdata, DataAndMetadata.key_to_list(key))
+                view_xdata = DataAndMetadata.function_data_slice(xdata, DataAndMetadata.key_to_list(key), copy=False)
+                self.assertTrue(numpy.array_equal(sliced_xdata.data, view_xdata.data))
+                self.assertEqual(sliced_xdata.data_metadata, view_xdata.data_metadata)
+                self.assertFalse(numpy.shares_memory(data, sliced_xdata.data))
+        self.assertTrue(data.flags.writeable)
+
     def test_ability_to_take_1d_slice_with_newaxis(self) -> None:
         data = numpy.random.rand(64)
         xdata = DataAndMetadata.new_data_and_metadata(data=data, data_descriptor=DataAndMetadata.DataDescriptor(False, 0, 1))
@@ -675,6 +896,25 @@ class TestCore(unittest.TestCase):
         self.assertAlmostEqual(shifts[sdata.shape[0] // 2][0], 1 / (sdata.shape[0] - 1) * 3.4, delta=0.1)
         self.assertAlmostEqual(numpy.sum(shifts, axis=0)[0], 3.4, delta=2)
 
+    def test_sequence_register_matches_frame_by_frame_registration(self) -> None:
+        random_state = numpy.random.get_state()
+        numpy.random.seed(1)
+        for frame_shape, bounds in (((33, 40), None), ((32, 41), ((0.1, 0.2), (0.7, 0.6))), ((50,), (0.1, 0.8))):
+            with self.subTest(frame_shape=frame_shape, bounds=bounds):
+                data = scipy.ndimage.gaussian_filter(numpy.random.randn(*frame_shape), 2)
+                sdata = numpy.stack([scipy.ndimage.shift(data, numpy.random.uniform(-3, 3, len(frame_shape))) for _ in range(12)])
+                sdata += numpy.random.randn(*sdata.shape) * 0.01
+                sxdata = DataAndMetadata.new_data_and_metadata(data=sdata, data_descriptor=DataAndMetadata.DataDescriptor(True, 0, len(frame_shape)))
+                for subtract_means in (True, False):
+                    shifts = Core.function_sequence_register_translation(sxdata, subtract_means, bounds)._data_ex
+                    relative_shifts = Core.function_sequence_measure_relative_translation(sxdata, data, subtract_means, bounds)._data_ex
+                    self.assertTrue(numpy.array_equal(numpy.zeros(len(frame_shape)), shifts[0]))
+                    for i in range(1, sdata.shape[0]):
+                        self.assertTrue(numpy.allclose(Core.function_register(sdata[i - 1], sdata[i], subtract_means, bounds), shifts[i]))
+                    for i in range(sdata.shape[0]):
+                        self.assertTrue(numpy.allclose(Core.function_register(data, sdata[i], subtract_means, bounds), relative_shifts[i]))
+        numpy.random.set_state(random_state)
+
     def test_sequence_register_produces_correctly_shaped_output_on_2dx1d_data(self) -> None:
         random_state = numpy.random.get_state()
         numpy.random.seed(1)
@@ -919,6 +1159,36 @@ class TestCore(unittest.TestCase):
         result = Core.function_crop_rotated(xdata, ((0.5, 0.5), (1 / 49, 115 / 163)), -0.8096358402621856)
         self.assertEqual((1, 115), result.data_shape)
 
+    def test_crop_rotated_matches_map_coordinates_and_crops_each_frame(self) -> None:
+        data = numpy.random.default_rng(0).random((3, 64, 80))
+        top, left, height, width, angle = 20, 24, 16, 24, 0.4
+        bounds = ((top / 64, left / 80), (height / 64, width / 80))
+        x, y = numpy.meshgrid(numpy.arange(-(height // 2), height - height // 2), numpy.arange(-(width // 2), width - width // 2), indexing="ij")
+        coords = [top + height // 2 + x * math.cos(angle) - y * math.sin(angle), left + width // 2 + y * math.cos(angle) + x * math.sin(angle)]
+        xdata = DataAndMetadata.new_data_and_metadata(data=data[0])
+        self.assertTrue(numpy.allclose(scipy.ndimage.map_coordinates(data[0], coords), Core.function_crop_rotated(xdata, bounds, angle).data, atol=1e-9))
+        sequence_xdata = DataAndMetadata.new_data_and_metadata(data=data, data_descriptor=DataAndMetadata.DataDescriptor(True, 0, 2))
+        out = DataAndMetadata.new_data_and_metadata(data=numpy.zeros((3, height, width)))
+        self.assertIs(out, Core.function_crop_rotated(sequence_xdata, bounds, angle, out=out))
+        result = Core.function_crop_rotated(sequence_xdata, bounds, angle)
+        self.assertEqual(sequence_xdata.data_descriptor, result.data_descriptor)
+        for i in range(3):
+            expected = Core.function_crop_rotated(DataAndMetadata.new_data_and_metadata(data=data[i]), bounds, angle).data
+            self.assertTrue(numpy.array_equal(expected, result.data[i]))
+            self.assertTrue(numpy.array_equal(expected, out.data[i]))
+
+    def test_crop_rotated_with_center_on_edge_matches_map_coordinates(self) -> None:
+        data = numpy.random.default_rng(0).integers(0, 256, (100, 140)).astype(numpy.uint8)
+        xdata = DataAndMetadata.new_data_and_metadata(data=data)
+        for bounds in (((-0.34, 0.1), (0.68, 0.36)), ((0.5, -0.2), (0.3, 0.4)), ((0.3, 0.8), (0.2, 0.4)), ((0.7, 0.4), (0.6, 0.2))):
+            for angle in (-0.7, 0.1, 0.3):
+                with self.subTest(bounds=bounds, angle=angle):
+                    top, left = round(100 * bounds[0][0]), round(140 * bounds[0][1])
+                    height, width = round(100 * bounds[1][0]), round(140 * bounds[1][1])
+                    x, y = numpy.meshgrid(numpy.arange(-(height // 2), height - height // 2), numpy.arange(-(width // 2), width - width // 2), indexing="ij")
+                    coords = [top + height // 2 + (x * math.cos(angle) - y * math.sin(angle)), left + width // 2 + (y * math.cos(angle) + x * math.sin(angle))]
+                    self.assertTrue(numpy.array_equal(scipy.ndimage.map_coordinates(data, coords), Core.function_crop_rotated(xdata, bounds, angle).data))
+
     def test_redimension_basic_functionality(self) -> None:
         data: numpy.typing.NDArray[numpy.int32] = numpy.ones((100, 100), dtype=numpy.int32)
         xdata = DataAndMetadata.new_data_and_metadata(data=data)
@@ -967,6 +1237,54 @@ class TestCore(unittest.TestCase):
         self.assertTrue(numpy.allclose(max_pos, (0, -33), atol=0.1))
         self.assertAlmostEqual(ccoeff, 1.0, places=1)
 
+    def test_template_matchers_match_register_template(self) -> None:
+        rng = numpy.random.RandomState(42)
+        for shape, template_slice in (((100,), (slice(40, 60),)), ((64, 48), (slice(20, 40), slice(15, 20)))):
+            with self.subTest(shape=shape):
+                data = rng.randn(*shape)
+                template = data[template_slice]
+                images = [scipy.ndimage.shift(data, 1.6 * i, order=1) for i in range(3)]
+                template_matcher = TemplateMatching.TemplateMatcher(template, shape)
+                template_matcher_float32 = TemplateMatching.TemplateMatcher(template, shape, dtype=numpy.float32)
+                for image in images:
+                    ccorr = Core.function_match_template(image, template).data
+                    self.assertTrue(numpy.allclose(ccorr, template_matcher.match(image), atol=1e-8))
+                    self.assertTrue(numpy.allclose(ccorr, template_matcher_float32.match(image), atol=1e-3))
+                    ccoeff, max_pos = Core.function_register_template(image, template)
+                    matcher_ccoeff, matcher_max_pos = template_matcher.register(image)
+                    self.assertAlmostEqual(ccoeff, matcher_ccoeff)
+                    self.assertTrue(numpy.allclose(max_pos, matcher_max_pos))
+                image_matcher = TemplateMatching.ImageMatcher(data, template.shape)
+                for image in images:
+                    frame = image[template_slice]
+                    ccoeff, max_pos = Core.function_register_template(data, frame)
+                    matcher_ccoeff, matcher_max_pos = image_matcher.register(frame)
+                    self.assertAlmostEqual(ccoeff, matcher_ccoeff)
+                    self.assertTrue(numpy.allclose(max_pos, matcher_max_pos))
+
+    def test_register_template_batch_matches_register_template(self) -> None:
+        rng = numpy.random.RandomState(42)
+        for shape, template_slice in (((100,), (slice(40, 60),)), ((48, 40), (slice(10, 30), slice(12, 24)))):
+            with self.subTest(shape=shape):
+                data = scipy.ndimage.gaussian_filter(rng.randn(*shape), 1.5)
+                images = numpy.array([scipy.ndimage.shift(data, 2.3 * i - 4, order=1) for i in range(5)])
+                templates = numpy.array([image[template_slice] for image in images])
+                template = data[template_slice]
+                ccoeffs, positions = Core.function_register_template_batch(images, template)
+                self.assertEqual((5,), ccoeffs.shape)
+                self.assertEqual((5, len(shape)), positions.shape)
+                for i in range(5):
+                    ccoeff, max_pos = Core.function_register_template(images[i], template)
+                    self.assertAlmostEqual(ccoeff, ccoeffs[i])
+                    self.assertTrue(numpy.allclose(max_pos, positions[i]))
+                ccoeffs, positions = Core.function_register_template_batch(data, templates)
+                for i in range(5):
+                    ccoeff, max_pos = Core.function_register_template(data, templates[i])
+                    self.assertAlmostEqual(ccoeff, ccoeffs[i])
+                    self.assertTrue(numpy.allclose(max_pos, positions[i]))
+        with self.assertRaises(ValueError):
+            Core.function_register_template_batch(numpy.zeros((8, 8)), numpy.zeros((8, 8)))
+
     def test_register_template_for_2d_data_with_mask(self) -> None:
         data = numpy.zeros((100, 100))
         data[5::10, 5::10] = 1
@@ -990,6 +1308,54 @@ class TestCore(unittest.TestCase):
         ccoeff, max_pos = Core.function_register_template(image_xdata, template_xdata)
         self.assertTrue(numpy.allclose(max_pos, (2.3, 3.7), atol=0.5))
 
+    def test_sequence_integrator_matches_sequence_integrate(self) -> None:
+        for dtype in (numpy.uint16, numpy.float32, numpy.complex64):
+            with self.subTest(dtype=dtype):
+                data = (numpy.random.RandomState(42).rand(12, 8, 6) * 1000).astype(dtype)
+                intensity_calibration = Calibration.Calibration(0.1, 0.2, "I")
+                dimensional_calibrations = [Calibration.Calibration(0.11, 0.22, "S"), Calibration.Calibration(0.11, 0.22, "A"), Calibration.Calibration(0.111, 0.222, "B")]
+                xdata = DataAndMetadata.new_data_and_metadata(data=data, intensity_calibration=intensity_calibration, dimensional_calibrations=dimensional_calibrations, data_descriptor=DataAndMetadata.DataDescriptor(True, 0, 2))
+                integrator = Core.SequenceIntegrator()
+                self.assertIsNone(integrator.sum_xdata)
+                for i in range(data.shape[0]):
+                    integrator.push(xdata[i])
+                    sum_xdata = integrator.sum_xdata
+                    assert sum_xdata is not None
+                    expected_xdata = Core.function_sequence_integrate(xdata[:i + 1])
+                    self.assertEqual(expected_xdata.data_dtype, sum_xdata.data_dtype)
+                    self.assertTrue(numpy.allclose(expected_xdata.data, sum_xdata.data, rtol=1e-5))
+                    self.assertEqual(expected_xdata.data_metadata.data_descriptor, sum_xdata.data_descriptor)
+                    self.assertEqual(expected_xdata.intensity_calibration, sum_xdata.intensity_calibration)
+                    self.assertEqual(expected_xdata.dimensional_calibrations, sum_xdata.dimensional_calibrations)
+                self.assertEqual(data.shape[0], integrator.count)
+                mean_xdata = integrator.mean_xdata
+                variance_xdata = integrator.get_variance_xdata(ddof=1)
+                assert mean_xdata is not None
+                assert variance_xdata is not None
+                self.assertTrue(numpy.allclose(numpy.mean(data.astype(numpy.complex128), axis=0), mean_xdata.data))
+                self.assertTrue(numpy.allclose(numpy.var(data.astype(numpy.complex128), axis=0, ddof=1), variance_xdata.data))
+                with self.assertRaises(ValueError):
+                    integrator.push(numpy.zeros((8, 5)))
+
+    def test_radial_profile_of_navigable_data_matches_profile_of_each_datum(self) -> None:
+        data = numpy.random.RandomState(42).rand(3, 4, 20, 24)
+        dimensional_calibrations = [Calibration.Calibration(0, 1, "nm"), Calibration.Calibration(0, 1, "nm"), Calibration.Calibration(-5, 0.5, "1/nm"), Calibration.Calibration(-6, 0.5, "1/nm")]
+        xdata = DataAndMetadata.new_data_and_metadata(data=data, dimensional_calibrations=dimensional_calibrations, data_descriptor=DataAndMetadata.DataDescriptor(False, 2, 2))
+        for bin_width in (1.0, 2.5):
+            with self.subTest(bin_width=bin_width):
+                profiles = Core.function_radial_profile(xdata, bin_width=bin_width)
+                self.assertEqual(DataAndMetadata.DataDescriptor(False, 2, 1), profiles.data_descriptor)
+                self.assertEqual(dimensional_calibrations[:2], profiles.dimensional_calibrations[:2])
+                self.assertEqual(Calibration.Calibration(0, 0.5 * bin_width, "1/nm"), profiles.dimensional_calibrations[2])
+                y, x = numpy.indices((20, 24))
+                r = (numpy.sqrt((x - 12) ** 2 + (y - 10) ** 2) / bin_width).astype(int)
+                for i in range(3):
+                    for j in range(4):
+                        expected = numpy.bincount(r.ravel(), data[i, j].ravel()) / numpy.bincount(r.ravel())
+                        profile = Core.function_radial_profile(xdata[i, j], bin_width=bin_width)
+                        self.assertTrue(numpy.allclose(expected, profile.data))
+                        self.assertTrue(numpy.allclose(expected, profiles.data[i, j]))
+
     def test_sequence_join(self) -> None:
         xdata_list = [DataAndMetadata.new_data_and_metadata(data=numpy.ones((16, 32)), data_descriptor=DataAndMetadata.DataDescriptor(False, 1, 1))]
         xdata_list.append(DataAndMetadata.new_data_and_metadata(data=numpy.ones((2, 16, 32)), data_descriptor=DataAndMetadata.DataDescriptor(True, 1, 1)))
@@ -1043,6 +1409,61 @@ class TestCore(unittest.TestCase):
             Core.function_rebin_2d(d, (2, 2))
             Core.function_resample_2d(d, (3, 3))
 
+    def test_reductions_on_chunked_h5py_array_match_ndarray(self) -> None:
+        random_data = numpy.random.randn(6, 7, 8, 9).astype(numpy.float32)
+        mask_data: numpy.typing.NDArray[numpy.int32] = numpy.zeros((7, 8), numpy.int32)
+        mask_data[0, 1] = 1
+        mask_data[2, 2] = 1
+        mask = DataAndMetadata.new_data_and_metadata(data=mask_data)
+        bio = io.BytesIO()
+        old_block_size = Core._REDUCTION_BLOCK_SIZE
+        Core._REDUCTION_BLOCK_SIZE = 2048  # force many blocks
+        try:
+            with h5py.File(bio, "w") as f:
+                dataset = f.create_dataset("data", data=random_data, chunks=(2, 3, 4, 5))
+                xdata = DataAndMetadata.new_data_and_metadata(data=dataset)
+                sequence_xdata = DataAndMetadata.new_data_and_metadata(data=dataset, data_descriptor=DataAndMetadata.DataDescriptor(True, 2, 1))
+                for axis in (0, (0, 1), (1, 3), -1):
+                    with self.subTest(axis=axis):
+                        sum_xdata = Core.function_sum(xdata, axis)
+                        self.assertEqual(numpy.sum(random_data, axis).dtype, sum_xdata.data_dtype)
+                        self.assertTrue(numpy.allclose(numpy.sum(random_data, axis), sum_xdata.data, atol=1e-5))
+                        mean_xdata = Core.function_mean(xdata, axis)
+                        self.assertTrue(numpy.allclose(numpy.mean(random_data, axis), mean_xdata.data, atol=1e-5))
+                expected = random_data[:, 0, 1, :] + random_data[:, 2, 2, :]
+                self.assertTrue(numpy.allclose(expected, Core.function_sum_region(sequence_xdata, mask).data, atol=1e-5))
+                self.assertTrue(numpy.allclose(expected / 2, Core.function_average_region(sequence_xdata, mask).data, atol=1e-5))
+        finally:
+            Core._REDUCTION_BLOCK_SIZE = old_block_size
+
+    def test_rebin_factor_bins_navigation_and_datum_axes(self) -> None:
+        random_data = numpy.random.default_rng(0).integers(0, 1000, (9, 8, 18, 16), dtype=numpy.uint16)
+        data_descriptor = DataAndMetadata.DataDescriptor(False, 2, 2)
+        dimensional_calibrations = [Calibration.Calibration(0, 2, "nm"), Calibration.Calibration(0, 2, "nm"), Calibration.Calibration(0, 0.5, "mrad"), Calibration.Calibration(0, 0.5, "mrad")]
+        xdata = DataAndMetadata.new_data_and_metadata(data=random_data, dimensional_calibrations=dimensional_calibrations, data_descriptor=data_descriptor)
+        # the first axis is cropped by one at the start and the third axis by one at each end.
+        expected = random_data[1:, :, 1:-1].reshape(4, 2, 4, 2, 4, 4, 4, 4).sum(axis=(1, 3, 5, 7), dtype=numpy.uint32)
+        rebinned = Core.function_rebin_factor(xdata, (2, 2, 4, 4), dtype=numpy.uint32)
+        self.assertEqual(numpy.uint32, rebinned.data_dtype)
+        self.assertTrue(numpy.array_equal(expected, rebinned.data))
+        self.assertEqual(data_descriptor, rebinned.data_descriptor)
+        self.assertEqual([4, 4, 2, 2], [c.scale for c in rebinned.dimensional_calibrations])
+        out = DataAndMetadata.new_data_and_metadata(data=numpy.zeros((4, 4, 4, 4), dtype=numpy.uint32))
+        self.assertIs(out, Core.function_rebin_factor(xdata, (2, 2, 4, 4), out=out, dtype=numpy.uint32))
+        self.assertTrue(numpy.array_equal(expected, out.data))
+        with self.assertRaises(ValueError):
+            Core.function_rebin_factor(xdata, (2, 2, 4, 4), out=out)
+        bio = io.BytesIO()
+        old_block_size = Core._REDUCTION_BLOCK_SIZE
+        Core._REDUCTION_BLOCK_SIZE = 2048  # force many blocks
+        try:
+            with h5py.File(bio, "w") as f:
+                dataset = f.create_dataset("data", data=random_data, chunks=(3, 4, 6, 8))
+                h5py_xdata = DataAndMetadata.new_data_and_metadata(data=dataset, data_descriptor=data_descriptor)
+                self.assertTrue(numpy.array_equal(expected, Core.function_rebin_factor(h5py_xdata, (2, 2, 4, 4), dtype=numpy.uint32).data))
+        finally:
+            Core._REDUCTION_BLOCK_SIZE = old_block_size
+
     def test_element_data_returns_ndarray(self) -> None:
         bio = io.BytesIO()
         with h5py.File(bio, "w") as f:
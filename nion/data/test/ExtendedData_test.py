@@ -3,6 +3,7 @@ import datetime
 import h5py
 import logging
 import os
+import pickle
 import shutil
 import typing
 import unittest
@@ -136,6 +137,29 @@ class TestExtendedData(unittest.TestCase):
         xdata.data_descriptor.is_sequence = True
         self.assertFalse(xdata.data_descriptor.is_sequence)
 
+    def test_new_data_and_metadata_shares_immutable_calibrations_and_descriptor(self) -> None:
+        intensity_calibration = Calibration.Calibration(0.1, 0.2, "I")
+        dimensional_calibrations = [Calibration.Calibration(0.11, 0.22, "S"), Calibration.Calibration(0.111, 0.222, "B")]
+        xdata = DataAndMetadata.new_data_and_metadata(data=numpy.ones((4, 5)), intensity_calibration=intensity_calibration, dimensional_calibrations=dimensional_calibrations, data_descriptor=DataAndMetadata.DataDescriptor(True, 0, 1))
+        # changing the values passed in does not change the stored values.
+        intensity_calibration.offset = 0.3
+        dimensional_calibrations[0].offset = 0.3
+        self.assertEqual(Calibration.Calibration(0.1, 0.2, "I"), xdata.intensity_calibration)
+        self.assertEqual(Calibration.Calibration(0.11, 0.22, "S"), xdata.dimensional_calibrations[0])
+        # stored values are shared with new data and metadata built from them.
+        xdata2 = xdata.clone_with_data(numpy.zeros((4, 5)))
+        self.assertIs(xdata._shared_intensity_calibration, xdata2._shared_intensity_calibration)
+        self.assertIs(xdata._shared_dimensional_calibrations[0], xdata2._shared_dimensional_calibrations[0])
+        # returned calibrations and data descriptors are mutable copies.
+        intensity_calibration2 = xdata.intensity_calibration
+        intensity_calibration2.offset = 0.3
+        dimensional_calibrations2 = xdata.dimensional_calibrations
+        dimensional_calibrations2[0].offset = 0.3
+        xdata.datum_dimensional_calibrations[0].scale = 0.3
+        self.assertEqual(Calibration.Calibration(0.1, 0.2, "I"), xdata.intensity_calibration)
+        self.assertEqual([Calibration.Calibration(0.11, 0.22, "S"), Calibration.Calibration(0.111, 0.222, "B")], xdata.dimensional_calibrations)
+        self.assertEqual(DataAndMetadata.DataDescriptor(True, 0, 1), xdata2.data_descriptor)
+
     def test_convert_to_array(self) -> None:
         # should not print a deprecation warning, fixed with numpy 2.0 updates
         data: numpy.typing.NDArray[numpy.int32] = numpy.ones((100, 100), dtype=numpy.int32)
@@ -165,6 +189,86 @@ class TestExtendedData(unittest.TestCase):
         self.assertEqual("America/Los_Angeles", xdata_clone.timezone)
         self.assertEqual("-0700", xdata_clone.timezone_offset)
 
+    def test_lazy_evaluation_matches_immediate_evaluation(self) -> None:
+        rng = numpy.random.default_rng(0)
+        a = DataAndMetadata.new_data_and_metadata(data=rng.standard_normal((4, 3, 8, 8)), intensity_calibration=Calibration.Calibration(0.1, 0.2, "I"))
+        b = DataAndMetadata.new_data_and_metadata(data=rng.standard_normal((4, 3, 8, 8)).astype(numpy.float32))
+        c = rng.standard_normal((8,))
+        d = DataAndMetadata.new_data_and_metadata(data=rng.integers(1, 5, (1, 3, 8, 8)))
+        expected = abs((a - b) * c / d) ** 2 + 1
+        with DataAndMetadata.lazy_evaluation():
+            xdata = abs((a - b) * c / d) ** 2 + 1
+        self.assertEqual(expected.data_shape, xdata.data_shape)
+        self.assertEqual(expected.data_dtype, xdata.data_dtype)
+        self.assertEqual(expected.intensity_calibration, xdata.intensity_calibration)
+        self.assertTrue(numpy.allclose(expected.data, xdata.data))
+        self.assertIs(xdata.data, xdata.data)
+
+    def test_lazy_evaluation_of_large_data_uses_multiple_blocks(self) -> None:
+        data = numpy.arange(64 * 128 * 256, dtype=numpy.float64).reshape(64, 128, 256)
+        xdata = DataAndMetadata.new_data_and_metadata(data=data)
+        with DataAndMetadata.lazy_evaluation():
+            xdata2 = 2 - xdata * 3
+        self.assertTrue(numpy.array_equal(2 - data * 3, xdata2.data))
+
+    def test_lazy_evaluation_of_scalar_data_and_scalar_operands(self) -> None:
+        xdata = DataAndMetadata.new_data_and_metadata(data=numpy.array(3.0))
+        xdata2 = DataAndMetadata.new_data_and_metadata(data=numpy.arange(6, dtype=numpy.float64).reshape(2, 3))
+        with DataAndMetadata.lazy_evaluation():
+            xdata3 = (xdata + 1) * 2
+            xdata4 = xdata2 * numpy.array(2.0) + xdata.data
+        self.assertEqual((), xdata3.data_shape)
+        self.assertEqual(8.0, xdata3.data)
+        self.assertTrue(numpy.array_equal(numpy.arange(6).reshape(2, 3) * 2.0 + 3.0, xdata4.data))
+
+    def test_lazy_evaluation_of_hdf5_dataset(self) -> None:
+        current_working_directory = os.getcwd()
+        workspace_dir = os.path.join(current_working_directory, "__Test")
+        db_make_directory_if_needed(workspace_dir)
+        try:
+            with h5py.File(os.path.join(workspace_dir, "file.h5"), "w") as f:
+                dataset = f.create_dataset("data", data=numpy.arange(16).reshape(4, 4))
+                xdata = DataAndMetadata.new_data_and_metadata(data=dataset)
+                with DataAndMetadata.lazy_evaluation():
+                    xdata2 = -(xdata + 1)
+                self.assertTrue(numpy.array_equal(-(numpy.arange(16).reshape(4, 4) + 1), xdata2.data))
+        finally:
+            shutil.rmtree(workspace_dir)
+
+    def test_rpc_message_round_trip_wraps_buffer_without_copy(self) -> None:
+        xdata = DataAndMetadata.new_data_and_metadata(
+            data=numpy.arange(24, dtype=numpy.float32).reshape(2, 3, 4),
+            intensity_calibration=Calibration.Calibration(0.1, 0.2, "I"),
+            dimensional_calibrations=[Calibration.Calibration(0.11, 0.22, "S"), Calibration.Calibration(0.11, 0.22, "A"), Calibration.Calibration(0.111, 0.222, "B")],
+            data_descriptor=DataAndMetadata.DataDescriptor(True, 0, 2),
+            metadata={"test": "test"},
+            timestamp=datetime.datetime(2013, 11, 18, 14, 5, 4, 0),
+            timezone="America/Los_Angeles",
+            timezone_offset="-0700"
+        )
+        header, buffers = xdata.to_rpc_message()
+        self.assertEqual(1, len(buffers))
+        self.assertTrue(numpy.shares_memory(xdata.data, numpy.asarray(buffers[0].raw())))
+        received_buffer = bytearray(buffers[0].raw())
+        xdata2 = DataAndMetadata.DataAndMetadata.from_rpc_message(header, [received_buffer])
+        self.assertTrue(numpy.shares_memory(xdata2.data, numpy.frombuffer(received_buffer, dtype=numpy.uint8)))
+        self.assertTrue(numpy.array_equal(xdata.data, xdata2.data))
+        self.assertEqual(xdata.data_dtype, xdata2.data_dtype)
+        self.assertEqual(xdata.data_metadata, xdata2.data_metadata)
+
+    def test_pickle_transfers_data_out_of_band(self) -> None:
+        xdata = DataAndMetadata.new_data_and_metadata(data=numpy.random.randn(64, 64), intensity_calibration=Calibration.Calibration(0.1, 0.2, "I"), metadata={"test": "test"})
+        buffers: typing.List[pickle.PickleBuffer] = list()
+        pickled = pickle.dumps(xdata, protocol=5, buffer_callback=buffers.append)
+        self.assertEqual(1, len(buffers))
+        self.assertLess(len(pickled), xdata.data.nbytes)
+        xdata2 = pickle.loads(pickled, buffers=buffers)
+        self.assertTrue(numpy.shares_memory(xdata.data, xdata2.data))
+        self.assertEqual(xdata.data_metadata, xdata2.data_metadata)
+        xdata3 = pickle.loads(pickle.dumps(xdata))
+        self.assertTrue(numpy.array_equal(xdata.data, xdata3.data))
+        self.assertEqual(xdata.data_metadata, xdata3.data_metadata)
+
     def test_promote_constant(self) -> None:
         xdata = DataAndMetadata.new_data_and_metadata(numpy.random.randn(5,4))
         p1 = DataAndMetadata.promote_constant(xdata, xdata.data_shape)
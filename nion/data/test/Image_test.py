@@ -8,6 +8,7 @@ import unittest
 import h5py
 import numpy
 import numpy.typing
+import scipy.interpolate
 
 # local libraries
 from nion.data import Image
@@ -32,6 +33,29 @@ class TestImageClass(unittest.TestCase):
         image_1d_rgb: numpy.typing.NDArray[numpy.uint8] = numpy.zeros((16, 3), dtype=numpy.uint8)
         self.assertIsNotNone(Image.create_rgba_image_from_array(image_1d_rgb))
 
+    def test_create_rgba_image_from_array_in_row_blocks_matches_single_block(self) -> None:
+        rng = numpy.random.default_rng(0)
+        image = rng.uniform(0, 100, (97, 31)).astype(numpy.float32)
+        kwargs_list: typing.List[typing.Dict[str, typing.Any]] = [dict(), dict(normalize=False), dict(display_limits=(20, 80), underlimit=0.1, overlimit=0.9), dict(data_range=(10, 90), underlimit=0.1, overlimit=0.9)]
+        block_size = Image._RGBA_BLOCK_SIZE
+        for kwargs in kwargs_list:
+            with self.subTest(kwargs=kwargs):
+                expected = Image.create_rgba_image_from_array(image, **kwargs)
+                Image._RGBA_BLOCK_SIZE = 256
+                try:
+                    out = numpy.zeros(image.shape, numpy.uint32)
+                    rgba_image = Image.create_rgba_image_from_array(image, out=out, **kwargs)
+                finally:
+                    Image._RGBA_BLOCK_SIZE = block_size
+                self.assertIs(out, rgba_image)
+                self.assertTrue(numpy.array_equal(expected, rgba_image))
+                self.assertTrue(numpy.all(Image.get_alpha_view(rgba_image) == 255))
+
+    def test_create_rgba_image_from_array_colors_under_and_over_limit_values(self) -> None:
+        image = numpy.array([[0.0, 50.0, 100.0]])
+        rgba_image = Image.create_rgba_image_from_array(image, data_range=(0.0, 100.0), underlimit=0.1, overlimit=0.9)
+        self.assertEqual([0xFF0000FF, 0xFF7F7F7F, 0xFFFF0000], rgba_image[0].tolist())
+
     def test_rebin_expand_has_even_expansion(self) -> None:
         # NOTE: statistical tests are only valid if expanded length is multiple of src length
         src = numpy.arange(0, 10)
@@ -92,6 +116,26 @@ class TestImageClass(unittest.TestCase):
         self.assertTrue(numpy.array_equal(src2t[0:6, 0:6], src2t[13:6:-1, 13:6:-1]))
         self.assertTrue(numpy.array_equal(src2t[0:6, 0:6], src2t[13:6:-1, 0:6]))
 
+    def test_scaled_matches_bivariate_spline_and_scales_stacks(self) -> None:
+        rng = numpy.random.default_rng(0)
+        for shape, size in (((30, 40), (12, 13)), ((7, 9), (20, 3)), ((4, 64), (9, 32))):
+            for method, k in (('linear', 1), ('cubic', 3)):
+                with self.subTest(shape=shape, size=size, method=method):
+                    image = rng.random(shape)
+                    iy = numpy.linspace(0, shape[0] - 1, size[0])
+                    ix = numpy.linspace(0, shape[1] - 1, size[1])
+                    expected = scipy.interpolate.RectBivariateSpline(numpy.arange(shape[0]), numpy.arange(shape[1]), image, kx=k, ky=k)(iy, ix)
+                    self.assertTrue(numpy.allclose(expected, Image.scaled(image, size, method), atol=1e-12))
+                    stack = rng.random((3,) + shape)
+                    scaled_stack = Image.scaled_stack(stack, size, method)
+                    for i in range(3):
+                        self.assertTrue(numpy.allclose(Image.scaled(stack[i], size, method), scaled_stack[i], atol=1e-12))
+        rgba_stack = (rng.random((2, 16, 12, 4)) * 255).astype(numpy.uint8)
+        scaled_rgba_stack = Image.scaled_stack(rgba_stack, (8, 24), 'linear')
+        self.assertEqual(numpy.uint8, scaled_rgba_stack.dtype)
+        self.assertTrue(numpy.array_equal(Image.scaled(rgba_stack[1], (8, 24), 'linear'), scaled_rgba_stack[1]))
+        self.assertEqual((8, 24), Image.scaled(rng.random((16, 12)), (8, 24), 'nearest').shape)
+
     def test_rgba_can_be_created_from_h5py_array(self) -> None:
         current_working_directory = os.getcwd()
         workspace_dir = os.path.join(current_working_directory, "__Test")
@@ -0,0 +1,100 @@
+# standard libraries
+import gc
+import logging
+import unittest
+
+# third party libraries
+import numpy
+
+# local libraries
+from nion.data import Calibration
+from nion.data import Core
+from nion.data import DataAndMetadata
+from nion.data import Memoization
+
+
+class TestMemoization(unittest.TestCase):
+
+    def setUp(self) -> None:
+        Memoization.configure(max_bytes=16 * 1024 * 1024)
+
+    def tearDown(self) -> None:
+        Memoization.configure()
+
+    def test_cache_is_disabled_by_default(self) -> None:
+        Memoization.configure()
+        xdata = DataAndMetadata.new_data_and_metadata(data=numpy.random.randn(16, 16))
+        Core.function_fft(xdata)
+        Core.function_fft(xdata)
+        self.assertEqual(Memoization.CacheStatistics(0, 0, 0, 0, 0, 0), Memoization.get_statistics())
+
+    def test_repeated_call_returns_cached_read_only_result(self) -> None:
+        xdata = DataAndMetadata.new_data_and_metadata(data=numpy.random.randn(16, 16))
+        result1 = Core.function_fft(xdata)
+        result2 = Core.function_fft(xdata)
+        self.assertIsNot(result1, result2)
+        self.assertIs(result1.data, result2.data)
+        self.assertFalse(result2.data.flags.writeable)
+        threshold = Core.auto_threshold(xdata, number_bins=100)
+        self.assertEqual(threshold, Core.auto_threshold(xdata, number_bins=100))
+        Core.auto_threshold(xdata, number_bins=200)
+        statistics = Memoization.get_statistics()
+        self.assertEqual(2, statistics.hits)
+        self.assertEqual(3, statistics.misses)
+        self.assertEqual(3, statistics.entry_count)
+
+    def test_calibration_change_is_a_miss(self) -> None:
+        data = numpy.random.randn(16, 16)
+        xdata1 = DataAndMetadata.new_data_and_metadata(data=data)
+        xdata2 = DataAndMetadata.new_data_and_metadata(data=data, dimensional_calibrations=[Calibration.Calibration(scale=2.0)] * 2)
+        result1 = Core.function_fft(xdata1)
+        result2 = Core.function_fft(xdata2)
+        self.assertEqual(0, Memoization.get_statistics().hits)
+        self.assertNotEqual(result1.dimensional_calibrations, result2.dimensional_calibrations)
+
+    def test_modified_data_is_recalculated(self) -> None:
+        # the whole data is sampled for small data, so an unmarked modification is found.
+        small_data = numpy.zeros((64, 64))
+        self.assertLessEqual(small_data.size, Memoization._SAMPLE_COUNT)
+        small_xdata = DataAndMetadata.new_data_and_metadata(data=small_data)
+        Core.function_histogram(small_xdata, 10)
+        small_data[2, 2] = 1.0
+        self.assertEqual(1, Core.function_histogram(small_xdata, 10).data[-1])
+        self.assertEqual(0, Memoization.get_statistics().hits)
+        # a modification of large data which is not sampled is not found unless it is marked.
+        data = numpy.zeros((256, 256))
+        self.assertGreater(data.size, Memoization._SAMPLE_COUNT)
+        xdata = DataAndMetadata.new_data_and_metadata(data=data)
+        Core.function_histogram(xdata, 10)
+        data[1, 1] = 1.0
+        self.assertEqual(0, Core.function_histogram(xdata, 10).data[-1])
+        self.assertEqual(1, Memoization.get_statistics().hits)
+        Memoization.mark_modified(data[1:])
+        self.assertEqual(1, Core.function_histogram(xdata, 10).data[-1])
+        self.assertEqual(1, Memoization.get_statistics().hits)
+
+    def test_least_recently_used_results_are_evicted(self) -> None:
+        Memoization.configure(max_bytes=3 * 64 * 64 * 16)
+        xdatas = [DataAndMetadata.new_data_and_metadata(data=numpy.random.randn(64, 64)) for _ in range(4)]
+        for xdata in xdatas:
+            Core.function_fft(xdata)
+        Core.function_fft(xdatas[1])
+        Core.function_fft(xdatas[0])
+        statistics = Memoization.get_statistics()
+        self.assertEqual(1, statistics.hits)
+        self.assertEqual(2, statistics.evictions)
+        self.assertLessEqual(statistics.nbytes, statistics.max_bytes)
+
+    def test_results_are_removed_when_data_is_deleted(self) -> None:
+        xdata = DataAndMetadata.new_data_and_metadata(data=numpy.random.randn(16, 16))
+        Core.function_fft(xdata)
+        self.assertEqual(1, Memoization.get_statistics().entry_count)
+        del xdata
+        gc.collect()
+        self.assertEqual(0, Memoization.get_statistics().entry_count)
+        self.assertEqual(0, Memoization.get_statistics().nbytes)
+
+
+if __name__ == '__main__':
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
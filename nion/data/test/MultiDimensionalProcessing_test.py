@@ -7,6 +7,7 @@ import scipy.ndimage
 # local libraries
 from nion.data import DataAndMetadata
 from nion.data import MultiDimensionalProcessing
+from nion.data import Parallel
 
 _ = gettext.gettext
 
@@ -146,6 +147,21 @@ class TestMultiDimensionalProcessing(unittest.TestCase):
             assert result is not None
             self.assertTrue(numpy.allclose(result.data, shifted))
 
+    def test_function_apply_multi_dimensional_shifts_in_processes_matches_threads(self) -> None:
+        Parallel.configure(max_workers=2)
+        try:
+            rng = numpy.random.default_rng(0)
+            xdata = DataAndMetadata.new_data_and_metadata(data=rng.standard_normal((6, 5, 16, 16)), data_descriptor=DataAndMetadata.DataDescriptor(False, 2, 2))
+            shifts = rng.uniform(-3, 3, (6, 5, 2))
+            expected = MultiDimensionalProcessing.function_apply_multi_dimensional_shifts(xdata, shifts, (2, 3))
+            result = MultiDimensionalProcessing.function_apply_multi_dimensional_shifts(xdata, shifts, (2, 3), use_processes=True)
+        finally:
+            Parallel.configure()
+        assert expected is not None
+        assert result is not None
+        self.assertTrue(numpy.array_equal(expected.data, result.data))
+        self.assertEqual(expected.data_descriptor, result.data_descriptor)
+
     def test_function_measure_multi_dimensional_shifts_3d(self) -> None:
         with self.subTest("Test for a sequence of 2D data, measure shift of data dimensions along sequence axis"):
             shape = (5, 100, 100)
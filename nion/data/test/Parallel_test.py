@@ -0,0 +1,94 @@
+# standard libraries
+import concurrent.futures
+import logging
+import threading
+import time
+import unittest
+
+# third party libraries
+import numpy
+
+# local libraries
+from nion.data import DataAndMetadata
+from nion.data import MultiDimensionalProcessing
+from nion.data import Parallel
+
+
+class TestParallel(unittest.TestCase):
+
+    def setUp(self) -> None:
+        pass
+
+    def tearDown(self) -> None:
+        Parallel.configure()
+
+    def test_run_processes_all_items(self) -> None:
+        results = [0] * 100
+
+        def process(range_: range) -> None:
+            for i in range_:
+                results[i] = i * 2
+
+        Parallel.run(process, Parallel.split_range(0, 100))
+        self.assertEqual([i * 2 for i in range(100)], results)
+
+    def test_split_range_uses_configured_chunk_size(self) -> None:
+        Parallel.configure(max_workers=3, chunk_size=4)
+        self.assertEqual(3, Parallel.get_max_workers())
+        self.assertEqual([range(0, 4), range(4, 8), range(8, 10)], Parallel.split_range(0, 10))
+        Parallel.configure(max_workers=3)
+        self.assertEqual([range(2, 5), range(5, 8), range(8, 11)], Parallel.split_range(2, 11))
+
+    def test_run_propagates_worker_exception_and_stops_other_workers(self) -> None:
+        Parallel.configure(max_workers=2)
+        stopped = threading.Event()
+
+        def process(i: int) -> None:
+            if i == 0:
+                time.sleep(0.05)
+                raise ValueError("failed")
+            try:
+                for _ in range(1000):
+                    Parallel.check_cancelled()
+                    time.sleep(0.01)
+            except concurrent.futures.CancelledError:
+                stopped.set()
+                raise
+
+        with self.assertRaises(ValueError):
+            Parallel.run(process, [0, 1, 2, 3])
+        self.assertTrue(stopped.is_set())
+
+    def test_run_can_be_cancelled(self) -> None:
+        cancel_event = threading.Event()
+
+        def process(i: int) -> None:
+            cancel_event.set()
+            Parallel.check_cancelled()
+
+        with self.assertRaises(concurrent.futures.CancelledError):
+            Parallel.run(process, [0, 1, 2, 3], cancel_event=cancel_event)
+
+    def test_nested_run_does_not_wait_on_pool(self) -> None:
+        Parallel.configure(max_workers=2)
+        results = numpy.zeros((4, 4))
+
+        def process_row(row: int) -> None:
+            def process_column(column: int) -> None:
+                results[row, column] = row * 4 + column
+            Parallel.run(process_column, range(4))
+
+        Parallel.run(process_row, range(4))
+        self.assertTrue(numpy.array_equal(numpy.arange(16).reshape(4, 4), results))
+
+    def test_measure_multi_dimensional_shifts_can_be_cancelled(self) -> None:
+        xdata = DataAndMetadata.new_data_and_metadata(data=numpy.random.rand(20, 16, 16), data_descriptor=DataAndMetadata.DataDescriptor(True, 0, 2))
+        cancel_event = threading.Event()
+        cancel_event.set()
+        with self.assertRaises(concurrent.futures.CancelledError):
+            MultiDimensionalProcessing.function_measure_multi_dimensional_shifts(xdata, (1, 2), cancel_event=cancel_event)
+
+
+if __name__ == '__main__':
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
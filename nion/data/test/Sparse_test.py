@@ -0,0 +1,91 @@
+# standard libraries
+import logging
+import typing
+import unittest
+
+# third party libraries
+import numpy
+import numpy.typing
+
+# local libraries
+from nion.data import Core
+from nion.data import DataAndMetadata
+from nion.data import MultiDimensionalProcessing
+from nion.data import Sparse
+
+
+def make_event_data(shape: tuple[int, ...], with_counts: bool = False) -> numpy.typing.NDArray[numpy.uint32]:
+    rng = numpy.random.default_rng(0)
+    data = (rng.random(shape) < 0.05).astype(numpy.uint32)
+    if with_counts:
+        data *= rng.integers(1, 4, shape, dtype=numpy.uint32)
+    return data
+
+
+class TestSparse(unittest.TestCase):
+
+    def setUp(self) -> None:
+        pass
+
+    def tearDown(self) -> None:
+        pass
+
+    def test_event_array_round_trips_dense_data(self) -> None:
+        for with_counts in (False, True):
+            with self.subTest(with_counts=with_counts):
+                data = make_event_data((4, 5, 6, 7), with_counts)
+                event_array = Sparse.EventArray.from_dense(data, 2)
+                self.assertEqual(data.shape, event_array.shape)
+                self.assertEqual(data.dtype, event_array.dtype)
+                self.assertEqual(numpy.count_nonzero(data), event_array.event_count)
+                self.assertEqual(with_counts, event_array.values is not None)
+                self.assertLess(event_array.nbytes, data.nbytes)
+                self.assertTrue(numpy.array_equal(data, numpy.asarray(event_array)))
+                self.assertTrue(numpy.array_equal(data, numpy.array(event_array, copy=True)))
+                with self.assertRaises(ValueError):
+                    numpy.asarray(event_array, copy=False)
+                self.assertTrue(numpy.array_equal(data[2, 3], event_array[2, 3]))
+                self.assertTrue(numpy.array_equal(data[1:3, ..., 2:4], event_array[1:3, ..., 2:4]))
+                self.assertTrue(numpy.array_equal(data[:, 1, 0], event_array[:, 1, 0]))
+
+    def test_event_array_sums_match_dense_sums(self) -> None:
+        data = make_event_data((3, 4, 5, 6, 7), True)
+        event_array = Sparse.EventArray.from_dense(data, 2)
+        for axis in (None, (3, 4), (0, 1, 2), (1, 2), (0, 4), -1):
+            for keepdims in (False, True):
+                with self.subTest(axis=axis, keepdims=keepdims):
+                    expected = numpy.sum(data, axis=axis, keepdims=keepdims)
+                    result = event_array.sum(axis, keepdims=keepdims)
+                    self.assertEqual(expected.dtype, result.dtype)
+                    self.assertTrue(numpy.array_equal(expected, result))
+        where = make_event_data((4, 5, 1, 1)).astype(bool)
+        self.assertTrue(numpy.array_equal(numpy.sum(data, axis=(1, 2), where=where), event_array.sum((1, 2), where=where)))
+        weights = numpy.random.default_rng(1).random((6, 7))
+        self.assertTrue(numpy.allclose(numpy.sum(data * weights, axis=(3, 4)), event_array.sum((3, 4), weights=weights)))
+
+    def test_core_functions_on_sparse_data_match_dense_data(self) -> None:
+        data = make_event_data((2, 6, 5, 8, 9), True)
+        data_descriptor = DataAndMetadata.DataDescriptor(True, 2, 2)
+        xdata = DataAndMetadata.new_data_and_metadata(data=data, data_descriptor=data_descriptor)
+        sparse_xdata = DataAndMetadata.new_data_and_metadata(data=typing.cast(numpy.typing.NDArray[typing.Any], Sparse.EventArray.from_dense(data, 2)), data_descriptor=data_descriptor)
+        mask = numpy.zeros((6, 5), dtype=numpy.int32)
+        mask[1:4, 2:4] = 1
+        pairs = [
+            (Core.function_sum(xdata, (3, 4)), Core.function_sum(sparse_xdata, (3, 4))),
+            (Core.function_sum(xdata, (0, 1, 2)), Core.function_sum(sparse_xdata, (0, 1, 2))),
+            (Core.function_pick(xdata, (0.5, 0.25)), Core.function_pick(sparse_xdata, (0.5, 0.25))),
+            (Core.function_sum_region(xdata, mask), Core.function_sum_region(sparse_xdata, mask)),
+            (MultiDimensionalProcessing.function_integrate_along_axis(xdata, (3, 4)), MultiDimensionalProcessing.function_integrate_along_axis(sparse_xdata, (3, 4))),
+            (MultiDimensionalProcessing.function_integrate_along_axis(xdata, (1, 2), mask), MultiDimensionalProcessing.function_integrate_along_axis(sparse_xdata, (1, 2), mask)),
+        ]
+        for expected, result in pairs:
+            self.assertIsInstance(result._data_ex, numpy.ndarray)
+            self.assertEqual(expected.data_dtype, result.data_dtype)
+            self.assertTrue(numpy.array_equal(expected.data, result.data))
+            self.assertEqual(expected.data_descriptor, result.data_descriptor)
+            self.assertEqual(expected.dimensional_calibrations, result.dimensional_calibrations)
+
+
+if __name__ == '__main__':
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()
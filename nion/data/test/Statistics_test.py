@@ -0,0 +1,109 @@
+# standard libraries
+import logging
+import math
+import typing
+import unittest
+
+# third party libraries
+import numpy
+import numpy.typing
+
+# local libraries
+from nion.data import Core
+from nion.data import DataAndMetadata
+from nion.data import Statistics
+
+
+class TestStatistics(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.__block_size = Statistics._STATISTICS_BLOCK_SIZE
+        # use small blocks so that the data is split between several blocks.
+        Statistics._STATISTICS_BLOCK_SIZE = 1024
+
+    def tearDown(self) -> None:
+        Statistics._STATISTICS_BLOCK_SIZE = self.__block_size
+
+    def test_statistics_match_numpy(self) -> None:
+        rng = numpy.random.default_rng(0)
+        datas: typing.List[numpy.typing.NDArray[typing.Any]] = [
+            rng.standard_normal((97, 31)).astype(numpy.float32),
+            rng.integers(-50, 50, (20, 16, 3)).astype(numpy.int16),
+            rng.standard_normal((40, 60))[:, ::3],
+            numpy.full((8, 8), 3.0),
+        ]
+        for data in datas:
+            with self.subTest(shape=data.shape, dtype=data.dtype):
+                statistics = Statistics.calculate_statistics(data, bins=37)
+                histogram, bin_edges = numpy.histogram(data, bins=37)
+                self.assertEqual(data.size, statistics.count)
+                self.assertEqual(0, statistics.nan_count)
+                self.assertEqual(float(numpy.amin(data)), statistics.min)
+                self.assertEqual(float(numpy.amax(data)), statistics.max)
+                self.assertAlmostEqual(float(numpy.mean(data, dtype=numpy.float64)), statistics.mean)
+                assert statistics.histogram is not None
+                assert statistics.bin_edges is not None
+                self.assertTrue(numpy.array_equal(histogram, statistics.histogram))
+                self.assertTrue(numpy.array_equal(bin_edges, statistics.bin_edges))
+
+    def test_statistics_ignore_nan_values(self) -> None:
+        data = numpy.random.default_rng(0).standard_normal((64, 64))
+        data[3, 3] = numpy.nan
+        data[40] = numpy.nan
+        statistics = Statistics.calculate_statistics(data, bins=10)
+        finite_data = data[numpy.isfinite(data)]
+        self.assertEqual(65, statistics.nan_count)
+        self.assertEqual(finite_data.size, statistics.count)
+        self.assertEqual(float(numpy.amin(finite_data)), statistics.min)
+        self.assertAlmostEqual(float(numpy.mean(finite_data)), statistics.mean)
+        assert statistics.histogram is not None
+        self.assertTrue(numpy.array_equal(numpy.histogram(finite_data, bins=10)[0], statistics.histogram))
+        nan_statistics = Statistics.calculate_statistics(numpy.full((4, 4), numpy.nan), bins=10)
+        self.assertEqual(16, nan_statistics.nan_count)
+        self.assertTrue(math.isnan(nan_statistics.mean))
+        self.assertIsNone(nan_statistics.histogram)
+
+    def test_histogram_matches_statistics_histogram(self) -> None:
+        rng = numpy.random.default_rng(0)
+        nan_data = rng.standard_normal((64, 64))
+        nan_data[3, 3] = numpy.nan
+        nan_data[40] = numpy.nan
+        datas: typing.List[numpy.typing.NDArray[typing.Any]] = [
+            rng.standard_normal((97, 31)).astype(numpy.float32),
+            nan_data,
+            rng.integers(-50, 50, (20, 16, 3)).astype(numpy.int16),
+            numpy.full((8, 8), 3.0),
+        ]
+        for data in datas:
+            with self.subTest(shape=data.shape, dtype=data.dtype):
+                statistics = Statistics.calculate_statistics(data, bins=37)
+                histogram, bin_edges = Statistics.calculate_histogram(data, 37)
+                assert histogram is not None
+                assert bin_edges is not None
+                assert statistics.histogram is not None
+                assert statistics.bin_edges is not None
+                self.assertTrue(numpy.array_equal(statistics.histogram, histogram))
+                self.assertTrue(numpy.array_equal(statistics.bin_edges, bin_edges))
+        self.assertEqual((None, None), Statistics.calculate_histogram(numpy.full((4, 4), numpy.nan), 10))
+
+    def test_histogram_range_is_used_for_histogram(self) -> None:
+        data = numpy.random.default_rng(0).standard_normal((64, 64))
+        statistics = Statistics.calculate_statistics(data, bins=20, histogram_range=(-1.0, 1.0))
+        assert statistics.histogram is not None
+        self.assertTrue(numpy.array_equal(numpy.histogram(data, bins=20, range=(-1.0, 1.0))[0], statistics.histogram))
+        self.assertEqual(float(numpy.amax(data)), statistics.max)
+
+    def test_core_functions_use_statistics(self) -> None:
+        rng = numpy.random.default_rng(0)
+        xdata = DataAndMetadata.new_data_and_metadata(data=rng.standard_normal((64, 64)))
+        statistics = Statistics.calculate_statistics(xdata.data, bins=100)
+        self.assertTrue(numpy.array_equal(Core.function_histogram(xdata, 100).data, Core.function_histogram(xdata, 100, statistics=statistics).data))
+        self.assertEqual(Core.auto_threshold(xdata, number_bins=100), Core.auto_threshold(xdata, number_bins=100, statistics=statistics))
+        self.assertTrue(numpy.allclose(Core.function_rescale(xdata).data, Core.function_rescale(xdata, statistics=statistics).data))
+        # statistics with a different number of bins are not used for the histogram.
+        self.assertEqual(50, len(Core.function_histogram(xdata, 50, statistics=statistics).data))
+
+
+if __name__ == '__main__':
+    logging.getLogger().setLevel(logging.DEBUG)
+    unittest.main()